@@ -4,6 +4,8 @@ This package provides a simple way to serve CSV files as REST APIs with
 automatic schema inference, data validation, and configurable access control.
 """
 
+import json
+import os
 from .app import create_app
 from .config import load_config, discover_csv_files, save_config
 from .storage.csv_store import CSVStorage
@@ -37,6 +39,10 @@ def serve_csv_directory(
     readonly: bool = False,
     config_file: str = None,
     auto_reload: bool = False,
+    workers: int = 1,
+    log_level: str = None,
+    lazy: bool = False,
+    cache_dir: str = None,
     **uvicorn_kwargs
 ) -> None:
     """
@@ -52,6 +58,16 @@ def serve_csv_directory(
         readonly: If True, only allow GET requests (default: False)
         config_file: Path to YAML config file (optional)
         auto_reload: Enable auto-reload for development (default: False)
+        workers: Number of worker processes; above 1, CSV access is locked
+            across processes (default: 1)
+        log_level: Level for csv_server and uvicorn logs, e.g. "DEBUG"
+            (default: the config's log_level, else uvicorn's default)
+        lazy: Resolve resources per request and open them on first use,
+            instead of building every route and storage at startup; CSVs
+            added to data_dir later are served too (default: False)
+        cache_dir: Directory for binary column sidecars, so restarts and
+            workers load columns instead of parsing CSV (default: the
+            config's cache_dir, else none)
         **uvicorn_kwargs: Additional arguments passed to uvicorn.run()
     
     Example:
@@ -68,11 +84,22 @@ def serve_csv_directory(
     
     if config_file:
         config = load_config(config_file)
+    elif lazy:
+        # Resources are found per request, so there is nothing to scan for.
+        config = {"resources": {}}
     else:
         # Auto-discover CSV files
         config = discover_csv_files(data_path, readonly=readonly)
     
-    app = create_app(data_path, readonly=readonly, config=config)
+    if lazy:
+        config = {**config, "lazy_resources": True}
+    
+    if cache_dir:
+        config = {**config, "cache_dir": str(Path(cache_dir).resolve())}
+    
+    if log_level:
+        config = {**config, "log_level": log_level.upper()}
+        uvicorn_kwargs.setdefault("log_level", log_level.lower())
     
     # Merge uvicorn kwargs
     uvicorn_config = {
@@ -82,4 +109,24 @@ def serve_csv_directory(
         **uvicorn_kwargs
     }
     
+    if workers > 1:
+        # Each worker builds its own app from these settings via _worker_app().
+        os.environ[_WORKER_ENV] = json.dumps({
+            "data_dir": str(data_path),
+            "readonly": readonly,
+            "config": {**config, "multiprocess": True},
+        })
+        uvicorn.run("csv_server:_worker_app", factory=True, workers=workers, **uvicorn_config)
+        return
+    
+    app = create_app(data_path, readonly=readonly, config=config)
     uvicorn.run(app, **uvicorn_config)
+
+_WORKER_ENV = "CSV_SERVER_WORKER_SETTINGS"
+
+def _worker_app():
+    """App factory run in each uvicorn worker process."""
+    from pathlib import Path
+    
+    settings = json.loads(os.environ[_WORKER_ENV])
+    return create_app(Path(settings["data_dir"]), readonly=settings["readonly"], config=settings["config"])
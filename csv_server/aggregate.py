@@ -0,0 +1,225 @@
+# Group-by aggregation for CSV Server.
+# `group_by=status&metrics=count,sum:amount,avg:amount,min:created_at` groups
+# the rows passing the usual q/filter parameters and computes every metric in
+# one pass. Values are typed from the schema: sum/avg need a numeric column,
+# min/max compare numbers on numeric columns and text otherwise, and empty
+# cells are skipped (`count:col` counts the non-empty ones).
+# MaintainedAggregate also supports removing rows, so storage can keep a
+# declared aggregate current across writes and answer reads in O(groups).
+
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from csv_server.exceptions import ValidationError
+from csv_server.query import NUMERIC_TYPES, compile_predicate, parse_filters, to_number
+
+Row = Dict[str, Any]
+Metric = Tuple[str, Optional[str]]
+
+FUNCTIONS = ("count", "sum", "avg", "min", "max")
+
+def parse_group_by(group_by: Any) -> List[str]:
+    """"a,b" (or a list) -> ["a", "b"]."""
+    parts = group_by.split(",") if isinstance(group_by, str) else list(group_by or [])
+    return [part.strip() for part in parts if part.strip()]
+
+def parse_metrics(metrics: Any) -> List[Metric]:
+    """"count,sum:amount" (or a list) -> [("count", None), ("sum", "amount")]; defaults to count."""
+    parsed = []
+    for part in parse_group_by(metrics) or ["count"]:
+        fn, _, col = part.partition(":")
+        if fn not in FUNCTIONS or (fn != "count" and not col):
+            raise ValidationError(
+                f"Invalid metric '{part}', expected count or fn:column with fn in {', '.join(FUNCTIONS)}"
+            )
+        parsed.append((fn, col or None))
+    return parsed
+
+def metric_name(metric: Metric) -> str:
+    fn, col = metric
+    return f"{fn}:{col}" if col else fn
+
+class Aggregator:
+    """Per-group row counts, non-empty counts, sums and extremes for the requested metrics."""
+
+    def __init__(self, group_by: List[str], metrics: List[Metric], schema: Optional[Dict[str, str]] = None):
+        schema = schema or {}
+        self.group_by = group_by
+        self.metrics = metrics
+        self.columns = sorted({col for _, col in metrics if col})
+        self.numeric = {col: schema.get(col, "string") in NUMERIC_TYPES for col in self.columns}
+        self.extremes = sorted({col for fn, col in metrics if fn in ("min", "max")})
+        for fn, col in metrics:
+            if fn in ("sum", "avg") and not self.numeric[col]:
+                raise ValidationError(f"{fn} needs a numeric column; '{col}' is {schema.get(col, 'string')}")
+        self.groups: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        self.total = 0
+
+    def _value(self, col: str, cell: Any) -> Any:
+        if cell is None or cell == "":
+            return None
+        if self.numeric[col]:
+            try:
+                return to_number(cell)
+            except (TypeError, ValueError):
+                return None  # text in a numeric column takes no part
+        return cell
+
+    def _group(self, key: Tuple[str, ...]) -> Dict[str, Any]:
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = {
+                "rows": 0,
+                "n": dict.fromkeys(self.columns, 0),
+                "sum": dict.fromkeys(self.columns, 0),
+                "min": dict.fromkeys(self.extremes),
+                "max": dict.fromkeys(self.extremes),
+            }
+        return group
+
+    def key(self, row: Row) -> Tuple[str, ...]:
+        return tuple(row.get(col) or "" for col in self.group_by)
+
+    def add(self, row: Row) -> None:
+        group = self._group(self.key(row))
+        group["rows"] += 1
+        self.total += 1
+        for col in self.columns:
+            value = self._value(col, row.get(col))
+            if value is None:
+                continue
+            group["n"][col] += 1
+            if self.numeric[col]:
+                group["sum"][col] += value
+            if col in group["min"]:
+                low, high = group["min"][col], group["max"][col]
+                if low is None or value < low:
+                    group["min"][col] = value
+                if high is None or value > high:
+                    group["max"][col] = value
+
+    def merge(self, key: Tuple[str, ...], rows: int, columns: Dict[str, Tuple[int, Any, Any, Any]]) -> None:
+        """Fold in a partial result: rows, and per column (n, sum, min, max) of its non-empty values."""
+        group = self._group(key)
+        group["rows"] += rows
+        self.total += rows
+        for col, (n, total, low, high) in columns.items():
+            if not n:
+                continue
+            group["n"][col] += n
+            group["sum"][col] += total
+            if col in group["min"]:
+                if group["min"][col] is None or low < group["min"][col]:
+                    group["min"][col] = low
+                if group["max"][col] is None or high > group["max"][col]:
+                    group["max"][col] = high
+
+    def _extreme(self, key: Tuple[str, ...], group: Dict[str, Any], fn: str, col: str) -> Any:
+        return group[fn][col]
+
+    def result(self, metrics: Optional[List[Metric]] = None) -> List[Row]:
+        """One dict per group (group columns, then metrics), ordered by group values."""
+        items = []
+        for key in sorted(self.groups):
+            group = self.groups[key]
+            if not group["rows"]:
+                continue
+            item: Row = dict(zip(self.group_by, key))
+            for fn, col in metrics or self.metrics:
+                if fn == "count":
+                    value = group["n"][col] if col else group["rows"]
+                elif fn == "sum":
+                    value = group["sum"][col]
+                elif fn == "avg":
+                    value = group["sum"][col] / group["n"][col] if group["n"][col] else None
+                else:
+                    value = self._extreme(key, group, fn, col)
+                item[metric_name((fn, col))] = value
+            items.append(item)
+        return items
+
+class MaintainedAggregate(Aggregator):
+    """An Aggregator that can also remove rows; extremes come from per-group value counts."""
+
+    def __init__(self, group_by: List[str], metrics: List[Metric], schema: Optional[Dict[str, str]] = None):
+        super().__init__(group_by, metrics, schema)
+        self._values: Dict[Tuple[str, ...], Dict[str, Counter]] = {}
+
+    def add(self, row: Row) -> None:
+        key = self.key(row)
+        group = self.groups.get(key)
+        if group is not None:
+            # Settle extremes left open by a remove before comparing against them.
+            for col in self.extremes:
+                self._extreme(key, group, "min", col)
+                self._extreme(key, group, "max", col)
+        super().add(row)
+        if self.extremes:
+            counts = self._values.setdefault(key, {col: Counter() for col in self.extremes})
+            for col in self.extremes:
+                value = self._value(col, row.get(col))
+                if value is not None:
+                    counts[col][value] += 1
+
+    def remove(self, row: Row) -> None:
+        key = self.key(row)
+        group = self.groups.get(key)
+        if group is None:
+            return
+        group["rows"] -= 1
+        self.total -= 1
+        for col in self.columns:
+            value = self._value(col, row.get(col))
+            if value is None:
+                continue
+            group["n"][col] -= 1
+            if self.numeric[col]:
+                group["sum"][col] -= value
+            if col in group["min"]:
+                counts = self._values[key][col]
+                counts[value] -= 1
+                if counts[value] <= 0:
+                    del counts[value]
+                    # Recomputed on the next read if the extreme itself went away.
+                    if value == group["min"][col]:
+                        group["min"][col] = None
+                    if value == group["max"][col]:
+                        group["max"][col] = None
+        if not group["rows"]:
+            del self.groups[key]
+            self._values.pop(key, None)
+
+    def _extreme(self, key: Tuple[str, ...], group: Dict[str, Any], fn: str, col: str) -> Any:
+        if group[fn][col] is None and group["n"][col]:
+            counts = self._values[key][col]
+            group[fn][col] = min(counts) if fn == "min" else max(counts)
+        return group[fn][col]
+
+    def covers(self, group_by: List[str], metrics: List[Metric], schema: Optional[Dict[str, str]] = None) -> bool:
+        """Whether this aggregate can answer ``group_by`` / ``metrics`` typed by ``schema``."""
+        if group_by != self.group_by:
+            return False
+        schema = schema or {}
+        for fn, col in metrics:
+            if col is None:
+                continue
+            if col not in self.columns or (fn in ("min", "max") and col not in self.extremes):
+                return False
+            if self.numeric[col] != (schema.get(col, "string") in NUMERIC_TYPES):
+                return False  # the column's type changed since this was built
+        return True
+
+def aggregate_rows(
+    rows: Iterable[Row],
+    group_by: Any = None,
+    metrics: Any = None,
+    q: Optional[str] = None,
+    filters: Optional[Iterable[str]] = None,
+    schema: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """Aggregate the rows matching q/filters: {"groups": [...], "total": matched rows}."""
+    aggregator = Aggregator(parse_group_by(group_by), parse_metrics(metrics), schema)
+    predicate = compile_predicate(parse_filters(filters), schema, q)
+    for row in rows:
+        if predicate is None or predicate(row):
+            aggregator.add(row)
+    return {"groups": aggregator.result(), "total": aggregator.total}
@@ -1,61 +1,38 @@
 # FastAPI app factory.
 # For each CSV in dir, create routes.
+# With `lazy_resources`, a fixed set of /{resource} routes resolves resources
+# through a ResourceRegistry instead (resources.py), opening them on first use.
 # Respect readonly: POST/PUT/PATCH/DELETE -> 405.
 # Add CORS and exception handlers.
+# Logging goes through the "csv_server" logger (see logs.py); /_metrics serves
+# Prometheus metrics and `?_profile=1` adds a Server-Timing header (metrics.py).
 
-from fastapi import FastAPI, HTTPException, status, Request
+from fastapi import BackgroundTasks, FastAPI, HTTPException, status, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional, Tuple
 from csv_server.storage.csv_store import CSVStorage
+from csv_server.storage.sqlite_store import SQLiteStorage
+from csv_server.storage.wal import DEFAULT_WINDOW, DEFAULT_BATCH
+from csv_server.offload import StorageExecutor, DEFAULT_THREADS
+from csv_server.watch import FileWatcher, DEFAULT_INTERVAL
+from csv_server.schema import HEAD_ROWS, SAMPLE_ROWS
+from csv_server.encoding import FastJSONResponse, RowFragments, dumps
+from csv_server.cache import DEFAULT_CACHE_BYTES, ResponseCache, etag, not_modified, query_key, validators
+from csv_server.exceptions import DuplicateKeyError, ResourceNotFoundError, ValidationError
+from csv_server.logs import configure_logging
+from csv_server.metrics import CONTENT_TYPE, PROFILE, Exposition, MetricsMiddleware, stage
+from csv_server.resources import DEFAULT_IDLE_TIMEOUT, Resource, ResourceRegistry
+from csv_server.streaming import FORMATS, negotiate_format, iter_ndjson, iter_csv, iter_body_rows
+import inspect
+import json
+import logging
 import os
-import csv
+from datetime import date, datetime
 
-def infer_column_types(file_path: Path) -> Dict[str, str]:
-    """Infer data types for each column by sampling the data."""
-    if not file_path.exists():
-        return {}
-    
-    with open(file_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-        
-    if not rows:
-        return {}
-    
-    schema = {}
-    for column in rows[0].keys():
-        # Sample values from this column (skip empty values)
-        values = [row[column] for row in rows[:10] if row[column].strip()]
-        
-        if not values:
-            schema[column] = "string"
-            continue
-            
-        # Try to infer type
-        all_int = True
-        all_float = True
-        
-        for value in values:
-            try:
-                int(value)
-            except ValueError:
-                all_int = False
-            
-            try:
-                float(value)
-            except ValueError:
-                all_float = False
-        
-        if all_int:
-            schema[column] = "integer"
-        elif all_float:
-            schema[column] = "float"
-        else:
-            schema[column] = "string"
-    
-    return schema
+logger = logging.getLogger(__name__)
 
 def validate_data(payload: Dict[str, Any], schema: Dict[str, str]) -> Dict[str, Any]:
     """
@@ -101,6 +78,19 @@ def validate_data(payload: Dict[str, Any], schema: Dict[str, str]) -> Dict[str,
                 else:
                     validated_payload[field] = str(float(value))
             
+            elif expected_type == "boolean":
+                text = str(value).strip().lower()
+                if text not in ("true", "false"):
+                    raise ValueError(value)
+                validated_payload[field] = text
+            
+            elif expected_type == "date":
+                validated_payload[field] = date.fromisoformat(str(value)).isoformat()
+            
+            elif expected_type == "datetime":
+                datetime.fromisoformat(str(value))
+                validated_payload[field] = str(value)
+            
             elif expected_type == "string":
                 validated_payload[field] = str(value)
             
@@ -130,8 +120,84 @@ def get_required_fields(schema: Dict[str, str], existing_data: List[Dict[str, An
     # This could be enhanced to check which fields are never empty in existing data
     return []
 
+def bulk_item(index: int, id: Any, result: Any, ok_status: int) -> Dict[str, Any]:
+    """Per-item entry of a bulk response: the outcome of one input row."""
+    if isinstance(result, DuplicateKeyError):
+        return {"index": index, "id": id, "status": 409, "error": str(result)}
+    if isinstance(result, KeyError):
+        return {"index": index, "id": id, "status": 404, "error": "Not found"}
+    if isinstance(result, Exception):
+        return {"index": index, "id": id, "status": 500, "error": str(result)}
+    return {"index": index, "id": id, "status": ok_status}
+
+def bulk_summary(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    succeeded = sum(1 for item in items if item["status"] < 400)
+    return {"total": len(items), "succeeded": succeeded, "failed": len(items) - succeeded, "items": items}
+
+def plan_headers(result: Dict[str, Any]) -> Dict[str, str]:
+    """Pop the storage's query plan off a result into an X-Query-Plan header."""
+    plan = result.pop("plan", None)
+    if plan is None:
+        return {}
+    return {"X-Query-Plan": (
+        f"index={','.join(plan['index'])}; candidates={plan['candidates']}"
+        if plan["index"] else "scan"
+    )}
+
+def release_after(response: Any, release: Callable[[], None]) -> Any:
+    """Call ``release`` once ``response`` no longer needs its storage.
+
+    A streamed body still reads from the storage after the endpoint returns, so
+    it is released by a background task once sent, or when the stream ends early
+    (a client that disconnects skips background tasks). Anything else right away.
+    """
+    if not isinstance(response, StreamingResponse):
+        release()
+        return response
+    released = False
+
+    def once() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            release()
+
+    body = response.body_iterator
+
+    async def guarded() -> AsyncIterator[Any]:
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            once()
+
+    response.body_iterator = guarded()
+    tasks = BackgroundTasks()
+    if response.background is not None:
+        tasks.add_task(response.background)
+    tasks.add_task(once)
+    response.background = tasks
+    return response
+
 def create_app(data_dir: Path, readonly: bool = True, config: dict = None) -> FastAPI:
-    app = FastAPI(title="CSV Server", docs_url="/docs")
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        for watcher in app.state.watchers.values():
+            watcher.start()
+        if app.state.registry is not None:
+            app.state.registry.start()
+        yield
+        if app.state.registry is not None:
+            app.state.registry.stop()
+            app.state.registry.close()
+        for watcher in app.state.watchers.values():
+            watcher.stop()
+        # Flush and release every backend (e.g. pending SQLite exports)
+        for storage in app.state.storages.values():
+            storage.close()
+        app.state.executor.shutdown()
+
+    app = FastAPI(title="CSV Server", docs_url="/docs", lifespan=lifespan)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
@@ -141,99 +207,267 @@ def create_app(data_dir: Path, readonly: bool = True, config: dict = None) -> Fa
 
     if config is None:
         config = {"resources": {}}
+    if "log_level" in config or "log_format" in config:
+        configure_logging(config.get("log_level", "INFO"), config.get("log_format", "text"))
 
     # Store config and data_dir in app state for the universal schema endpoint
     app.state.config = config
     app.state.data_dir = data_dir
+    app.state.storages = {}
+    app.state.watchers = {}
+    app.state.registry = None
+    # Storage calls block (parsing, rewrites), so they run on a bounded thread pool.
+    executor = StorageExecutor(config.get("storage_threads", DEFAULT_THREADS))
+    app.state.executor = executor
+    response_cache = ResponseCache(config.get("response_cache_bytes", DEFAULT_CACHE_BYTES))
+    app.state.response_cache = response_cache
+    # Opt-in: orjson (when installed) for every generated route, and row fragment reuse.
+    fast_json = config.get("fast_json", False)
+    response_class = FastJSONResponse if fast_json else JSONResponse
+    app.state.fragments = {}
+    # (method, route template, status) -> latency histogram
+    app.state.request_metrics = {}
+    if config.get("metrics", True):
+        app.add_middleware(MetricsMiddleware, requests=app.state.request_metrics)
+
+        @app.get("/_metrics", include_in_schema=False)
+        async def metrics():
+            """Prometheus text exposition of request, storage and cache metrics."""
+            exposition = Exposition()
+            for (method, route, code), histogram in list(app.state.request_metrics.items()):
+                exposition.histogram(
+                    "csv_server_request_duration_seconds", "Request latency by route.",
+                    {"method": method, "route": route, "status": code}, histogram,
+                )
+            for name, storage in app.state.storages.items():
+                labels = {"resource": name}
+                storage_metrics = getattr(storage, "metrics", None)
+                if storage_metrics is not None:
+                    exposition.storage(name, storage_metrics)
+                if isinstance(storage, CSVStorage):
+                    exposition.cache("table", labels, storage.cache_hits, storage.cache_misses)
+                    exposition.cache("index", labels, storage.index_hits, storage.index_misses)
+            for name, fragments in app.state.fragments.items():
+                exposition.cache("row_fragments", {"resource": name}, fragments.hits, fragments.misses)
+            cached = response_cache.info()
+            exposition.cache("response", {}, cached["hits"], cached["misses"])
+            exposition.sample("csv_server_response_cache_entries", "gauge",
+                              "Responses held in the response cache.", {}, cached["entries"])
+            exposition.sample("csv_server_response_cache_bytes", "gauge",
+                              "Body bytes held in the response cache.", {}, cached["bytes"])
+            exposition.sample("csv_server_response_cache_max_bytes", "gauge",
+                              "Response cache capacity in bytes.", {}, cached["max_bytes"])
+            return Response(exposition.text(), media_type=CONTENT_TYPE)
 
     # Universal schema endpoint
     @app.get("/{resource_name}/schema", tags=["Schema"])
-    async def get_schema(resource_name: str):
+    async def get_schema(resource_name: str, request: Request):
         """Get schema for any resource by extracting resource name from URL."""
-        print(f"DEBUG: Schema endpoint called for resource: {resource_name}")
-        
+        registry = app.state.registry
+        if registry is not None:
+            handlers = await open_resource(resource_name)
+            try:
+                return await schema_response(resource_name, handlers.storage, request)
+            finally:
+                registry.release(resource_name)
+
         # Check if resource exists in config
         if resource_name not in app.state.config.get("resources", {}):
             raise HTTPException(status_code=404, detail=f"Resource '{resource_name}' not found")
+        return await schema_response(resource_name, app.state.storages[resource_name], request)
+
+    async def schema_response(resource_name: str, storage, request: Request) -> Response:
+        version = storage.version()
+        headers = {}
+        if version is not None:
+            headers = validators(etag(version[0], "schema"), version[1])
+            if not_modified(request, headers["ETag"], version[1]):
+                return Response(status_code=304, headers=headers)
+        schema = await executor.run(resource_name, storage.describe_schema)
+        logger.debug("schema of %s: %d columns", resource_name, len(schema["schema"]),
+                     extra={"resource": resource_name})
         
-        # Get file path for this resource
-        resource_cfg = app.state.config["resources"][resource_name]
-        file_path = app.state.data_dir / resource_cfg["file"]
-        
-        # Generate schema on-the-fly
-        schema = infer_column_types(file_path)
-        print(f"DEBUG: Generated schema for {resource_name}: {schema}")
-        
-        return {"schema": schema}
+        return JSONResponse(schema, headers=headers)
 
     # Define RouteHandlers class
     class RouteHandlers:
-        def __init__(self, storage_instance, resource_name):
+        def __init__(self, storage_instance, resource_name, readonly=False):
             self.storage = storage_instance
             self.resource_name = resource_name
-            self._schema_cache = None
+            self.readonly = readonly
+            self.fragments = RowFragments(storage_instance.pk)
 
-        def get_schema(self) -> Dict[str, str]:
-            """Get cached schema or compute it."""
-            if self._schema_cache is None:
-                self._schema_cache = infer_column_types(self.storage.path)
-            return self._schema_cache
+        async def call(self, fn, *args, **kwargs):
+            """Run a blocking storage call on the pool, within this resource's limit."""
+            return await executor.run(self.resource_name, fn, *args, **kwargs)
 
-        def invalidate_schema_cache(self):
-            """Invalidate schema cache when data structure changes."""
-            self._schema_cache = None
+        def conditional(self, request: Request, variant: str = "") -> Tuple[Dict[str, str], Optional[Response]]:
+            """Validator headers for the current version, plus a 304 if the client is up to date.
 
-        async def list_rows(self, limit: int = 50, offset: int = 0):
-            rows = self.storage.list(limit=limit, offset=offset)
-            return {"items": rows, "total": len(self.storage.list(10000, 0))}
+            Versions come from a stat and counters, so this runs on the loop without
+            touching the file.
+            """
+            version = self.storage.version()
+            if version is None:
+                return {}, None
+            headers = validators(etag(version[0], variant), version[1])
+            if not_modified(request, headers["ETag"], version[1]):
+                return headers, Response(status_code=304, headers=headers)
+            return headers, None
 
-        async def get_row(self, item_id: str):
-            row = self.storage.get(item_id)
-            if not row:
-                raise HTTPException(status_code=404, detail="Not found")
-            return row
+        def encode(self, result: Any, page: bool) -> bytes:
+            """JSON body bytes; with fast_json, pages are stitched from cached row encodings."""
+            if not fast_json:
+                return json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=dict).encode("utf-8")
+            version = self.storage.version()
+            if version is None:
+                return dumps(result)
+            self.fragments.sync(version[0])
+            return self.fragments.page(result) if page else self.fragments.encode(result)
+
+        async def cached_json(self, request: Request, headers: Dict[str, str], compute, page: bool = False) -> Response:
+            """Serve a JSON body from the response cache, or compute, encode and cache it."""
+            key = (self.resource_name, headers.get("ETag"), request.url.path, query_key(request))
+            # Profiled requests always do the work, so their timings mean something.
+            cached = response_cache.get(key) if headers and PROFILE.get() is None else None
+            if cached is None:
+                result, extra = await compute()
+                with stage("serialize"):
+                    body = self.encode(result, page)
+                if headers:
+                    response_cache.put(key, body, extra)
+                cached = (body, extra)
+            body, extra = cached
+            return Response(content=body, media_type="application/json", headers={**headers, **extra})
+
+        async def get_schema(self) -> Dict[str, str]:
+            """The storage's schema; sampled once, then kept current by its writes."""
+            return await self.call(self.storage.get_schema)
+
+        async def list_rows(
+            self,
+            request: Request,
+            limit: Optional[int] = Query(None, ge=0),
+            offset: int = Query(0, ge=0),
+            q: Optional[str] = None,
+            filters: Optional[List[str]] = Query(None, alias="filter"),
+            sort: Optional[str] = None,
+            format: Optional[str] = None,
+        ):
+            try:
+                fmt = negotiate_format(format, request.headers.get("accept"))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+            headers, not_modified_response = self.conditional(request, fmt)
+            if not_modified_response is not None:
+                return not_modified_response
+            if fmt != "json":
+                # Streamed exports default to every matching row.
+                try:
+                    rows = await self.call(
+                        self.storage.stream,
+                        q=q, filters=filters, sort=sort, limit=limit, offset=offset,
+                        schema=await self.get_schema(),
+                    )
+                except ValidationError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                encode = iter_ndjson if fmt == "ndjson" else iter_csv
+                body = executor.iterate(self.resource_name, encode(rows))
+                return StreamingResponse(body, media_type=FORMATS[fmt], headers=headers)
+
+            if limit is None:
+                limit = 50
+
+            async def compute():
+                if not (q or filters or sort):
+                    def page():
+                        return {"items": self.storage.list(limit=limit, offset=offset),
+                                "total": self.storage.count()}
+                    return await self.call(page), {}
+                try:
+                    result = await self.call(
+                        self.storage.query,
+                        q=q, filters=filters, sort=sort, limit=limit, offset=offset,
+                        schema=await self.get_schema(),
+                    )
+                except ValidationError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                return result, plan_headers(result)
+            return await self.cached_json(request, headers, compute, page=True)
+
+        async def aggregate(
+            self,
+            request: Request,
+            group_by: Optional[str] = None,
+            metrics: Optional[str] = None,
+            q: Optional[str] = None,
+            filters: Optional[List[str]] = Query(None, alias="filter"),
+        ):
+            headers, not_modified_response = self.conditional(request, "aggregate")
+            if not_modified_response is not None:
+                return not_modified_response
+
+            async def compute():
+                try:
+                    result = await self.call(
+                        self.storage.aggregate,
+                        group_by=group_by, metrics=metrics, q=q, filters=filters,
+                        schema=await self.get_schema(),
+                    )
+                except ValidationError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                return result, plan_headers(result)
+            return await self.cached_json(request, headers, compute)
+
+        async def get_row(self, item_id: str, request: Request):
+            headers, not_modified_response = self.conditional(request)
+            if not_modified_response is not None:
+                return not_modified_response
+
+            async def compute():
+                row = await self.call(self.storage.get, item_id)
+                if not row:
+                    raise HTTPException(status_code=404, detail="Not found")
+                return row, {}
+            return await self.cached_json(request, headers, compute)
 
         async def create_row(self, payload: Dict[str, Any]):
-            print(f"DEBUG: Creating row with payload: {payload}")
+            logger.debug("creating row in %s", self.resource_name,
+                         extra={"resource": self.resource_name, "fields": sorted(payload)})
             
             # Get schema and validate data
-            schema = self.get_schema()
-            print(f"DEBUG: Using schema for validation: {schema}")
+            schema = await self.get_schema()
             
             try:
                 validated_payload = validate_data(payload, schema)
-                print(f"DEBUG: Validated payload: {validated_payload}")
                 
                 # Create the row
-                result = self.storage.create(validated_payload)
-                
-                # Invalidate schema cache in case new columns were added
-                self.invalidate_schema_cache()
+                result = await self.call(self.storage.create, validated_payload)
                 
                 return result
                 
+            except DuplicateKeyError as e:
+                raise HTTPException(status_code=409, detail=str(e))
             except HTTPException:
                 raise  # Re-raise validation errors
             except Exception as e:
-                print(f"DEBUG: Error creating row: {e}")
+                logger.exception("creating a row in %s failed", self.resource_name,
+                                 extra={"resource": self.resource_name})
                 raise HTTPException(status_code=500, detail=f"Failed to create row: {str(e)}")
 
         async def update_row(self, item_id: str, payload: Dict[str, Any]):
-            print(f"DEBUG: Updating row {item_id} with payload: {payload}")
+            logger.debug("updating %s/%s", self.resource_name, item_id,
+                         extra={"resource": self.resource_name, "id": item_id, "fields": sorted(payload)})
             
             # Get schema and validate data
-            schema = self.get_schema()
-            print(f"DEBUG: Using schema for validation: {schema}")
+            schema = await self.get_schema()
             
             try:
                 validated_payload = validate_data(payload, schema)
-                print(f"DEBUG: Validated payload: {validated_payload}")
                 
                 # Update the row
-                result = self.storage.update(item_id, validated_payload)
-                
-                # Invalidate schema cache in case new columns were added
-                self.invalidate_schema_cache()
+                result = await self.call(self.storage.update, item_id, validated_payload)
                 
                 return result
                 
@@ -242,38 +476,220 @@ def create_app(data_dir: Path, readonly: bool = True, config: dict = None) -> Fa
             except HTTPException:
                 raise  # Re-raise validation errors
             except Exception as e:
-                print(f"DEBUG: Error updating row: {e}")
+                logger.exception("updating %s/%s failed", self.resource_name, item_id,
+                                 extra={"resource": self.resource_name, "id": item_id})
                 raise HTTPException(status_code=500, detail=f"Failed to update row: {str(e)}")
 
         async def delete_row(self, item_id: str):
-            self.storage.delete(item_id)
-            return JSONResponse(status_code=204, content={})
+            await self.call(self.storage.delete, item_id)
+            return Response(status_code=204)
 
-    # Create routes for each resource (excluding schema - handled by universal endpoint)
-    for name, resource_cfg in config.get("resources", {}).items():
-        print(f"DEBUG: Processing resource: {name}")
+        async def read_bulk_body(self, request: Request) -> List[Any]:
+            try:
+                return [item async for item in iter_body_rows(
+                    request.stream(), request.headers.get("content-type"))]
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid bulk body: {e}")
+
+        async def validate_bulk(self, items: List[Any], summary: List[Optional[Dict[str, Any]]]) -> List[Any]:
+            """Validate every object against the cached schema; failures go straight to summary."""
+            schema = await self.get_schema()
+            valid = []
+            for index, item in enumerate(items):
+                if summary[index] is not None:
+                    continue
+                if not isinstance(item, dict):
+                    summary[index] = {"index": index, "id": None, "status": 422, "error": "Expected an object"}
+                    continue
+                try:
+                    valid.append((index, validate_data(item, schema)))
+                except HTTPException as e:
+                    summary[index] = {
+                        "index": index, "id": item.get(self.storage.pk), "status": 422,
+                        "error": e.detail["errors"],
+                    }
+            return valid
+
+        async def bulk_create(self, request: Request):
+            """Create rows from a JSON array, NDJSON or CSV body with a single write."""
+            items = await self.read_bulk_body(request)
+            summary: List[Optional[Dict[str, Any]]] = [None] * len(items)
+            valid = await self.validate_bulk(items, summary)
+            results = await self.call(self.storage.bulk_create, [data for _, data in valid])
+            for (index, data), result in zip(valid, results):
+                id = result.get(self.storage.pk) if isinstance(result, dict) else data.get(self.storage.pk)
+                summary[index] = bulk_item(index, id, result, 201)
+            return bulk_summary(summary)
+
+        async def bulk_update(self, request: Request):
+            """Merge changes into rows identified by their primary key, with a single write."""
+            items = await self.read_bulk_body(request)
+            summary: List[Optional[Dict[str, Any]]] = [None] * len(items)
+            pk = self.storage.pk
+            for index, item in enumerate(items):
+                if isinstance(item, dict) and item.get(pk) in (None, ""):
+                    summary[index] = {"index": index, "id": None, "status": 422, "error": f"Missing '{pk}'"}
+                    items[index] = None
+            valid = await self.validate_bulk(items, summary)
+            changes = [(str(data.pop(pk)), data) for _, data in valid]
+            results = await self.call(self.storage.bulk_update, changes)
+            for (index, _), (id, _), result in zip(valid, changes, results):
+                summary[index] = bulk_item(index, id, result, 200)
+            return bulk_summary(summary)
+
+        async def bulk_delete(self, request: Request):
+            """Delete rows by id (a list of ids or of objects carrying the key) with a single write."""
+            items = await self.read_bulk_body(request)
+            pk = self.storage.pk
+            ids = [str(item.get(pk, "")) if isinstance(item, dict) else str(item) for item in items]
+            results = await self.call(self.storage.bulk_delete, ids)
+            return bulk_summary([
+                bulk_item(index, id, result, 204) for index, (id, result) in enumerate(zip(ids, results))
+            ])
+
+    # Binary column sidecars (storage/sidecar.py); relative paths are under data_dir.
+    cache_dir = data_dir / config["cache_dir"] if config.get("cache_dir") else None
+
+    def open_storage(name: str, resource_cfg: Dict[str, Any]):
+        """Build the storage backend of one resource, with its watcher if configured."""
         file = data_dir / resource_cfg["file"]
         pk = resource_cfg.get("primary_key", "id")
+        if resource_cfg.get("backend", "csv") == "sqlite":
+            storage = SQLiteStorage(
+                file,
+                pk=pk,
+                indexes=resource_cfg.get("indexes"),
+                export_interval=resource_cfg.get("export_interval"),
+                schema_head=resource_cfg.get("schema_head", HEAD_ROWS),
+                schema_sample=resource_cfg.get("schema_sample", SAMPLE_ROWS),
+            )
+        else:
+            storage = CSVStorage(
+                file,
+                pk=pk,
+                resident=resource_cfg.get("resident", False),
+                indexes=resource_cfg.get("indexes"),
+                search_index=resource_cfg.get("search_index", False),
+                use_mmap=resource_cfg.get("mmap", False),
+                columnar=resource_cfg.get("layout", "rows") == "columnar",
+                wal=resource_cfg.get("wal", False),
+                wal_window=resource_cfg.get("wal_window", DEFAULT_WINDOW),
+                wal_batch=resource_cfg.get("wal_batch", DEFAULT_BATCH),
+                checkpoint_interval=resource_cfg.get("checkpoint_interval", 5.0),
+                process_lock=config.get("multiprocess", False),
+                schema_head=resource_cfg.get("schema_head", HEAD_ROWS),
+                schema_sample=resource_cfg.get("schema_sample", SAMPLE_ROWS),
+                aggregates=resource_cfg.get("aggregates"),
+                cache_dir=cache_dir,
+            )
+            if resource_cfg.get("watch", False):
+                app.state.watchers[name] = FileWatcher(
+                    name, storage, resource_cfg.get("watch_interval", DEFAULT_INTERVAL),
+                )
+        app.state.storages[name] = storage
+        executor.limit(name, resource_cfg.get("max_concurrency"))
+        return storage
+
+    if config.get("lazy_resources", False):
+        def opener(resource: Resource) -> RouteHandlers:
+            storage = open_storage(resource.name, resource.config())
+            handlers = RouteHandlers(storage, resource.name, resource.readonly)
+            app.state.fragments[resource.name] = handlers.fragments
+            watcher = app.state.watchers.get(resource.name)
+            if watcher is not None:
+                watcher.start()
+            return handlers
+
+        def closer(handlers: RouteHandlers) -> None:
+            name = handlers.resource_name
+            watcher = app.state.watchers.pop(name, None)
+            if watcher is not None:
+                watcher.stop()
+            app.state.storages.pop(name, None)
+            app.state.fragments.pop(name, None)
+            handlers.storage.close()
+
+        registry = ResourceRegistry(
+            data_dir,
+            discover=config.get("discover", True),
+            readonly=readonly,
+            opener=opener,
+            closer=closer,
+            idle_timeout=config.get("idle_timeout", DEFAULT_IDLE_TIMEOUT),
+            max_open=config.get("max_open_resources"),
+        )
+        registry.register_config(config.get("resources", {}), readonly)
+        app.state.registry = registry
+
+        async def open_resource(name: str) -> RouteHandlers:
+            try:
+                return await executor.run(name, registry.acquire, name)
+            except ResourceNotFoundError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+
+        def dynamic(method: str, write: bool = False):
+            """Endpoint running RouteHandlers.<method> of the resource named in the path."""
+            async def endpoint(resource: str, **kwargs):
+                handlers = await open_resource(resource)
+                try:
+                    if write and handlers.readonly:
+                        raise HTTPException(status_code=405, detail="Method Not Allowed")
+                    response = await getattr(handlers, method)(**kwargs)
+                except BaseException:
+                    registry.release(resource)
+                    raise
+                return release_after(response, lambda: registry.release(resource))
+
+            # FastAPI reads parameters off the signature: the handler's, plus the path's resource.
+            params = list(inspect.signature(getattr(RouteHandlers, method)).parameters.values())[1:]
+            resource_param = inspect.Parameter("resource", inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=str)
+            endpoint.__signature__ = inspect.Signature([resource_param, *params])
+            endpoint.__name__ = method
+            return endpoint
+
+        # One route per method and shape, whatever the number of resources.
+        route = {"tags": ["Resources"], "response_class": response_class}
+        app.get("/{resource}", **route)(dynamic("list_rows"))
+        app.get("/{resource}/_aggregate", **route)(dynamic("aggregate"))
+        app.post("/{resource}/_bulk", **route)(dynamic("bulk_create", write=True))
+        app.patch("/{resource}/_bulk", **route)(dynamic("bulk_update", write=True))
+        app.delete("/{resource}/_bulk", **route)(dynamic("bulk_delete", write=True))
+        app.get("/{resource}/{item_id}", **route)(dynamic("get_row"))
+        app.post("/{resource}", status_code=201, **route)(dynamic("create_row", write=True))
+        app.put("/{resource}/{item_id}", **route)(dynamic("update_row", write=True))
+        app.delete("/{resource}/{item_id}", status_code=204, **route)(dynamic("delete_row", write=True))
+
+    # Create routes for each resource (excluding schema - handled by universal endpoint)
+    eager = config.get("resources", {}) if app.state.registry is None else {}
+    for name, resource_cfg in eager.items():
         res_readonly = resource_cfg.get("readonly", readonly)
-        storage = CSVStorage(file, pk=pk)
-        
+        storage = open_storage(name, resource_cfg)
+
         route_prefix = f"/{name}"
-        print(f"DEBUG: Registering routes with prefix: {route_prefix}")
+        route = {"tags": [name], "response_class": response_class}
+        logger.debug("registering routes for %s at %s", name, route_prefix, extra={"resource": name})
 
         # Create handlers instance
-        handlers = RouteHandlers(storage, name)
+        handlers = RouteHandlers(storage, name, res_readonly)
+        app.state.fragments[name] = handlers.fragments
 
-        app.get(route_prefix, tags=[name])(handlers.list_rows)
-        app.get(f"{route_prefix}/{{item_id}}", tags=[name])(handlers.get_row)
+        app.get(route_prefix, **route)(handlers.list_rows)
+        app.get(f"{route_prefix}/_aggregate", **route)(handlers.aggregate)
+        app.get(f"{route_prefix}/{{item_id}}", **route)(handlers.get_row)
 
         if not res_readonly:
-            app.post(route_prefix, status_code=201, tags=[name])(handlers.create_row)
-            app.put(f"{route_prefix}/{{item_id}}", tags=[name])(handlers.update_row)
-            app.delete(f"{route_prefix}/{{item_id}}", status_code=204, tags=[name])(handlers.delete_row)
+            # Registered before the item routes so "_bulk" isn't taken for an id.
+            app.post(f"{route_prefix}/_bulk", **route)(handlers.bulk_create)
+            app.patch(f"{route_prefix}/_bulk", **route)(handlers.bulk_update)
+            app.delete(f"{route_prefix}/_bulk", **route)(handlers.bulk_delete)
+            app.post(route_prefix, status_code=201, **route)(handlers.create_row)
+            app.put(f"{route_prefix}/{{item_id}}", **route)(handlers.update_row)
+            app.delete(f"{route_prefix}/{{item_id}}", status_code=204, **route)(handlers.delete_row)
 
     @app.exception_handler(Exception)
     async def generic_exception_handler(request: Request, exc: Exception):
-        print(f"DEBUG: Exception caught: {exc}")
+        logger.error("unhandled error on %s %s", request.method, request.url.path,
+                     exc_info=exc, extra={"path": request.url.path})
         return JSONResponse(
             status_code=500,
             content={"detail": str(exc)},
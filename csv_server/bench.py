@@ -0,0 +1,230 @@
+# Benchmarks for CSV Server (`csv-server bench`).
+# Generates synthetic users/orders CSVs of a given row count (kept between runs
+# under the data directory), serves a fresh copy of them per run with create_app
+# (so writes never drift the kept data set from a baseline's) and times list,
+# get-by-id, filtered, sorted, create, update and delete requests, either
+# in-process through the ASGI test client or over HTTP against a real uvicorn.
+# Each operation reports req/s and p50/p95/p99 latency. Results are plain JSON,
+# so a run can be saved as a baseline and later runs compared against it.
+
+import csv
+import json
+import math
+import platform
+import random
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from csv_server.version import __version__
+
+OPERATIONS = ("list", "get", "filtered", "sorted", "create", "update", "delete")
+STATUSES = ("pending", "paid", "shipped", "delivered", "cancelled")
+CITIES = ("Berlin", "Lisbon", "Nairobi", "Osaka", "Toronto", "Lima", "Austin", "Oslo")
+
+_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+def parse_size(text: str) -> int:
+    """"10k" -> 10000, "1M" -> 1000000, "2500" -> 2500."""
+    text = text.strip().lower().replace("_", "")
+    multiplier = _SUFFIXES.get(text[-1:], 1)
+    number = text[:-1] if multiplier != 1 else text
+    try:
+        rows = int(float(number) * multiplier)
+    except ValueError:
+        raise ValueError(f"Invalid row count '{text}'")
+    if rows < 1:
+        raise ValueError(f"Invalid row count '{text}'")
+    return rows
+
+def generate(data_dir: Path, rows: int, seed: int = 0) -> Path:
+    """Write users.csv and orders.csv with ``rows`` rows each into ``data_dir/<rows>``, once."""
+    target = Path(data_dir) / str(rows)
+    done = target / ".complete"
+    if done.exists():
+        return target
+    target.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    with open(target / "users.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "email", "age", "city", "created_at"])
+        for i in range(1, rows + 1):
+            writer.writerow([
+                i, f"user{i}", f"user{i}@example.com", rng.randint(18, 90), rng.choice(CITIES),
+                f"20{rng.randint(15, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            ])
+    with open(target / "orders.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "user_id", "status", "amount", "created_at"])
+        for i in range(1, rows + 1):
+            writer.writerow([
+                i, rng.randint(1, rows), rng.choice(STATUSES), f"{rng.uniform(1, 1000):.2f}",
+                f"20{rng.randint(15, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            ])
+    done.touch()
+    return target
+
+def default_config() -> Dict[str, Any]:
+    return {"resources": {
+        "users": {"file": "users.csv", "readonly": False},
+        "orders": {"file": "orders.csv", "readonly": False},
+    }}
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def summarize(latencies: List[float], seconds: float) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "rps": round(len(ordered) / seconds, 1) if seconds else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+    }
+
+def _requests(operation: str, rows: int, rng: random.Random, created: List[str]) -> Tuple[str, str, Dict[str, Any]]:
+    """(method, path, httpx keyword arguments) for one request of ``operation``."""
+    if operation == "list":
+        return "GET", "/orders", {"params": {"limit": 50, "offset": rng.randrange(rows)}}
+    if operation == "get":
+        return "GET", f"/users/{rng.randint(1, rows)}", {}
+    if operation == "filtered":
+        return "GET", "/orders", {"params": [
+            ("filter", f"status:eq:{rng.choice(STATUSES)}"), ("filter", f"amount:gt:{rng.randint(1, 999)}"),
+            ("limit", "50"),
+        ]}
+    if operation == "sorted":
+        return "GET", "/orders", {"params": {"sort": "-amount", "limit": 50, "offset": rng.randrange(min(rows, 1000))}}
+    if operation == "create":
+        return "POST", "/orders", {"json": {
+            "user_id": str(rng.randint(1, rows)), "status": rng.choice(STATUSES),
+            "amount": f"{rng.uniform(1, 1000):.2f}", "created_at": "2025-01-01",
+        }}
+    if operation == "update":
+        return "PUT", f"/orders/{rng.randint(1, rows)}", {"json": {"status": rng.choice(STATUSES)}}
+    if operation == "delete":
+        # Deletes remove rows added by create, so the data set stays the same.
+        return "DELETE", f"/orders/{created.pop()}", {}
+    raise ValueError(f"Unknown operation '{operation}'")
+
+def measure(send: Callable[..., Any], operation: str, rows: int, count: int,
+            created: List[str], seed: int = 0) -> Dict[str, float]:
+    """Time ``count`` requests of one operation, sent one after another."""
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    started = time.perf_counter()
+    if operation == "delete" and len(created) < count:
+        for _ in range(count - len(created)):  # untimed: rows to delete
+            method, path, kwargs = _requests("create", rows, rng, created)
+            created.append(str(send(method, path, **kwargs).json()["id"]))
+        started = time.perf_counter()
+    for _ in range(count):
+        method, path, kwargs = _requests(operation, rows, rng, created)
+        begin = time.perf_counter()
+        response = send(method, path, **kwargs)
+        latencies.append(time.perf_counter() - begin)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{operation}: {method} {path} returned {response.status_code}")
+        if operation == "create":
+            created.append(str(response.json()["id"]))
+    return summarize(latencies, time.perf_counter() - started)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@contextmanager
+def serve(app: Any, server: bool = False) -> Iterator[Callable[..., Any]]:
+    """Yield a request function for ``app``: the ASGI test client, or HTTP to a uvicorn thread."""
+    if not server:
+        from fastapi.testclient import TestClient
+        with TestClient(app) as client:
+            yield client.request
+        return
+    import httpx
+    import uvicorn
+    port = _free_port()
+    instance = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=instance.run, daemon=True)
+    thread.start()
+    while not instance.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn failed to start")
+        time.sleep(0.01)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            yield client.request
+    finally:
+        instance.should_exit = True
+        thread.join()
+
+def _run_size(app: Any, rows: int, requests: int, operations: Optional[List[str]], server: bool,
+              progress: Optional[Callable[[int, str, Dict[str, float]], None]]) -> Dict[str, Dict[str, float]]:
+    """Time every operation against ``app``, serving a data set of ``rows`` rows."""
+    results: Dict[str, Dict[str, float]] = {}
+    created: List[str] = []
+    with serve(app, server) as send:
+        # Warm up: load and index both files before timing anything.
+        send("GET", "/users/1")
+        send("GET", "/orders", params={"limit": 1})
+        for operation in operations or OPERATIONS:
+            stats = measure(send, operation, rows, requests, created)
+            results[operation] = stats
+            if progress is not None:
+                progress(rows, operation, stats)
+    return results
+
+def run(sizes: List[int], data_dir: Path, requests: int = 200,
+        operations: Optional[List[str]] = None, server: bool = False,
+        config: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[[int, str, Dict[str, float]], None]] = None) -> Dict[str, Any]:
+    """Benchmark every operation at every size; returns the JSON-ready report."""
+    from csv_server.app import create_app
+
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for rows in sizes:
+        source = generate(data_dir, rows)
+        with tempfile.TemporaryDirectory(prefix="csv-server-bench-") as scratch:
+            target = Path(scratch)
+            for name in ("users.csv", "orders.csv"):
+                shutil.copyfile(source / name, target / name)
+            results[str(rows)] = _run_size(create_app(target, readonly=False, config=config or default_config()),
+                                           rows, requests, operations, server, progress)
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "mode": "server" if server else "in-process",
+        "requests": requests,
+        "results": results,
+    }
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.1) -> List[str]:
+    """Regressions of ``current`` against ``baseline``: req/s down or p95 up by more than ``threshold``."""
+    regressions = []
+    for size, operations in current["results"].items():
+        for operation, stats in operations.items():
+            base = baseline.get("results", {}).get(size, {}).get(operation)
+            if base is None:
+                continue
+            if stats["rps"] < base["rps"] * (1 - threshold):
+                regressions.append(f"{size} rows {operation}: {stats['rps']} req/s vs {base['rps']} baseline")
+            if stats["p95_ms"] > base["p95_ms"] * (1 + threshold):
+                regressions.append(f"{size} rows {operation}: p95 {stats['p95_ms']} ms vs {base['p95_ms']} baseline")
+    return regressions
+
+def load(path: Path) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save(report: Dict[str, Any], path: Path) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,80 @@
+# HTTP conditional requests and an in-memory response cache.
+# Every storage reports a version (BaseStorage.version): a token that changes
+# with the data, and a last-modified time. They become the ETag and
+# Last-Modified of list, item and schema responses, and a request whose
+# If-None-Match (or If-Modified-Since) still matches gets a 304 before storage
+# is asked for anything.
+# Encoded JSON bodies are kept in an LRU keyed by (resource, version, normalized
+# query) within a byte budget. A write moves the version on, so stale entries
+# are never served; they just age out.
+
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Hashable, Optional, Tuple
+from fastapi import Request
+
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+
+def etag(token: str, variant: str = "") -> str:
+    return f'"{token}-{variant}"' if variant else f'"{token}"'
+
+def validators(tag: str, last_modified: float) -> Dict[str, str]:
+    return {"ETag": tag, "Last-Modified": formatdate(last_modified, usegmt=True)}
+
+def not_modified(request: Request, tag: str, last_modified: float) -> bool:
+    """Whether the client's copy is current; If-None-Match wins over If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [t.strip() for t in if_none_match.split(",")]
+        # Weak comparison: W/"x" matches "x".
+        return "*" in candidates or tag in [t[2:] if t.startswith("W/") else t for t in candidates]
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+def query_key(request: Request) -> Tuple[Tuple[str, str], ...]:
+    """Query parameters in a canonical order, so equivalent URLs share cache entries."""
+    return tuple(sorted(request.query_params.multi_items()))
+
+class ResponseCache:
+    """LRU of encoded response bodies (plus extra headers) within ``max_bytes``."""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[bytes, Dict[str, str]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, Dict[str, str]]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+        if len(body) > self.max_bytes // 4:
+            return  # one huge page shouldn't flush everything else
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old[0])
+        self._entries[key] = (body, headers or {})
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def info(self) -> Dict[str, Any]:
+        return {"entries": len(self), "bytes": self.size, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
@@ -3,6 +3,8 @@
 import click
 from pathlib import Path
 from .version import __version__
+from .bench import OPERATIONS, parse_size
+from .logs import LOG_LEVELS
 
 
 @click.group()
@@ -23,7 +25,15 @@ def main():
 @click.option('--readonly', is_flag=True, help='Enable readonly mode (only GET requests)')
 @click.option('--config', '-c', type=click.Path(exists=True), help='Path to YAML config file')
 @click.option('--reload', is_flag=True, help='Enable auto-reload for development')
-def serve(data_dir, host, port, readonly, config, reload):
+@click.option('--workers', default=1, type=click.IntRange(min=1),
+              help='Worker processes; CSV access is locked across them')
+@click.option('--log-level', type=click.Choice(LOG_LEVELS, case_sensitive=False),
+              help='Log level (default: the config\'s log_level)')
+@click.option('--lazy', is_flag=True,
+              help='Open resources on first request and serve new CSVs without a restart')
+@click.option('--cache-dir', type=click.Path(file_okay=False),
+              help='Directory for binary column sidecars that let restarts skip CSV parsing')
+def serve(data_dir, host, port, readonly, config, reload, workers, log_level, lazy, cache_dir):
     """Serve CSV files as REST API.
     
     Examples:
@@ -32,6 +42,10 @@ def serve(data_dir, host, port, readonly, config, reload):
         csv-server serve ./data --config config.yaml
         csv-server serve ./data --readonly
         csv-server serve ./data --reload
+        csv-server serve ./data --workers 8
+        csv-server serve ./data --log-level debug
+        csv-server serve ./data --lazy
+        csv-server serve ./data --cache-dir /var/cache/csv-server
     """
     try:
         # Import here to avoid circular imports
@@ -43,7 +57,11 @@ def serve(data_dir, host, port, readonly, config, reload):
             port=port,
             readonly=readonly,
             config_file=config,
-            auto_reload=reload
+            auto_reload=reload,
+            workers=workers,
+            log_level=log_level,
+            lazy=lazy,
+            cache_dir=cache_dir
         )
     except Exception as e:
         click.echo(f"Error: {e}", err=True)
@@ -88,5 +106,60 @@ def discover(data_dir, output, readonly):
         raise click.Abort()
 
 
+
+def _sizes(ctx, param, value):
+    try:
+        return [parse_size(v) for v in value]
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+@main.command()
+@click.option('--rows', '-n', multiple=True, default=['10k'], callback=_sizes,
+              help='Rows per generated CSV, e.g. 10k, 100k, 1M, 10M (repeatable)')
+@click.option('--requests', '-r', default=200, type=click.IntRange(min=1), help='Requests per operation')
+@click.option('--operation', 'operations', multiple=True, type=click.Choice(OPERATIONS), help='Operations to run (default: all)')
+@click.option('--server', is_flag=True, help='Benchmark a real uvicorn server instead of the in-process client')
+@click.option('--config', '-c', type=click.Path(exists=True), help='Resource config for users.csv/orders.csv')
+@click.option('--data-dir', default='.bench-data', type=click.Path(file_okay=False),
+              help='Where generated CSVs are kept between runs')
+@click.option('--output', '-o', type=click.Path(), help='Write results as JSON')
+@click.option('--baseline', type=click.Path(exists=True), help='Compare against saved results')
+@click.option('--threshold', default=0.1, type=click.FloatRange(min=0), help='Allowed regression (0.1 = 10%)')
+def bench(rows, requests, operations, server, config, data_dir, output, baseline, threshold):
+    """Benchmark the API on generated users/orders CSVs.
+    
+    Examples:
+    
+        csv-server bench
+        csv-server bench -n 100k -n 1M --output results.json
+        csv-server bench --config benchmarks/columnar.yaml --baseline results.json
+        csv-server bench --server --operation get --operation list
+    """
+    from . import bench as benchmarks
+    from .config import load_config
+
+    def progress(size, operation, stats):
+        click.echo(
+            f"{size:>10} {operation:<9} {stats['rps']:>10.1f} req/s  "
+            f"p50 {stats['p50_ms']:.2f}  p95 {stats['p95_ms']:.2f}  p99 {stats['p99_ms']:.2f} ms"
+        )
+
+    report = benchmarks.run(
+        rows, Path(data_dir), requests=requests, operations=list(operations) or None,
+        server=server, config=load_config(config) if config else None, progress=progress,
+    )
+    if output:
+        benchmarks.save(report, Path(output))
+        click.echo(f"Results saved to {output}")
+    if baseline:
+        regressions = benchmarks.compare(report, benchmarks.load(Path(baseline)), threshold)
+        for regression in regressions:
+            click.echo(f"REGRESSION {regression}", err=True)
+        if regressions:
+            raise SystemExit(1)
+        click.echo(f"No regressions beyond {threshold:.0%} of {baseline}")
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
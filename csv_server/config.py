@@ -3,7 +3,9 @@
 import yaml
 from pathlib import Path
 from typing import Dict, Any, Optional
-from .exceptions import ConfigurationError
+from .aggregate import parse_metrics
+from .exceptions import ConfigurationError, ValidationError
+from .logs import LOG_FORMATS, LOG_LEVELS
 
 
 def load_config(config_path: str) -> Dict[str, Any]:
@@ -29,6 +31,7 @@ def load_config(config_path: str) -> Dict[str, Any]:
         if "resources" not in config:
             config["resources"] = {}
         
+        validate_config(config)
         return config
         
     except FileNotFoundError:
@@ -101,6 +104,36 @@ def validate_config(config: Dict[str, Any]) -> None:
     if not isinstance(resources, dict):
         raise ConfigurationError("'resources' must be a dictionary")
     
+    for flag in ("multiprocess", "fast_json", "metrics", "lazy_resources", "discover"):
+        if flag in config and not isinstance(config[flag], bool):
+            raise ConfigurationError(f"{flag} must be a boolean")
+    
+    log_level = config.get("log_level")
+    if log_level is not None and (not isinstance(log_level, str) or log_level.upper() not in LOG_LEVELS):
+        raise ConfigurationError(f"log_level must be one of {', '.join(LOG_LEVELS)}")
+    
+    if config.get("log_format", "text") not in LOG_FORMATS:
+        raise ConfigurationError(f"log_format must be one of {', '.join(LOG_FORMATS)}")
+    
+    storage_threads = config.get("storage_threads")
+    if storage_threads is not None and (not isinstance(storage_threads, int) or storage_threads < 1):
+        raise ConfigurationError("storage_threads must be a positive integer")
+    
+    cache_bytes = config.get("response_cache_bytes")
+    if cache_bytes is not None and (not isinstance(cache_bytes, int) or cache_bytes < 0):
+        raise ConfigurationError("response_cache_bytes must be a non-negative integer")
+    
+    if "cache_dir" in config and not isinstance(config["cache_dir"], str):
+        raise ConfigurationError("cache_dir must be a path")
+    
+    idle_timeout = config.get("idle_timeout")
+    if idle_timeout is not None and (not isinstance(idle_timeout, (int, float)) or idle_timeout <= 0):
+        raise ConfigurationError("idle_timeout must be a positive number")
+    
+    max_open = config.get("max_open_resources")
+    if max_open is not None and (not isinstance(max_open, int) or max_open < 1):
+        raise ConfigurationError("max_open_resources must be a positive integer")
+    
     for name, resource_config in resources.items():
         if not isinstance(resource_config, dict):
             raise ConfigurationError(f"Resource '{name}' config must be a dictionary")
@@ -113,4 +146,43 @@ def validate_config(config: Dict[str, Any]) -> None:
             raise ConfigurationError(f"Resource '{name}' primary_key must be a string")
         
         if "readonly" in resource_config and not isinstance(resource_config["readonly"], bool):
-            raise ConfigurationError(f"Resource '{name}' readonly must be a boolean")
\ No newline at end of file
+            raise ConfigurationError(f"Resource '{name}' readonly must be a boolean")
+        
+        for flag in ("resident", "search_index", "mmap", "wal", "watch"):
+            if flag in resource_config and not isinstance(resource_config[flag], bool):
+                raise ConfigurationError(f"Resource '{name}' {flag} must be a boolean")
+        
+        if resource_config.get("layout", "rows") not in ("rows", "columnar"):
+            raise ConfigurationError(f"Resource '{name}' layout must be 'rows' or 'columnar'")
+        
+        if resource_config.get("backend", "csv") not in ("csv", "sqlite"):
+            raise ConfigurationError(f"Resource '{name}' backend must be 'csv' or 'sqlite'")
+        
+        for interval in ("export_interval", "wal_window", "checkpoint_interval", "watch_interval"):
+            value = resource_config.get(interval)
+            if value is not None and (not isinstance(value, (int, float)) or value <= 0):
+                raise ConfigurationError(f"Resource '{name}' {interval} must be a positive number")
+        
+        for count in ("wal_batch", "max_concurrency", "schema_head", "schema_sample"):
+            value = resource_config.get(count)
+            if value is not None and (not isinstance(value, int) or value < 1):
+                raise ConfigurationError(f"Resource '{name}' {count} must be a positive integer")
+        
+        indexes = resource_config.get("indexes", [])
+        if not isinstance(indexes, list) or not all(isinstance(col, str) for col in indexes):
+            raise ConfigurationError(f"Resource '{name}' indexes must be a list of column names")
+        
+        aggregates = resource_config.get("aggregates", [])
+        if not isinstance(aggregates, list) or not all(isinstance(spec, dict) for spec in aggregates):
+            raise ConfigurationError(f"Resource '{name}' aggregates must be a list of mappings")
+        for spec in aggregates:
+            for key in ("group_by", "metrics"):
+                value = spec.get(key, [])
+                if not isinstance(value, (str, list)) or (
+                    isinstance(value, list) and not all(isinstance(v, str) for v in value)
+                ):
+                    raise ConfigurationError(f"Resource '{name}' aggregate {key} must be a string or a list of strings")
+            try:
+                parse_metrics(spec.get("metrics"))
+            except ValidationError as e:
+                raise ConfigurationError(f"Resource '{name}' aggregate: {e}")
\ No newline at end of file
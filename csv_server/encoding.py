@@ -0,0 +1,79 @@
+# Fast JSON encoding for responses (opt-in with `fast_json: true`).
+# dumps() uses orjson when it is installed and the stdlib encoder otherwise.
+# FastJSONResponse renders with it, skipping FastAPI's default encoder.
+# RowFragments keeps each row's encoded bytes while the resource's version is
+# unchanged, so a list page is stitched together from pre-encoded rows instead
+# of encoding every dict again.
+
+import json
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Optional, Tuple
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+DEFAULT_FRAGMENT_BYTES = 16 * 1024 * 1024
+
+def _default(obj: Any) -> Any:
+    # Lazily decoded rows are Mappings rather than dicts
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class RowFragments:
+    """Encoded rows of one resource by primary key, valid for one version."""
+
+    def __init__(self, pk: str, max_bytes: int = DEFAULT_FRAGMENT_BYTES):
+        self.pk = pk
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._version: Optional[str] = None
+        # pk -> (row as encoded, bytes); the row is compared on lookup, which is
+        # far cheaper than encoding and guards against rows sharing a key.
+        self._rows: Dict[Any, Tuple[Any, bytes]] = {}
+
+    def sync(self, version: str) -> None:
+        """Drop every fragment once the resource's version moves on."""
+        if version != self._version:
+            self._rows = {}
+            self.size = 0
+            self._version = version
+
+    def encode(self, row: Any) -> bytes:
+        key = row.get(self.pk)
+        entry = self._rows.get(key)
+        if entry is not None and entry[0] == row:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        if not isinstance(row, dict):
+            row = dict(row)
+        body = dumps(row)
+        if key is not None and self.size + len(body) <= self.max_bytes:
+            if entry is not None:
+                self.size -= len(entry[1])
+            self._rows[key] = (row, body)
+            self.size += len(body)
+        return body
+
+    def page(self, result: Dict[str, Any]) -> bytes:
+        """Encode ``{"items": [...], ...}`` reusing the encoded rows."""
+        items: Iterable[Any] = result["items"]
+        rest = {k: v for k, v in result.items() if k != "items"}
+        tail = dumps(rest)[1:] if rest else b"}"
+        return b'{"items":[' + b",".join(self.encode(row) for row in items) + (b"]," if rest else b"]") + tail
@@ -26,4 +26,9 @@ class ConfigurationError(CSVServerError):
 
 class StorageError(CSVServerError):
     """Raised when there's an error with storage operations."""
+    pass
+
+
+class DuplicateKeyError(StorageError):
+    """Raised when a write would duplicate an existing primary key."""
     pass
\ No newline at end of file
@@ -0,0 +1,46 @@
+# Logging setup for CSV Server.
+# Modules log under the "csv_server" logger with lazy %-style arguments, so a
+# disabled level costs one level check and never formats payloads.
+# configure_logging() sets the level and attaches a single stderr handler that
+# writes plain text or one JSON object per line; in JSON, fields passed with
+# `extra=` (resource, id, fields, ...) become keys of the object.
+
+import json
+import logging
+from typing import Any, Dict
+
+LOGGER = "csv_server"
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+LOG_FORMATS = ("text", "json")
+
+# Attributes every LogRecord has; anything else came in through `extra=`.
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S%z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RESERVED)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging(level: str = "INFO", fmt: str = "text") -> logging.Logger:
+    """Set the csv_server log level and (re)attach its handler."""
+    logger = logging.getLogger(LOGGER)
+    logger.setLevel(level.upper())
+    for handler in list(logger.handlers):
+        if getattr(handler, "csv_server", False):
+            logger.removeHandler(handler)
+    handler = logging.StreamHandler()
+    handler.csv_server = True  # type: ignore[attr-defined]
+    handler.setFormatter(
+        JSONFormatter() if fmt == "json"
+        else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+    logger.addHandler(handler)
+    return logger
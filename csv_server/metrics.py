@@ -0,0 +1,170 @@
+# Metrics for CSV Server, served in Prometheus text format at /_metrics.
+# Counters and histograms are plain in-process objects rather than a client
+# library: hot paths only bump integers, and rendering reads them as they are.
+# Each storage owns a StorageMetrics (rows and bytes parsed/written, rewrites,
+# lock waits); MetricsMiddleware records latency per route.
+# A request with `?_profile=1` gets a Server-Timing header breaking its time
+# down by stage (parse, filter, sort, serialize). Stages are recorded through a
+# context variable, so code outside a profiled request pays one lookup.
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class StorageMetrics:
+    """I/O counters of one storage backend."""
+
+    def __init__(self):
+        self.rows_parsed = 0
+        self.rows_written = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.rewrites = Histogram()  # durations of full-file rewrites
+        self.lock_wait = {"read": Histogram(), "write": Histogram()}
+
+    def lock_waited(self, mode: str, seconds: float) -> None:
+        self.lock_wait[mode].observe(seconds)
+
+class Profile:
+    """Seconds spent per stage of one request."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def header(self, total: float) -> str:
+        """Server-Timing value, e.g. ``parse;dur=1.204, sort;dur=0.310, total;dur=2.000``."""
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages.items()]
+        return ", ".join(parts + [f"total;dur={total * 1000:.3f}"])
+
+PROFILE: "ContextVar[Optional[Profile]]" = ContextVar("csv_server_profile", default=None)
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the block as ``name`` when the current request is being profiled."""
+    profile = PROFILE.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - started)
+
+class MetricsMiddleware:
+    """ASGI middleware: per-route latency histograms, and Server-Timing for ``_profile=1``."""
+
+    def __init__(self, app: Any, requests: Dict[Tuple[str, str, str], Histogram]):
+        self.app = app
+        self.requests = requests
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        profile = None
+        token = None
+        if b"_profile=1" in scope.get("query_string", b"").split(b"&"):
+            profile = Profile()
+            token = PROFILE.set(profile)
+        status = 500
+
+        async def timed_send(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile is not None:
+                    timing = profile.header(time.perf_counter() - started).encode("latin-1")
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timing)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            if token is not None:
+                PROFILE.reset(token)
+            # Label by route template (/users/{item_id}), not by path, to bound the series.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            key = (scope["method"], route, str(status))
+            histogram = self.requests.get(key)
+            if histogram is None:
+                histogram = self.requests[key] = Histogram()
+            histogram.observe(time.perf_counter() - started)
+
+def _labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+class Exposition:
+    """Collects samples by metric family and renders the Prometheus text format."""
+
+    def __init__(self):
+        self._families: Dict[str, Tuple[str, str, List[str]]] = {}
+
+    def _family(self, name: str, kind: str, help: str) -> List[str]:
+        if name not in self._families:
+            self._families[name] = (kind, help, [])
+        return self._families[name][2]
+
+    def sample(self, name: str, kind: str, help: str, labels: Dict[str, Any], value: float) -> None:
+        self._family(name, kind, help).append(f"{name}{_labels(labels)} {value}")
+
+    def histogram(self, name: str, help: str, labels: Dict[str, Any], histogram: Histogram) -> None:
+        lines = self._family(name, "histogram", help)
+        cumulative = 0
+        for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+    def cache(self, cache: str, labels: Dict[str, Any], hits: int, misses: int) -> None:
+        labels = {"cache": cache, **labels}
+        self.sample("csv_server_cache_hits_total", "counter", "Cache hits.", labels, hits)
+        self.sample("csv_server_cache_misses_total", "counter", "Cache misses.", labels, misses)
+        if hits + misses:
+            self.sample("csv_server_cache_hit_ratio", "gauge", "Cache hits over lookups.", labels,
+                        round(hits / (hits + misses), 6))
+
+    def storage(self, resource: str, metrics: StorageMetrics) -> None:
+        labels = {"resource": resource}
+        self.sample("csv_server_rows_parsed_total", "counter", "Rows parsed from CSV text.", labels, metrics.rows_parsed)
+        self.sample("csv_server_rows_written_total", "counter", "Rows written to files.", labels, metrics.rows_written)
+        self.sample("csv_server_bytes_read_total", "counter", "Bytes of CSV parsed.", labels, metrics.bytes_read)
+        self.sample("csv_server_bytes_written_total", "counter", "Bytes written to files.", labels, metrics.bytes_written)
+        self.sample("csv_server_file_rewrites_total", "counter", "Full-file rewrites.", labels, metrics.rewrites.count)
+        self.histogram("csv_server_file_rewrite_seconds", "Duration of full-file rewrites.", labels, metrics.rewrites)
+        for mode, histogram in metrics.lock_wait.items():
+            self.histogram("csv_server_lock_wait_seconds", "Time spent waiting for storage locks.",
+                           {**labels, "mode": mode}, histogram)
+
+    def text(self) -> str:
+        out = []
+        for name, (kind, help, lines) in self._families.items():
+            out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
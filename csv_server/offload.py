@@ -0,0 +1,74 @@
+# Run blocking storage calls off the event loop.
+# Every storage call goes through one bounded thread pool, so a slow parse or
+# rewrite of a large CSV doesn't stall other requests on the same worker.
+# Optional per-resource limits cap how many pool threads one resource can hold
+# at once; requests beyond the cap wait on the event loop, not in the pool, so
+# small resources keep getting threads while a large one is busy.
+# Calls run in a copy of the caller's context, so context variables (e.g. the
+# request profile in csv_server.metrics) reach the pool thread.
+# Streamed responses advance their (blocking) iterators through iterate(), one
+# chunk per pool call, so a long export counts against the same limits.
+
+import asyncio
+import contextvars
+import functools
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional
+
+DEFAULT_THREADS = min(32, (os.cpu_count() or 1) + 4)
+_DONE = object()
+
+class StorageExecutor:
+    def __init__(self, max_workers: int = DEFAULT_THREADS):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="csv-storage")
+        self._limits: Dict[str, int] = {}
+        # asyncio semaphores belong to one event loop, so keep a set per loop.
+        self._semaphores: "weakref.WeakKeyDictionary[Any, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def limit(self, resource: str, max_concurrency: Optional[int]) -> None:
+        """Allow at most ``max_concurrency`` concurrent storage calls for ``resource``."""
+        if max_concurrency:
+            self._limits[resource] = max_concurrency
+        else:
+            self._limits.pop(resource, None)
+
+    def _semaphore(self, loop: asyncio.AbstractEventLoop, resource: str) -> Optional[asyncio.Semaphore]:
+        if resource not in self._limits:
+            return None
+        semaphores = self._semaphores.setdefault(loop, {})
+        if resource not in semaphores:
+            semaphores[resource] = asyncio.Semaphore(self._limits[resource])
+        return semaphores[resource]
+
+    async def run(self, resource: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Await ``fn(*args, **kwargs)`` on the pool, within ``resource``'s limit."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        semaphore = self._semaphore(loop, resource)
+        if semaphore is None:
+            return await loop.run_in_executor(self._pool, call)
+        async with semaphore:
+            return await loop.run_in_executor(self._pool, call)
+
+    async def iterate(self, resource: str, items: Iterable[Any]) -> AsyncIterator[Any]:
+        """Yield from a blocking iterable, pulling each item on the pool within ``resource``'s limit."""
+        iterator = iter(items)
+        done = False
+        try:
+            while not done:
+                item = await self.run(resource, next, iterator, _DONE)
+                done = item is _DONE
+                if not done:
+                    yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if not done and close is not None:  # cut short: let the generator clean up off the loop
+                await self.run(resource, close)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
@@ -1,67 +1,293 @@
 # Query engine for CSV Server.
 # Supports q (search), filter, sort, limit, offset on lists of dicts.
+# Filters and the search term are compiled once per request into a single
+# predicate, so matching rows costs one pass with no intermediate lists.
+# Sorts compare typed keys from the schema (so 9 < 10 on integer columns), and
+# a sort with a limit keeps only the top offset+limit rows in a heap.
 
-from typing import List, Dict, Any, Optional
+import heapq
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from urllib.parse import parse_qs
+from csv_server.exceptions import ValidationError
+from csv_server.metrics import stage
+
+Row = Dict[str, Any]
+Predicate = Callable[[Row], bool]
+
+OPERATORS = ("eq", "ne", "lt", "lte", "gt", "gte", "in", "contains", "startswith", "isnull")
+NUMERIC_TYPES = ("integer", "float")
 
 def parse_query_params(query_string: str) -> Dict[str, List[str]]:
     return parse_qs(query_string)
 
+def to_number(value: Any) -> Any:
+    """Convert a cell to int or float; raises ValueError for non-numeric text."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return float(value)
+
+def parse_filters(filters: Optional[Iterable[str]]) -> List[Tuple[str, str, str]]:
+    """Split ["col:op:value", ...] into (col, op, value) triples."""
+    parsed = []
+    for f in filters or []:
+        parts = f.split(":", 2)
+        if len(parts) == 2 and parts[1] == "isnull":
+            parts.append("true")
+        if len(parts) != 3 or not parts[0]:
+            raise ValidationError(f"Invalid filter '{f}', expected col:op:value")
+        col, op, value = parts
+        if op not in OPERATORS:
+            raise ValidationError(f"Unknown filter operator '{op}' in '{f}'")
+        parsed.append((col, op, value))
+    return parsed
+
+def parse_sort(sort: Optional[str], order: Optional[str] = None) -> List[Tuple[str, bool]]:
+    """Parse "col1,-col2" (or "col:desc") into (column, descending) pairs."""
+    keys = []
+    for part in (sort or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        descending = False
+        if part.startswith("-"):
+            part, descending = part[1:], True
+        elif ":" in part:
+            part, direction = part.rsplit(":", 1)
+            descending = direction.lower() == "desc"
+        keys.append((part, descending))
+    if order and len(keys) == 1 and order.lower() == "desc":
+        keys[0] = (keys[0][0], True)
+    return keys
+
+def _compile_filter(col: str, op: str, value: str, col_type: str) -> Predicate:
+    if op == "isnull":
+        want = value.lower() not in ("false", "0", "no")
+        return lambda row: (row.get(col) in (None, "")) == want
+    if op == "contains":
+        return lambda row: value in (row.get(col) or "")
+    if op == "startswith":
+        return lambda row: (row.get(col) or "").startswith(value)
+
+    numeric = col_type in NUMERIC_TYPES
+    convert = to_number if numeric else str
+    try:
+        if op == "in":
+            target = {convert(v) for v in value.split(",")}
+        else:
+            target = convert(value)
+    except ValueError:
+        raise ValidationError(f"Filter value '{value}' is not a valid {col_type} for '{col}'")
+
+    def cell(row: Row) -> Any:
+        v = row.get(col)
+        if v is None or v == "":
+            return None
+        if numeric:
+            try:
+                return to_number(v)
+            except ValueError:
+                return None
+        return v
+
+    if op == "eq":
+        return lambda row: cell(row) == target
+    if op == "ne":
+        return lambda row: cell(row) != target
+    if op == "in":
+        return lambda row: cell(row) in target
+
+    compare = {
+        "lt": lambda a: a < target,
+        "lte": lambda a: a <= target,
+        "gt": lambda a: a > target,
+        "gte": lambda a: a >= target,
+    }[op]
+
+    def ordered(row: Row) -> bool:
+        v = cell(row)
+        return v is not None and compare(v)
+    return ordered
+
+def compile_predicate(
+    filters: Iterable[Tuple[str, str, str]],
+    schema: Optional[Dict[str, str]] = None,
+    q: Optional[str] = None,
+) -> Optional[Predicate]:
+    """Fuse the search term and all filters into one row predicate (None matches all)."""
+    schema = schema or {}
+    checks = [_compile_filter(col, op, value, schema.get(col, "string")) for col, op, value in filters]
+    if q:
+        # Every whitespace-separated term must appear in some cell (case-insensitive).
+        terms = q.lower().split()
+
+        def search(row: Row) -> bool:
+            cells = [str(value).lower() for value in row.values()]
+            return all(any(term in cell for cell in cells) for term in terms)
+        if terms:
+            checks.append(search)
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+
+    def predicate(row: Row) -> bool:
+        for check in checks:
+            if not check(row):
+                return False
+        return True
+    return predicate
+
 def search_rows(rows: List[Dict[str, Any]], q: Optional[str]) -> List[Dict[str, Any]]:
     if not q:
         return rows
-    q_lower = q.lower()
-    return [
-        row for row in rows
-        if any(q_lower in str(value).lower() for value in row.values())
-    ]
-
-def filter_rows(rows: List[Dict[str, Any]], filters: List[str]) -> List[Dict[str, Any]]:
-    # filters: ["col:eq:value", ...]
-    for f in filters:
-        try:
-            col, op, value = f.split(":", 2)
-        except ValueError:
-            continue
-        if op == "eq":
-            rows = [row for row in rows if str(row.get(col, "")) == value]
-        # Add more operators as needed
-    return rows
+    predicate = compile_predicate([], q=q)
+    if predicate is None:
+        return rows
+    return [row for row in rows if predicate(row)]
 
-def sort_rows(rows: List[Dict[str, Any]], sort_col: Optional[str], order: str = "asc") -> List[Dict[str, Any]]:
-    if not sort_col:
+def filter_rows(rows: List[Dict[str, Any]], filters: List[str], schema: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    # filters: ["col:op:value", ...]
+    predicate = compile_predicate(parse_filters(filters), schema)
+    if predicate is None:
         return rows
-    reverse = order == "desc"
-    return sorted(rows, key=lambda r: r.get(sort_col, ""), reverse=reverse)
+    return [row for row in rows if predicate(row)]
+
+class _Descending:
+    """Inverts the order of one key inside a mixed-direction sort tuple."""
+    __slots__ = ("key",)
+
+    def __init__(self, key: Any):
+        self.key = key
+
+    def __lt__(self, other: "_Descending") -> bool:
+        return other.key < self.key
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Descending) and self.key == other.key
+
+def _cell_key(col: str, col_type: str) -> Callable[[Row], Any]:
+    if col_type not in NUMERIC_TYPES:
+        return lambda row: row.get(col) or ""
+
+    def key(row: Row) -> Any:
+        # Empty cells first, then numbers, then text that isn't a number.
+        v = row.get(col)
+        if v is None or v == "":
+            return (0, 0)
+        try:
+            return (1, to_number(v))
+        except (TypeError, ValueError):
+            return (2, str(v))
+    return key
+
+def sort_key(sort: List[Tuple[str, bool]], schema: Optional[Dict[str, str]] = None) -> Tuple[Callable[[Row], Any], bool]:
+    """A single key function for a (multi-column) sort, and whether to sort it in reverse."""
+    schema = schema or {}
+    keys = [(_cell_key(col, schema.get(col, "string")), descending) for col, descending in sort]
+    reverse = all(descending for _, descending in keys)
+    if len(keys) == 1:
+        return keys[0][0], reverse
+    if reverse or not any(descending for _, descending in keys):
+        return (lambda row: tuple(key(row) for key, _ in keys)), reverse
+    return (lambda row: tuple(_Descending(key(row)) if descending else key(row) for key, descending in keys)), False
+
+def sort_rows(
+    rows: Iterable[Dict[str, Any]],
+    sort: List[Tuple[str, bool]],
+    schema: Optional[Dict[str, str]] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Stable sort; with a limit, only the first ``limit`` rows are kept (bounded heap)."""
+    key, reverse = sort_key(sort, schema)
+    if limit is not None:
+        select = heapq.nlargest if reverse else heapq.nsmallest
+        return select(limit, rows, key=key)
+    return sorted(rows, key=key, reverse=reverse)
+
+def sort_positions(
+    rows: Iterable[Dict[str, Any]],
+    sort: List[Tuple[str, bool]],
+    schema: Optional[Dict[str, str]] = None,
+) -> List[int]:
+    """Row positions in sorted order: a permutation that can be cached and sliced per page."""
+    key, reverse = sort_key(sort, schema)
+    keys = [key(row) for row in rows]
+    return sorted(range(len(keys)), key=keys.__getitem__, reverse=reverse)
 
 def paginate_rows(rows: List[Dict[str, Any]], limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
     return rows[offset:offset+limit]
 
+def iter_query(
+    rows: Iterable[Dict[str, Any]],
+    q: Optional[str] = None,
+    filters: Optional[Iterable[str]] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    schema: Optional[Dict[str, str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Lazily yield the matching page; only a sort has to materialize the matches.
+
+    Filters are compiled before returning, so invalid input raises immediately.
+    """
+    predicate = compile_predicate(parse_filters(filters), schema, q)
+    sort_keys = parse_sort(sort)
+    if predicate is not None:
+        rows = (row for row in rows if predicate(row))
+    if sort_keys:
+        rows = iter(sort_rows(rows, sort_keys, schema, None if limit is None else offset + limit))
+    return islice(rows, offset, None if limit is None else offset + limit)
+
+def run_query(
+    rows: Iterable[Dict[str, Any]],
+    q: Optional[str] = None,
+    filters: Optional[Iterable[str]] = None,
+    sort: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+    schema: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """Filter, sort and paginate rows in a single pass over the input."""
+    predicate = compile_predicate(parse_filters(filters), schema, q)
+    sort_keys = parse_sort(sort)
+    if predicate is not None:
+        rows = (row for row in rows if predicate(row))
+
+    if sort_keys:
+        with stage("filter"):
+            matched = list(rows)
+        with stage("sort"):
+            top = sort_rows(matched, sort_keys, schema, offset + limit)
+        return {"items": top[offset:], "total": len(matched)}
+
+    # Unsorted: keep only the requested page while counting matches.
+    items = []
+    total = 0
+    end = offset + limit
+    with stage("filter"):
+        for row in rows:
+            if offset <= total < end:
+                items.append(row)
+            total += 1
+    return {"items": items, "total": total}
+
 def query_engine(
     rows: List[Dict[str, Any]],
-    query_params: Dict[str, Any]
+    query_params: Dict[str, Any],
+    schema: Optional[Dict[str, str]] = None,
 ) -> Dict[str, Any]:
-    filtered_rows = rows
-
-    if 'q' in query_params:
-        q = query_params['q'][0]
-        filtered_rows = search_rows(filtered_rows, q)
-        print("After search:", filtered_rows)
-
-    if 'filter' in query_params:
-        filters = {f.split(':')[0]: f.split(':')[1] for f in query_params['filter']}
-        filtered_rows = filter_rows(filtered_rows, filters)
-
-    if 'sort' in query_params:
-        sort_key = query_params['sort'][0]
-        order = query_params.get('order', ['asc'])[0]
-        filtered_rows = sort_rows(filtered_rows, sort_key, order)
-
-    limit = int(query_params.get('limit', [50])[0])
-    offset = int(query_params.get('offset', [0])[0])
-    paginated_rows = paginate_rows(filtered_rows, limit, offset)
-
-    return {
-        "items": paginated_rows,
-        "total": len(filtered_rows)
-    }
\ No newline at end of file
+    sort = query_params.get('sort', [None])[0]
+    order = query_params.get('order', [None])[0]
+    if sort and order:
+        sort = ",".join(f"-{c}" if d else c for c, d in parse_sort(sort, order))
+    return run_query(
+        rows,
+        q=query_params.get('q', [None])[0],
+        filters=query_params.get('filter', []),
+        sort=sort,
+        limit=int(query_params.get('limit', [50])[0]),
+        offset=int(query_params.get('offset', [0])[0]),
+        schema=schema,
+    )
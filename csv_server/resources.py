@@ -1,27 +1,102 @@
 # Resource registry for CSV Server.
 # This module helps manage resource metadata and discovery.
+# With `lazy_resources`, create_app resolves every /{resource} request through
+# a ResourceRegistry instead of registering routes per resource: a resource is
+# opened (storage and all) by `opener` on first use rather than at startup, and
+# handed to `closer` after `idle_timeout` seconds without requests or when more
+# than `max_open` are open. Idle ones are also closed by a daemon thread
+# (start()/stop(), run over the app's lifespan), so a quiet server releases
+# them without waiting for another request. With `discover`, a name missing from the config
+# resolves to `<name>.csv` in the data directory by a single stat, so files
+# dropped in later are served without a restart or a directory scan.
 
+import logging
+import re
+import threading
+import time
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Any, Callable, Dict, List, Optional
+from csv_server.exceptions import ResourceNotFoundError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IDLE_TIMEOUT = 300.0
+SWEEP_INTERVAL = 1.0  # minimum seconds between idle sweeps
+# Discoverable names: plain file stems, so a URL segment can't reach outside data_dir.
+NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
 
 class Resource:
-    def __init__(self, name: str, file_path: str, primary_key: str = "id", readonly: bool = False):
+    def __init__(self, name: str, file_path: str, primary_key: str = "id", readonly: bool = False,
+                 options: Optional[Dict[str, Any]] = None, file: Optional[str] = None):
         self.name = name
         self.file_path = Path(file_path)
+        self.file = file or self.file_path.name  # as configured: relative to data_dir
         self.primary_key = primary_key
         self.readonly = readonly
+        self.options = options or {}  # the rest of the resource's config entry
+
+    def config(self) -> Dict[str, Any]:
+        """The resource's config entry, as in the `resources` section."""
+        return {**self.options, "file": self.file, "primary_key": self.primary_key,
+                "readonly": self.readonly}
 
 class ResourceRegistry:
-    def __init__(self):
+    def __init__(
+        self,
+        data_dir: Optional[Path] = None,
+        discover: bool = False,
+        readonly: bool = False,
+        opener: Optional[Callable[[Resource], Any]] = None,
+        closer: Optional[Callable[[Any], None]] = None,
+        idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT,
+        max_open: Optional[int] = None,
+    ):
         self.resources: Dict[str, Resource] = {}
+        self.data_dir = Path(data_dir) if data_dir is not None else None
+        self.discover = discover
+        self.readonly = readonly
+        self.opener = opener
+        self.closer = closer
+        self.idle_timeout = idle_timeout
+        self.max_open = max_open
+        self.opened: Dict[str, Any] = {}  # name -> whatever opener returned
+        self._used: Dict[str, float] = {}
+        self._active: Dict[str, int] = {}
+        self._opening: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._swept = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def sweep_interval(self) -> Optional[float]:
+        """Seconds between background idle sweeps; None when nothing times out."""
+        if self.idle_timeout is None:
+            return None
+        return max(SWEEP_INTERVAL, self.idle_timeout / 10)
 
-    def register(self, name: str, file_path: str, primary_key: str = "id", readonly: bool = False):
+    def register(self, name: str, file_path: str, primary_key: str = "id", readonly: bool = False,
+                 options: Optional[Dict[str, Any]] = None, file: Optional[str] = None):
         if name in self.resources:
             raise ValueError(f"Resource '{name}' is already registered.")
-        self.resources[name] = Resource(name, file_path, primary_key, readonly)
+        self.resources[name] = Resource(name, file_path, primary_key, readonly, options, file)
+
+    def register_config(self, resources: Dict[str, Dict[str, Any]], readonly: bool = False) -> None:
+        """Register every entry of a config's `resources` section."""
+        for name, cfg in resources.items():
+            options = {k: v for k, v in cfg.items() if k not in ("file", "primary_key", "readonly")}
+            path = self.data_dir / cfg["file"] if self.data_dir is not None else cfg["file"]
+            self.register(name, path, cfg.get("primary_key", "id"), cfg.get("readonly", readonly), options,
+                          str(cfg["file"]))
 
     def get(self, name: str) -> Optional[Resource]:
-        return self.resources.get(name)
+        resource = self.resources.get(name)
+        if resource is None and self.discover and self.data_dir is not None and NAME.match(name):
+            path = self.data_dir / f"{name}.csv"
+            if path.is_file():
+                with self._lock:
+                    resource = self.resources.setdefault(name, Resource(name, path, readonly=self.readonly))
+        return resource
 
     def all(self):
         return self.resources.values()
@@ -29,12 +104,123 @@ class ResourceRegistry:
     def as_dict(self) -> Dict[str, Any]:
         return {
             name: {
-                "file": resource.file_path.name,
+                "file": resource.file,
                 "primary_key": resource.primary_key,
                 "readonly": resource.readonly
             }
             for name, resource in self.resources.items()
         }
 
+    def _checkout(self, name: str) -> Any:
+        with self._lock:
+            handle = self.opened.get(name)
+            if handle is not None:
+                self._active[name] += 1
+                self._used[name] = time.monotonic()
+            return handle
+
+    def acquire(self, name: str) -> Any:
+        """The open handle of ``name``, opened on first use; pair every call with release().
+
+        Raises ResourceNotFoundError for unknown names. Blocks while the resource is opened,
+        so call it off the event loop.
+        """
+        resource = self.get(name)
+        if resource is None:
+            raise ResourceNotFoundError(f"Resource '{name}' not found")
+        handle = self._checkout(name)
+        if handle is None:
+            with self._lock:
+                opening = self._opening.setdefault(name, threading.Lock())
+            with opening:  # one opener per resource; others wait for its handle
+                handle = self._checkout(name)
+                if handle is None:
+                    handle = self.opener(resource)
+                    with self._lock:
+                        self.opened[name] = handle
+                        self._active[name] = 1
+                        self._used[name] = time.monotonic()
+                    logger.info("opened resource %s", name, extra={"resource": name})
+        self._maybe_evict()
+        return handle
+
+    def release(self, name: str) -> None:
+        with self._lock:
+            self._active[name] -= 1
+            self._used[name] = time.monotonic()
+
+    def _maybe_evict(self) -> None:
+        now = time.monotonic()
+        over = self.max_open is not None and len(self.opened) > self.max_open
+        if over or (self.idle_timeout is not None and now - self._swept >= SWEEP_INTERVAL):
+            self._swept = now
+            self.evict(now)
+
+    def evict(self, now: Optional[float] = None) -> List[str]:
+        """Close resources idle for idle_timeout, then least recently used ones beyond max_open.
+
+        Resources with requests in flight are never closed. Returns the evicted names.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = sorted((used, name) for name, used in self._used.items() if not self._active[name])
+            victims = [name for used, name in idle
+                       if self.idle_timeout is not None and now - used >= self.idle_timeout]
+            if self.max_open is not None:
+                excess = len(self.opened) - len(victims) - self.max_open
+                for used, name in idle:
+                    if excess <= 0:
+                        break
+                    if name not in victims:
+                        victims.append(name)
+                        excess -= 1
+            handles = []
+            for name in victims:
+                # Held until closed, so a reopen can't overlap the close of the same file.
+                opening = self._opening.setdefault(name, threading.Lock())
+                if not opening.acquire(blocking=False):
+                    continue
+                handles.append((name, self.opened.pop(name), opening))
+                del self._used[name], self._active[name]
+        for name, handle, opening in handles:
+            try:
+                if self.closer is not None:
+                    self.closer(handle)
+            finally:
+                opening.release()
+            logger.info("evicted idle resource %s", name, extra={"resource": name})
+        return [name for name, _, _ in handles]
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.evict()
+            except Exception:
+                logger.exception("closing idle resources failed")
+
+    def start(self) -> None:
+        """Sweep idle resources in a daemon thread until stop()."""
+        if self._thread is None and self.sweep_interval is not None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="resource-sweep", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self) -> None:
+        """Close every open resource, e.g. at shutdown."""
+        with self._lock:
+            handles = list(self.opened.values())
+            self.opened.clear()
+            self._used.clear()
+            self._active.clear()
+        if self.closer is not None:
+            for handle in handles:
+                self.closer(handle)
+
 # Singleton registry instance
-registry = ResourceRegistry()
\ No newline at end of file
+registry = ResourceRegistry()
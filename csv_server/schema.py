@@ -0,0 +1,236 @@
+# Column type inference for CSV files.
+# Only a sample is looked at: the first `head` records plus a reservoir sample of
+# `sample` records from the rest, so inference cost is bounded however large the
+# file grows. Types are boolean, integer, float, date, datetime and string; a
+# column is nullable when any sampled cell is empty.
+# Results persist in a `<file>.schema.json` sidecar keyed by the file's size and
+# mtime. Writes fold their values in and re-key the schema to the rewritten file
+# instead of dropping it, so lookups stay O(1) after the first.
+
+import json
+import os
+import random
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from csv_server.utils_csv_ids import file_signature, iter_records
+
+HEAD_ROWS = 100
+SAMPLE_ROWS = 1000
+
+# Types that can hold every value of a narrower one.
+_WIDER = {("integer", "float"): "float", ("date", "datetime"): "datetime"}
+
+def value_type(value: str) -> Optional[str]:
+    """The narrowest type for one cell, or None for an empty cell."""
+    value = value.strip()
+    if not value:
+        return None
+    if value.lower() in ("true", "false"):
+        return "boolean"
+    try:
+        int(value)
+        return "integer"
+    except ValueError:
+        pass
+    try:
+        float(value)
+        return "float"
+    except ValueError:
+        pass
+    if len(value) >= 8 and value[0].isdigit():
+        try:
+            date.fromisoformat(value)
+            return "date"
+        except ValueError:
+            pass
+        try:
+            datetime.fromisoformat(value)
+            return "datetime"
+        except ValueError:
+            pass
+    return "string"
+
+def widen(current: Optional[str], seen: Optional[str]) -> Optional[str]:
+    """The narrowest type holding both; None means no value seen yet."""
+    if current is None or current == seen:
+        return seen
+    if seen is None:
+        return current
+    return _WIDER.get((current, seen)) or _WIDER.get((seen, current)) or "string"
+
+class Sampler:
+    """Head plus reservoir sample of records, reduced to column types on demand."""
+
+    def __init__(self, fieldnames: List[str], head: int = HEAD_ROWS, size: int = SAMPLE_ROWS):
+        self.fieldnames = fieldnames
+        self.head = head
+        self.size = size
+        self.records: List[List[str]] = []
+        self._seen = 0
+        self._random = random.Random(0)  # deterministic, so restarts agree
+
+    def add(self, record: List[str]) -> None:
+        self._seen += 1
+        if len(self.records) < self.head + self.size:
+            self.records.append(record)
+            return
+        # Algorithm R over everything past the head.
+        slot = self._random.randrange(self._seen - self.head)
+        if slot < self.size:
+            self.records[self.head + slot] = record
+
+    def result(self) -> Tuple[Dict[str, Optional[str]], Set[str]]:
+        types: Dict[str, Optional[str]] = {col: None for col in self.fieldnames}
+        nullable: Set[str] = set()
+        for record in self.records:
+            for i, col in enumerate(self.fieldnames):
+                kind = value_type(record[i]) if i < len(record) else None
+                if kind is None:
+                    nullable.add(col)
+                else:
+                    types[col] = widen(types[col], kind)
+        return types, nullable
+
+class SchemaCache:
+    """Sampled, persisted schema of one CSV file."""
+
+    def __init__(self, path: Path, head: int = HEAD_ROWS, sample: int = SAMPLE_ROWS):
+        self.path = Path(path)
+        self.sidecar = Path(f"{path}.schema.json")
+        self.head = head
+        self.sample = sample
+        self._lock = threading.Lock()
+        self._key: Optional[List[int]] = None  # [mtime_ns, size] the schema describes
+        self._types: Dict[str, Optional[str]] = {}  # None: no non-empty value seen yet
+        self._nullable: Set[str] = set()
+        self._saved: Optional[List[int]] = None  # key the sidecar was last written with
+        self._dirty = False  # types changed since the sidecar was written
+
+    @staticmethod
+    def _key_of(signature: Any) -> Optional[List[int]]:
+        return [signature[0], signature[1]] if signature is not None else None
+
+    def get(self) -> Dict[str, str]:
+        """Column -> type, sampling the file only when neither memory nor sidecar match it."""
+        signature = file_signature(self.path)
+        if signature is None:
+            return {}
+        if not self.load(signature):
+            with self._lock:
+                if not self.load(signature):
+                    self._sample(signature)
+        return self.types
+
+    @property
+    def types(self) -> Dict[str, str]:
+        return {col: kind or "string" for col, kind in self._types.items()}
+
+    @property
+    def nullable(self) -> List[str]:
+        return [col for col in self._types if col in self._nullable]
+
+    def describe(self) -> Dict[str, Any]:
+        return {"schema": self.get(), "nullable": self.nullable}
+
+    def load(self, signature: Any) -> bool:
+        """Whether the schema describes the file at ``signature``, adopting the sidecar if it does."""
+        key = self._key_of(signature)
+        if key == self._key:
+            return True
+        try:
+            with open(self.sidecar, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if saved.get("key") != key:
+            return False
+        self._types = saved["types"]
+        self._nullable = set(saved["nullable"])
+        self._key = self._saved = key
+        self._dirty = False
+        return True
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """The schema in sidecar form, for storing alongside other caches of the file."""
+        if self._key is None:
+            return None
+        return {"key": self._key, "types": dict(self._types), "nullable": sorted(self._nullable)}
+
+    def adopt(self, signature: Any, saved: Optional[Dict[str, Any]]) -> bool:
+        """Take a snapshot() made for the file at ``signature``; False if it is for another state."""
+        if saved is None or saved.get("key") != self._key_of(signature):
+            return False
+        self._types = dict(saved["types"])
+        self._nullable = set(saved["nullable"])
+        self._key = self._key_of(signature)
+        self._dirty = True
+        self.save()
+        return True
+
+    def sampler(self, fieldnames: List[str]) -> Sampler:
+        return Sampler(fieldnames, self.head, self.sample)
+
+    def store(self, signature: Any, sampler: Sampler) -> None:
+        """Adopt a sample taken while the caller scanned the file at ``signature``."""
+        self._types, self._nullable = sampler.result()
+        self._key = self._key_of(signature)
+        self.save()
+
+    def _sample(self, signature: Any) -> None:
+        records = iter_records(self.path)
+        header = next(records, None)
+        sampler = self.sampler(header[1] if header else [])
+        for _, record in records:
+            sampler.add(record)
+        self.store(signature, sampler)
+
+    def observe(self, rows: Iterable[Dict[str, Any]], fieldnames: List[str]) -> None:
+        """Fold written rows (and any new columns) into the schema."""
+        if self._key is None:
+            return
+        for col in fieldnames:
+            if col not in self._types:
+                # Rows written before the column existed have it empty.
+                self._types[col] = None
+                self._nullable.add(col)
+                self._dirty = True
+        for row in rows:
+            for col in fieldnames:
+                kind = value_type(str(row.get(col, "")))
+                if kind is None:
+                    if col not in self._nullable:
+                        self._nullable.add(col)
+                        self._dirty = True
+                    continue
+                wider = widen(self._types[col], kind)
+                if wider != self._types[col]:
+                    self._types[col] = wider
+                    self._dirty = True
+
+    def rekey(self, before: Any, after: Any) -> None:
+        """Carry the schema over a write that moved the file from ``before`` to ``after``."""
+        if self._key is None or self._key != self._key_of(before):
+            self.invalidate()
+            return
+        self._key = self._key_of(after)
+        if self._dirty:
+            self.save()
+
+    def invalidate(self) -> None:
+        self._key = None
+
+    def save(self) -> None:
+        """Write the sidecar atomically; a read-only directory just means resampling later."""
+        if self._key is None or (self._key == self._saved and not self._dirty):
+            return
+        tmp = self.sidecar.with_name(f".{self.sidecar.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"key": self._key, "types": self._types, "nullable": sorted(self._nullable)}, f)
+            os.replace(tmp, self.sidecar)
+        except OSError:
+            return
+        self._saved = self._key
+        self._dirty = False
@@ -1,10 +1,65 @@
 # Base storage interface for CSV Server
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from csv_server.exceptions import StorageError
+from csv_server.aggregate import aggregate_rows
+from csv_server.query import iter_query, run_query
 
 class BaseStorage:
     def list(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
         raise NotImplementedError
 
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def query(
+        self,
+        q: Optional[str] = None,
+        filters: Optional[Iterable[str]] = None,
+        sort: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+        schema: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """Search/filter/sort/paginate; backends may override with something smarter."""
+        return run_query(self.iter_rows(), q, filters, sort, limit, offset, schema)
+
+    def stream(
+        self,
+        q: Optional[str] = None,
+        filters: Optional[Iterable[str]] = None,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        schema: Optional[Dict[str, str]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Like query() but yields matching rows lazily and reports no total."""
+        return iter_query(self.iter_rows(), q, filters, sort, limit, offset, schema)
+
+    def aggregate(
+        self,
+        group_by: Any = None,
+        metrics: Any = None,
+        q: Optional[str] = None,
+        filters: Optional[Iterable[str]] = None,
+        schema: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """Grouped metrics over the rows matching q/filters, in one pass."""
+        return aggregate_rows(self.iter_rows(), group_by, metrics, q, filters, schema)
+
+    def get_schema(self) -> Dict[str, str]:
+        raise NotImplementedError
+
+    def version(self) -> Optional[Tuple[str, float]]:
+        """(token, last-modified time) that changes with the data; None disables HTTP caching."""
+        return None
+
+    def describe_schema(self) -> Dict[str, Any]:
+        """Column types plus the columns seen with empty values."""
+        return {"schema": self.get_schema(), "nullable": []}
+
     def get(self, id: str) -> Optional[Dict[str, Any]]:
         raise NotImplementedError
 
@@ -15,4 +70,39 @@ class BaseStorage:
         raise NotImplementedError
 
     def delete(self, id: str) -> None:
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    # Bulk writes return one result per input: the row (True for deletes) or the
+    # StorageError/KeyError that rejected it. Backends override these to persist once.
+
+    def bulk_create(self, rows: List[Dict[str, Any]]) -> List[Any]:
+        results: List[Any] = []
+        for data in rows:
+            try:
+                results.append(self.create(data))
+            except StorageError as e:
+                results.append(e)
+        return results
+
+    def bulk_update(self, changes: List[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        results: List[Any] = []
+        for id, data in changes:
+            try:
+                results.append(self.update(id, data))
+            except KeyError as e:
+                results.append(e)
+        return results
+
+    def bulk_delete(self, ids: List[str]) -> List[Any]:
+        results: List[Any] = []
+        for id in ids:
+            if self.get(id) is None:
+                results.append(KeyError(f"{id} not found"))
+                continue
+            self.delete(id)
+            results.append(True)
+        return results
+
+    def close(self) -> None:
+        """Release resources and flush pending writes; called on app shutdown."""
+        pass
@@ -0,0 +1,397 @@
+# Compact typed columnar table for resident CSVStorage.
+# One column object per CSV column, chosen from the inferred schema:
+# - integer/float columns keep values in array('q') / array('d'); cells whose
+#   text would not round-trip exactly (empty, "007", "250.00", junk) are kept
+#   verbatim in a small per-column override dict so output is byte-identical.
+# - everything else is dictionary-encoded: array('L') codes into a value list.
+# Row dicts are only materialized at the response boundary, and filters on
+# typed columns run as vectorized comparisons (NumPy when installed).
+# Columns loaded from a sidecar hold read-only memoryviews over the mapped file
+# instead of arrays; the first write to such a column copies it into an array.
+
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from csv_server.query import NUMERIC_TYPES, to_number
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+# Numeric columns holding more overrides than this fraction become string columns.
+MAX_OVERRIDE_RATIO = 0.125
+
+Buffer = Union[array, memoryview]
+
+def typecode_of(values: Buffer) -> str:
+    return values.typecode if isinstance(values, array) else values.format
+
+def _owned(values: Buffer) -> array:
+    """``values`` as a writable array, copying a mapped view."""
+    if isinstance(values, array):
+        return values
+    copy = array(values.format)
+    copy.frombytes(values.cast("B"))
+    return copy
+
+_COMPARE = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+}
+
+class StringColumn:
+    kind = "string"
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.codes = array("L")
+        self.dictionary: List[str] = []
+        self._lookup: Dict[str, int] = {}
+        for value in values:
+            self.append(value)
+
+    @classmethod
+    def from_parts(cls, codes: Buffer, dictionary: List[str]) -> "StringColumn":
+        """A column over existing codes and distinct values (e.g. loaded from a sidecar)."""
+        column = cls()
+        column.codes = codes
+        column.dictionary = dictionary
+        column._lookup = {value: code for code, value in enumerate(dictionary)}
+        return column
+
+    def _code(self, value: str) -> int:
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        return code
+
+    def append(self, value: str) -> None:
+        code = self._code(value)
+        self.codes = _owned(self.codes)
+        self.codes.append(code)
+
+    def __getitem__(self, i: int) -> str:
+        return self.dictionary[self.codes[i]]
+
+    def __setitem__(self, i: int, value: str) -> None:
+        code = self._code(value)
+        self.codes = _owned(self.codes)
+        self.codes[i] = code
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def tolist(self) -> List[str]:
+        return list(map(self.dictionary.__getitem__, self.codes))
+
+    def nbytes(self) -> int:
+        return self.codes.itemsize * len(self.codes) + sum(len(v) + 49 for v in self.dictionary)
+
+    def select(self, op: str, value: str) -> Optional[List[int]]:
+        """Positions matching a string comparison, evaluated once per distinct value."""
+        if op not in _COMPARE and op not in ("in", "startswith", "isnull"):
+            return None
+        if op == "in":
+            targets = set(value.split(","))
+            hits = {code for code, v in enumerate(self.dictionary) if v in targets}
+        elif op == "startswith":
+            hits = {code for code, v in enumerate(self.dictionary) if v.startswith(value)}
+        elif op == "isnull":
+            want = value.lower() not in ("false", "0", "no")
+            hits = {code for code, v in enumerate(self.dictionary) if (v == "") == want}
+        else:
+            # Empty cells are nulls: they never compare, but always differ.
+            compare = _COMPARE[op]
+            hits = {code for code, v in enumerate(self.dictionary) if v != "" and compare(v, value)}
+            if op == "ne" and "" in self._lookup:
+                hits.add(self._lookup[""])
+        if np is not None:
+            codes = np.frombuffer(self.codes, dtype=np.dtype(typecode_of(self.codes)))
+            return np.flatnonzero(np.isin(codes, list(hits))).tolist()
+        return [i for i, code in enumerate(self.codes) if code in hits]
+
+    def order(self, descending: bool = False) -> List[int]:
+        """Stable argsort by text: sort the distinct values once, then rows by rank."""
+        values = self.dictionary
+        ranks = [0] * len(values)
+        for rank, code in enumerate(sorted(range(len(values)), key=values.__getitem__)):
+            ranks[code] = rank
+        if np is not None:
+            codes = np.frombuffer(self.codes, dtype=np.dtype(typecode_of(self.codes)))
+            keyed = np.asarray(ranks, dtype=np.int64)[codes]
+            return np.argsort(-keyed if descending else keyed, kind="stable").tolist()
+        codes = self.codes
+        return sorted(range(len(codes)), key=lambda i: ranks[codes[i]], reverse=descending)
+
+class NumericColumn:
+    def __init__(self, kind: str, values: Iterable[str] = ()):
+        self.kind = kind
+        self.values = array("q" if kind == "integer" else "d")
+        self.overrides: Dict[int, str] = {}  # position -> exact text
+        self._convert: Callable[[str], Union[int, float]] = int if kind == "integer" else float
+        for value in values:
+            self.append(value)
+
+    @classmethod
+    def from_parts(cls, kind: str, values: Buffer, overrides: Dict[int, str]) -> "NumericColumn":
+        """A column over existing typed values and exact-text overrides."""
+        column = cls(kind)
+        column.values = values
+        column.overrides = overrides
+        return column
+
+    def _encode(self, value: str) -> Tuple[Union[int, float], Optional[str]]:
+        try:
+            number = self._convert(value)
+            if (str(number) if self.kind == "integer" else repr(number)) == value:
+                return number, None
+        except (TypeError, ValueError):
+            pass
+        return 0, value
+
+    def append(self, value: str) -> None:
+        number, text = self._encode(value)
+        self.values = _owned(self.values)
+        try:
+            self.values.append(number)
+        except OverflowError:
+            self.values.append(0)
+            text = value
+        if text is not None:
+            self.overrides[len(self.values) - 1] = text
+
+    def __getitem__(self, i: int) -> str:
+        text = self.overrides.get(i)
+        if text is not None:
+            return text
+        value = self.values[i]
+        return str(value) if self.kind == "integer" else repr(value)
+
+    def __setitem__(self, i: int, value: str) -> None:
+        number, text = self._encode(value)
+        self.values = _owned(self.values)
+        try:
+            self.values[i] = number
+        except OverflowError:
+            self.values[i] = 0
+            text = value
+        if text is None:
+            self.overrides.pop(i, None)
+        else:
+            self.overrides[i] = text
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def tolist(self) -> List[str]:
+        texts = list(map(str if self.kind == "integer" else repr, self.values))
+        for i, text in self.overrides.items():
+            texts[i] = text
+        return texts
+
+    def nbytes(self) -> int:
+        overrides = sum(len(v) + 120 for v in self.overrides.values())
+        return self.values.itemsize * len(self.values) + overrides
+
+    def dense(self) -> bool:
+        return len(self.overrides) > MAX_OVERRIDE_RATIO * max(len(self.values), 1)
+
+    def select(self, op: str, value: str) -> Optional[List[int]]:
+        """Positions matching a numeric comparison; overrides are checked one by one."""
+        if op not in _COMPARE and op != "in":
+            return None
+        try:
+            if op == "in":
+                target: Any = {to_number(v) for v in value.split(",")}
+            else:
+                target = to_number(value)
+        except ValueError:
+            return None
+        if np is not None:
+            data = np.frombuffer(self.values, dtype=np.dtype(typecode_of(self.values)))
+            try:
+                mask = np.isin(data, list(target)) if op == "in" else _COMPARE[op](data, target)
+            except (OverflowError, TypeError):
+                return None
+            if self.overrides:
+                mask[list(self.overrides)] = False
+            matches = np.flatnonzero(mask).tolist()
+        else:
+            if op == "in":
+                matches = [i for i, v in enumerate(self.values) if v in target]
+            else:
+                compare = _COMPARE[op]
+                matches = [i for i, v in enumerate(self.values) if compare(v, target)]
+            if self.overrides:
+                matches = [i for i in matches if i not in self.overrides]
+        # Overridden cells: empty ones are nulls, numeric text ("007") still compares.
+        extra = []
+        for i, text in self.overrides.items():
+            try:
+                number = to_number(text) if text != "" else None
+            except ValueError:
+                number = None
+            if number is None:
+                if op == "ne":
+                    extra.append(i)
+            elif (number in target) if op == "in" else _COMPARE[op](number, target):
+                extra.append(i)
+        if extra:
+            matches = sorted(matches + extra)
+        return matches
+
+Column = Union[StringColumn, NumericColumn]
+
+def make_column(kind: str, values: List[str]) -> Column:
+    if kind in NUMERIC_TYPES:
+        column = NumericColumn(kind, values)
+        if not column.dense():
+            return column
+    return StringColumn(values)
+
+class ColumnarTable:
+    """List-like table of rows (dicts in, dicts out) stored column by column."""
+
+    def __init__(self, fieldnames: List[str], schema: Dict[str, str], rows: Iterable[Any] = ()):
+        self.fieldnames = list(fieldnames)
+        self.columns: Dict[str, Column] = {}
+        records = [self._as_record(row) for row in rows]
+        for i, col in enumerate(self.fieldnames):
+            self.columns[col] = make_column(schema.get(col, "string"), [r[i] for r in records])
+        self._length = len(records)
+
+    @classmethod
+    def from_columns(cls, fieldnames: List[str], columns: Dict[str, Column], length: int) -> "ColumnarTable":
+        """A table over already-built columns, one per field name."""
+        table = cls(fieldnames, {})
+        table.columns = {col: columns[col] for col in table.fieldnames}
+        table._length = length
+        return table
+
+    def _as_record(self, row: Any) -> List[str]:
+        if isinstance(row, (list, tuple)):
+            return [row[i] if i < len(row) else "" for i in range(len(self.fieldnames))]
+        return [str(row.get(col, "") or "") for col in self.fieldnames]
+
+    def _materialize(self, i: int) -> Dict[str, str]:
+        return {col: column[i] for col, column in self.columns.items()}
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, key: Union[int, slice]) -> Any:
+        if isinstance(key, slice):
+            return [self._materialize(i) for i in range(*key.indices(self._length))]
+        if key < 0:
+            key += self._length
+        if not 0 <= key < self._length:
+            raise IndexError(key)
+        return self._materialize(key)
+
+    def __setitem__(self, i: int, row: Dict[str, Any]) -> None:
+        for col, value in zip(self.fieldnames, self._as_record(row)):
+            column = self.columns[col]
+            if column[i] != value:  # leaves unchanged mapped columns shared
+                column[i] = value
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        for i in range(self._length):
+            yield self._materialize(i)
+
+    def append(self, row: Any) -> None:
+        for col, value in zip(self.fieldnames, self._as_record(row)):
+            column = self.columns[col]
+            column.append(value)
+            if isinstance(column, NumericColumn) and column.dense():
+                self.columns[col] = StringColumn(column[i] for i in range(len(column)))
+        self._length += 1
+
+    def nbytes(self) -> int:
+        """Approximate payload size of the stored columns."""
+        return sum(column.nbytes() for column in self.columns.values())
+
+    def select(
+        self, filters: Iterable[Tuple[str, str, str]], schema: Dict[str, str],
+    ) -> Optional[List[int]]:
+        """Positions passing every filter a column can evaluate vectorized, or None."""
+        result: Optional[set] = None
+        for col, op, value in filters:
+            column = self.columns.get(col)
+            if column is None:
+                continue
+            # Only use a column whose comparison semantics match the query's.
+            query_numeric = schema.get(col, "string") in NUMERIC_TYPES
+            if query_numeric != isinstance(column, NumericColumn):
+                continue
+            matches = column.select(op, value)
+            if matches is None:
+                continue
+            result = set(matches) if result is None else result & set(matches)
+        return None if result is None else sorted(result)
+
+    def order(self, col: str, descending: bool = False) -> Optional[List[int]]:
+        """Row positions in text order of ``col``; None unless it is dictionary-encoded."""
+        column = self.columns.get(col)
+        if not isinstance(column, StringColumn):
+            return None
+        return column.order(descending)
+
+    def aggregate_into(self, aggregator: Any, positions: Optional[List[int]] = None) -> bool:
+        """Fold rows (all, or ``positions``) into an Aggregator with NumPy; False if it can't.
+
+        Needs at most one dictionary-encoded group column and numeric metric
+        columns. Overridden cells (empty, "007", junk) take the row-at-a-time path.
+        """
+        if np is None or len(aggregator.group_by) > 1:
+            return False
+        group = self.columns.get(aggregator.group_by[0]) if aggregator.group_by else None
+        if aggregator.group_by and not isinstance(group, StringColumn):
+            return False
+        metrics: Dict[str, NumericColumn] = {}
+        for col in aggregator.columns:
+            column = self.columns.get(col)
+            if not isinstance(column, NumericColumn) or not aggregator.numeric[col]:
+                return False
+            metrics[col] = column
+        idx = np.arange(self._length) if positions is None else np.asarray(positions, dtype=np.int64)
+        special = set()
+        for column in metrics.values():
+            special.update(column.overrides)
+        slow: List[int] = []
+        if special:
+            mask = np.isin(idx, list(special))
+            slow = idx[mask].tolist()
+            idx = idx[~mask]
+        if group is not None:
+            codes = np.frombuffer(group.codes, dtype=np.dtype(typecode_of(group.codes)))[idx].astype(np.int64)
+            size = len(group.dictionary)
+        else:
+            codes = np.zeros(len(idx), dtype=np.int64)
+            size = 1
+        counts = np.bincount(codes, minlength=size)
+        stats: Dict[str, Tuple[Any, Any, Any]] = {}
+        for col, column in metrics.items():
+            data = np.frombuffer(column.values, dtype=np.dtype(typecode_of(column.values)))[idx]
+            sums = np.zeros(size, dtype=data.dtype)
+            np.add.at(sums, codes, data)
+            if column.kind == "integer":
+                info = np.iinfo(data.dtype)
+                lows, highs = np.full(size, info.max, dtype=data.dtype), np.full(size, info.min, dtype=data.dtype)
+            else:
+                lows, highs = np.full(size, np.inf), np.full(size, -np.inf)
+            np.minimum.at(lows, codes, data)
+            np.maximum.at(highs, codes, data)
+            stats[col] = (sums.tolist(), lows.tolist(), highs.tolist())
+        for code in np.flatnonzero(counts).tolist():
+            key = (group.dictionary[code],) if group is not None else ()
+            n = int(counts[code])
+            aggregator.merge(key, n, {
+                col: (n, sums[code], lows[code], highs[code]) for col, (sums, lows, highs) in stats.items()
+            })
+        for position in slow:
+            aggregator.add(self._materialize(position))
+        return True
@@ -1,111 +1,1183 @@
 # Implement a CSVStorage class with CRUD.
-# - Use ensure_pk_and_autoincrement for POST.
-# - Use read_rows for GET/list.
+# - POST appends one encoded line under the lock and bumps a cached max id;
+#   only a new column (header change) forces a full atomic rewrite.
+# - Keep a primary-key index (pk -> row position) and a sparse row-offset
+#   index (every Nth row start + exact row count) so GET by id and paging seek
+#   near the target instead of scanning the file.
+# - Declared secondary indexes (hash + sorted) narrow filtered queries to
+#   candidate rows; see storage/indexes.py.
+# - An optional trigram index (storage/search.py), built lazily on the first
+#   `q` query, narrows full-text searches the same way.
+# - With use_mmap, non-resident reads go through a memory-mapped file: rows
+#   are located by scanning bytes and decoded lazily (storage/mmap_reader.py).
+# - With columnar, the resident table is stored column by column in typed
+#   arrays (storage/columnar.py) and filters scan those arrays directly.
 # - PUT/PATCH overwrite and persist with atomic writes.
 # - DELETE removes row and saves.
+# - With wal, mutations are applied to the resident table and appended to a
+#   group-committed write-ahead log (storage/wal.py) instead of rewriting the
+#   file; a background checkpoint folds the log into one atomic rewrite, and a
+#   leftover log is replayed whenever the file is (re)loaded.
+# - Optional resident mode keeps the parsed table in memory. Either way the
+#   file is revalidated with os.stat and reparsed only when it changed on disk.
+# - With process_lock, a sidecar lock (storage/locks.py) makes reads shared and
+#   writes exclusive across worker processes; every write bumps its shared
+#   version counter, so each worker drops caches another worker made stale.
+# - Unfiltered sorts keep their full sort permutation (positions in sorted
+#   order) until the next write, so paging through a sort is one slice per page.
+# - The schema is sampled while the file is scanned and kept up to date by
+#   writes (csv_server/schema.py) rather than recomputed.
+# - Declared aggregates (csv_server/aggregate.py) are built on first use and
+#   then adjusted by every write, so reading one costs O(groups).
+# - When another program only appended to the file (same inode, same first and
+#   last bytes up to the old size), just the new tail is parsed and appended to
+#   the table and indexes; truncation, rewrites and header changes rescan.
+# - With cache_dir, a full scan loads the file's binary column sidecar
+#   (storage/sidecar.py) when it matches the file, and writes one after parsing
+#   when it doesn't, so restarts and other workers skip the CSV parse.
 
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-from csv_server.utils_csv_ids import read_rows, ensure_pk_and_autoincrement, write_rows_atomic
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from csv_server.utils_csv_ids import (
+    ensure_pk_and_autoincrement, write_rows_atomic, append_rows, max_int_key,
+    file_signature, iter_records, record_to_row,
+)
+from csv_server.exceptions import DuplicateKeyError
+from csv_server.query import NUMERIC_TYPES, compile_predicate, parse_filters, parse_sort, run_query, iter_query, sort_positions
+from csv_server.schema import SchemaCache, HEAD_ROWS, SAMPLE_ROWS
+from csv_server.metrics import StorageMetrics, stage
+from csv_server.aggregate import Aggregator, MaintainedAggregate, parse_group_by, parse_metrics
 from .base import BaseStorage
-import csv
+from .indexes import ColumnIndex
+from .search import SearchIndex
+from .mmap_reader import MappedCSV, LazyRow
+from .columnar import ColumnarTable, make_column
+from . import sidecar
+from .wal import WriteAheadLog, DEFAULT_WINDOW, DEFAULT_BATCH
+from .locks import ReadWriteLock, ProcessLock
+from .offsets import RowOffsetIndex, DEFAULT_STRIDE
+
+SORT_CACHE_SIZE = 8  # sort permutations kept per resource
+FINGERPRINT_BYTES = 256  # bytes compared at each end to tell an append from a rewrite
 
 class CSVStorage(BaseStorage):
-    def __init__(self, path: Path, pk: str = "id"):
+    def __init__(self, path: Path, pk: str = "id", resident: bool = False,
+                 offset_stride: int = DEFAULT_STRIDE, indexes: Optional[Iterable[str]] = None,
+                 search_index: bool = False, use_mmap: bool = False, columnar: bool = False,
+                 wal: bool = False, wal_window: float = DEFAULT_WINDOW,
+                 wal_batch: int = DEFAULT_BATCH, checkpoint_interval: float = 5.0,
+                 process_lock: bool = False, schema_head: int = HEAD_ROWS,
+                 schema_sample: int = SAMPLE_ROWS, aggregates: Optional[List[Dict[str, Any]]] = None,
+                 cache_dir: Optional[Path] = None):
         self.path = path
         self.pk = pk
-        self._schema_cache = None  # Cache for schema
-        
-    def _infer_column_types(self) -> Dict[str, str]:
-        """Infer data types for each column by sampling the data."""
-        if not self.path.exists():
-            return {}
-        
-        with open(self.path, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-            
-        if not rows:
-            return {}
-        
-        schema = {}
-        for column in rows[0].keys():
-            # Sample values from this column (skip empty values)
-            values = [row[column] for row in rows[:10] if row[column].strip()]
-            
-            if not values:
-                schema[column] = "string"
-                continue
-                
-            # Try to infer type
-            all_int = True
-            all_float = True
-            
-            for value in values:
-                try:
-                    int(value)
-                except ValueError:
-                    all_int = False
-                
+        self.resident = resident or columnar or wal
+        self.columnar = columnar
+        self.offset_stride = offset_stride
+        self.index_columns: List[str] = list(indexes or [])
+        self.search_index = search_index
+        self.use_mmap = use_mmap
+        self._map: Optional[MappedCSV] = None
+        self._map_signature = None  # file_signature() the mapping was made at
+        self._schema = SchemaCache(path, schema_head, schema_sample)
+        self._fieldnames: List[str] = []
+        self._rows: Any = None  # Resident table: list of dicts or ColumnarTable
+        self._pk_index: Optional[Dict[str, int]] = None  # pk -> row position
+        self._offsets = RowOffsetIndex(offset_stride)  # sparse row position -> byte offset
+        self._indexes: Dict[str, ColumnIndex] = {}  # secondary indexes by column
+        self._search: Optional[SearchIndex] = None  # built on the first `q` query
+        # (sort keys, column types) -> sorted positions, most recently used last
+        self._sorts: "OrderedDict[Tuple[Any, ...], array]" = OrderedDict()
+        self._sorts_lock = threading.Lock()
+        # Declared {group_by, metrics}; maintained once built, dropped on reload
+        self.aggregate_specs = [
+            (parse_group_by(spec.get("group_by")), parse_metrics(spec.get("metrics")))
+            for spec in aggregates or []
+        ]
+        self._aggs: Optional[List[MaintainedAggregate]] = None
+        self._aggs_lock = threading.Lock()
+        self.generation = 0  # bumped on every change made through this instance
+        self._modified = 0.0  # time of the last such change
+        self.duplicate_keys: Set[str] = set()
+        self._max_id: Optional[int] = None  # Highest integer pk, computed lazily
+        self._signature = None  # file_signature() the index was built from
+        self._fingerprint: Optional[Tuple[bytes, bytes]] = None  # first/last bytes at that size
+        self.reloads = {"append": 0, "rescan": 0}
+        # Binary column sidecar; None when disabled or its directory isn't writable
+        self._sidecar: Optional[Path] = sidecar.sidecar_path(cache_dir, path) if cache_dir else None
+        self.sidecar_loads = 0
+        self.sidecar_saves = 0
+        self.last_reload: Optional[Dict[str, Any]] = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.index_hits = 0
+        self.index_misses = 0
+        self._shared: Optional[ProcessLock] = None  # cross-process lock + version counter
+        if process_lock:
+            self._shared = ProcessLock(Path(f"{path}.lock"))
+        self._version: Optional[int] = None  # shared version the caches were built at
+        self.metrics = StorageMetrics()
+        # Reads share it; reloads, writes and checkpoints are exclusive.
+        self._lock = ReadWriteLock(self._shared, self.metrics.lock_waited)
+        self._wal: Optional[WriteAheadLog] = None
+        if wal:
+            self._wal = WriteAheadLog(Path(f"{path}.wal"), wal_window, wal_batch)
+        self.checkpoint_interval = checkpoint_interval
+        self._checkpoint_timer: Optional[threading.Timer] = None
+        self._wal_dirty = False  # the log holds entries the CSV doesn't
+        self.checkpoints = 0
+
+    def _scan(self, keep_rows: bool) -> Any:
+        """Parse the file once, rebuilding the pk index and offsets as we go."""
+        signature = file_signature(self.path)
+        if self._shared is not None:
+            self._version = self._shared.version
+        fingerprint = self._read_fingerprint(signature)
+        key = sidecar.source_key(signature, fingerprint) if self._sidecar and fingerprint else None
+        snapshot = self._load_sidecar(key, keep_rows) if key is not None else None
+        if snapshot is not None:
+            fieldnames, rows = snapshot.fieldnames, None
+            index, offsets = snapshot.pk_index(self.pk), snapshot.offsets
+            duplicates = set(snapshot.duplicates)
+            index_values = {c: snapshot.columns[c].tolist() for c in self.index_columns if c in fieldnames}
+            if keep_rows:
+                rows = (ColumnarTable.from_columns(fieldnames, snapshot.columns, snapshot.count)
+                        if self.resident and self.columnar else snapshot.rows())
+        else:
+            fieldnames, rows, index, offsets, duplicates, index_values = self._parse(signature, keep_rows, key)
+        self.cache_misses += 1
+        self._build_indexes(index_values)
+        self._search = None
+        self._sorts.clear()
+        self._aggs = None
+        self._fieldnames = fieldnames
+        self._pk_index = index
+        self._offsets = offsets
+        self.duplicate_keys = duplicates
+        self._max_id = None
+        self._signature = signature
+        self._fingerprint = fingerprint
+        if not keep_rows:
+            self._rows = None
+            return None
+        self._rows = rows if self.resident else None
+        if self._wal is not None and os.path.getsize(self._wal.path):
+            self._recover()
+            return self._rows
+        return rows
+
+    def _parse(self, signature: Any, keep_rows: bool, key: Optional[Dict[str, Any]]) -> Tuple[Any, ...]:
+        """Read the CSV: (fieldnames, rows, pk index, offsets, duplicates, index values).
+
+        With ``key``, the columns read are also saved as the file's sidecar.
+        """
+        fieldnames: List[str] = []
+        kept: List[List[str]] = []
+        keys: List[str] = []
+        index: Dict[str, int] = {}
+        offsets = RowOffsetIndex(self.offset_stride)
+        duplicates: Set[str] = set()
+        sampler = None
+        index_values: Dict[str, List[str]] = {}
+        if signature is not None:
+            records = iter_records(self.path)
+            header = next(records, None)
+            fieldnames = header[1] if header else []
+            pk_col = fieldnames.index(self.pk) if self.pk in fieldnames else None
+            index_cols = [(c, fieldnames.index(c)) for c in self.index_columns if c in fieldnames]
+            index_values = {c: [] for c, _ in index_cols}
+            if not self._schema.load(signature):
+                sampler = self._schema.sampler(fieldnames)  # infer while we're reading anyway
+            for position, (offset, record) in enumerate(records):
+                if offset >= signature[1]:
+                    break  # appended since the stat; picked up as a tail later
+                offsets.add(offset)
+                if pk_col is not None:
+                    key_value = record[pk_col] if pk_col < len(record) else ""
+                    if key is not None and not keep_rows:
+                        keys.append(key_value)
+                    if key_value:
+                        if key_value in index:
+                            duplicates.add(key_value)
+                        else:
+                            index[key_value] = position
+                for col, i in index_cols:
+                    index_values[col].append(record[i] if i < len(record) else "")
+                if keep_rows:
+                    kept.append(record)
+                if sampler is not None:
+                    sampler.add(record)
+            self.metrics.rows_parsed += offsets.count
+            self.metrics.bytes_read += signature[1]
+        if sampler is not None:
+            self._schema.store(signature, sampler)
+        rows = None
+        if keep_rows:
+            if self.resident and self.columnar:
+                rows = ColumnarTable(fieldnames, self.get_schema(), kept)
+            else:
+                rows = [record_to_row(fieldnames, record) for record in kept]
+        if key is not None:
+            schema = self.get_schema()
+            if isinstance(rows, ColumnarTable):
+                columns = rows.columns
+            elif keep_rows:
+                columns = {
+                    col: make_column(schema.get(col, "string"), [r[i] if i < len(r) else "" for r in kept])
+                    for i, col in enumerate(fieldnames)
+                }
+            else:
+                # Non-resident scans keep just what they index.
+                columns = {col: make_column(schema.get(col, "string"), values)
+                           for col, values in index_values.items()}
+                if self.pk in fieldnames:
+                    columns[self.pk] = make_column(schema.get(self.pk, "string"), keys)
+            self._save_sidecar(key, sidecar.Snapshot(
+                fieldnames, offsets.count, offsets, {k: index[k] for k in duplicates}, columns,
+                self._schema.snapshot(),
+            ))
+        return fieldnames, rows, index, offsets, duplicates, index_values
+
+    def _load_sidecar(self, key: Dict[str, Any], keep_rows: bool) -> Optional[sidecar.Snapshot]:
+        """The sidecar's snapshot of the file at ``key``, with every column a scan keeps."""
+        columns = None if keep_rows else [self.pk, *self.index_columns]
+        snapshot = sidecar.load(self._sidecar, key, self.offset_stride, columns)
+        if snapshot is None:
+            return None
+        signature = (key["mtime_ns"], key["size"])
+        if not self._schema.load(signature) and not self._schema.adopt(signature, snapshot.schema):
+            return None
+        self.sidecar_loads += 1
+        return snapshot
+
+    def _save_sidecar(self, key: Dict[str, Any], snapshot: sidecar.Snapshot) -> None:
+        if sidecar.save(self._sidecar, key, snapshot):
+            self.sidecar_saves += 1
+        else:
+            self._sidecar = None  # not writable: don't pay for encoding again
+
+    def _recover(self) -> None:
+        """Replay a leftover write-ahead log over the freshly loaded table, then fold it in."""
+        for entry in self._wal.replay():
+            self._apply(entry)
+        self._wal_dirty = True
+        self.checkpoint()
+
+    def _read_fingerprint(self, signature: Any) -> Optional[Tuple[bytes, bytes]]:
+        """First and last bytes of the file up to ``signature``'s size; None unless they end a line."""
+        if signature is None:
+            return None
+        size = signature[1]
+        try:
+            with open(self.path, "rb") as f:
+                head = f.read(min(size, FINGERPRINT_BYTES))
+                f.seek(max(size - FINGERPRINT_BYTES, 0))
+                tail = f.read(min(size, FINGERPRINT_BYTES))
+        except OSError:
+            return None
+        if not tail.endswith(b"\n"):
+            return None
+        return head, tail
+
+    def _append_tail(self) -> Optional[int]:
+        """Parse rows another program appended since the last scan or write.
+
+        Returns how many were added, or None when the file changed in any other
+        way (or the caches hold changes the file doesn't) and needs a rescan.
+        """
+        old, new = self._signature, file_signature(self.path)
+        if (old is None or new is None or self._pk_index is None or self._fingerprint is None
+                or self._wal_dirty or new[2] != old[2] or new[1] <= old[1]):
+            return None
+        if self._shared is not None and self._shared.version != self._version:
+            return None  # another worker wrote it
+        if self._read_fingerprint(old) != self._fingerprint:
+            return None  # rewritten
+        end = self._complete_end(old[1], new[1])
+        if end < new[1]:
+            # The writer is mid-record: take the complete lines now, the rest next time.
+            new = (new[0], end, new[2])
+        added = []
+        for offset, record in iter_records(self.path, old[1]):
+            if offset >= end:
+                break
+            row = record_to_row(self._fieldnames, record)
+            self._track_append(row, offset)
+            added.append(row)
+            if self._max_id is not None:
                 try:
-                    float(value)
+                    self._max_id = max(self._max_id, int(row.get(self.pk, "")))
                 except ValueError:
-                    all_float = False
-            
-            if all_int:
-                schema[column] = "integer"
-            elif all_float:
-                schema[column] = "float"
+                    pass
+        self.metrics.rows_parsed += len(added)
+        self.metrics.bytes_read += end - old[1]
+        self._schema.observe(added, self._fieldnames)
+        self._signature = new
+        self._fingerprint = self._read_fingerprint(new)
+        self._schema.rekey(old, new)
+        return len(added)
+
+    def _complete_end(self, start: int, size: int) -> int:
+        """Offset just past the last newline between ``start`` and ``size`` (``start`` if none)."""
+        with open(self.path, "rb") as f:
+            end = size
+            while end > start:
+                begin = max(start, end - 65536)
+                f.seek(begin)
+                chunk = f.read(end - begin)
+                newline = chunk.rfind(b"\n")
+                if newline >= 0:
+                    return begin + newline + 1
+                end = begin
+        return start
+
+    def _catch_up(self) -> Dict[str, Any]:
+        """Bring the caches up to the file, by its new tail if possible; call with the write lock held."""
+        started = time.perf_counter()
+        kind = "append"
+        with stage("parse"):
+            rows = self._append_tail()
+            if rows is None:
+                kind = "rescan"
+                self._scan(keep_rows=self.resident)
+                rows = self._row_count()
+        event = {"kind": kind, "rows": rows, "seconds": time.perf_counter() - started}
+        self.reloads[kind] += 1
+        self.last_reload = event
+        return event
+
+    def stale(self) -> bool:
+        """Whether the file changed since it was loaded (False if it never was)."""
+        return self._pk_index is not None and not self._fresh()
+
+    def reload(self) -> Optional[Dict[str, Any]]:
+        """Catch up with changes made to the file by other programs.
+
+        Returns {"kind": "append" | "rescan", "rows", "seconds"}, or None if
+        nothing changed.
+        """
+        with self._lock.write():
+            if self._pk_index is None or self._fresh():
+                return None
+            return self._catch_up()
+
+    def _fresh(self) -> bool:
+        """Whether the caches match the file on disk and every other worker's writes."""
+        if self._pk_index is None or file_signature(self.path) != self._signature:
+            return False
+        return self._shared is None or self._shared.version == self._version
+
+    def _changed(self) -> None:
+        """Note a change to the table: drop sort permutations and move version() on."""
+        self._sorts.clear()
+        self.generation += 1
+        self._modified = time.time()
+
+    def _track_aggregates(self, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        """Move maintained aggregates from ``old`` to ``new`` (either may be None)."""
+        if self._aggs is None:
+            return
+        for agg in self._aggs:
+            if old is not None:
+                agg.remove(old)
+            if new is not None:
+                agg.add(new)
+
+    def version(self) -> Tuple[str, float]:
+        """(token, last-modified time); the token changes whenever the data may have."""
+        signature = file_signature(self.path) or (0, 0, 0)
+        # Across workers the shared counter moves on every write; the local
+        # generation covers writes that only reached the WAL.
+        writes = self._shared.version if self._shared is not None else self.generation
+        token = "-".join(f"{n:x}" for n in (*signature, writes))
+        return token, max(signature[0] / 1e9, self._modified)
+
+    def _touch(self) -> None:
+        """Tell other workers the data changed; call with the write lock held."""
+        if self._shared is not None:
+            self._version = self._shared.bump()
+
+    def _refresh(self) -> None:
+        """Make sure the pk index (and resident table) match the file on disk."""
+        if self._fresh():
+            self.cache_hits += 1
+            return
+        if self._lock.reading() and self._pk_index is not None:
+            return  # mid-read: keep serving the snapshot this read started with
+        with self._lock.write():
+            # Another thread (e.g. a checkpoint) may have caught up while we waited.
+            if not self._fresh():
+                self._catch_up()
+
+    @contextmanager
+    def _reading(self) -> Iterator[None]:
+        """Hold the read lock over caches that match the file.
+
+        Another worker can rewrite the file between _refresh() and taking the
+        shared lock; reads would then seek with stale offsets, so check again
+        under the lock and catch up if it moved.
+        """
+        if self._lock.reading():
+            with self._lock.read():
+                yield
+            return
+        while True:
+            self._refresh()
+            with self._lock.read():
+                if self._shared is None or self._fresh():
+                    yield
+                    return
+
+    def _load_rows(self) -> Any:
+        """Return the parsed table, reusing the resident copy while the file is unchanged."""
+        if self.resident:
+            self._refresh()
+            return self._rows
+        # A rescan of an unchanged file leaves maintained aggregates valid; the
+        # write that needs the rows then adjusts them instead of a rebuild.
+        aggs = self._aggs if self._fresh() else None
+        with stage("parse"):
+            rows = self._scan(keep_rows=True)
+        self._aggs = aggs
+        return rows
+
+    def _build_indexes(self, index_values: Dict[str, List[str]]) -> None:
+        schema = self.get_schema()
+        indexes = {}
+        for col, values in index_values.items():
+            index = ColumnIndex(col, schema.get(col, "string"))
+            index.build(values)
+            indexes[col] = index
+        self._indexes = indexes
+
+    def _reindex(self, rows: List[Dict[str, str]]) -> None:
+        """Rebuild the pk and secondary indexes from rows whose positions shifted."""
+        index: Dict[str, int] = {}
+        duplicates: Set[str] = set()
+        for position, row in enumerate(rows):
+            key = row.get(self.pk)
+            if not key:
+                continue
+            if key in index:
+                duplicates.add(key)
             else:
-                schema[column] = "string"
-        
-        return schema
-    
+                index[key] = position
+        self._pk_index = index
+        self.duplicate_keys = duplicates
+        self._search = None
+        self._build_indexes({
+            col: [row.get(col, "") for row in rows]
+            for col in self.index_columns if col in self._fieldnames
+        })
+
+    def _write(self, rows: Any, fieldnames: List[str], adopt: bool = True) -> None:
+        """Persist rows atomically and adopt them without reparsing the file."""
+        before = self._signature
+        started = time.perf_counter()
+        offsets = write_rows_atomic(self.path, rows, fieldnames)
+        self.metrics.rewrites.observe(time.perf_counter() - started)
+        self._fieldnames = fieldnames
+        self._offsets = RowOffsetIndex.from_offsets(offsets, self.offset_stride)
+        self._signature = file_signature(self.path)
+        self.metrics.rows_written += len(offsets)
+        self.metrics.bytes_written += self._signature[1] if self._signature else 0
+        self._fingerprint = self._read_fingerprint(self._signature)
+        self._schema.rekey(before, self._signature)
+        self._touch()
+        if adopt:
+            self._changed()
+            self._adopt(rows)
+
+    @staticmethod
+    def _normalized(rows: Iterable[Dict[str, Any]], fieldnames: List[str]) -> List[Dict[str, Any]]:
+        """Rows keyed by exactly ``fieldnames``, in header order; missing cells are empty."""
+        return [{col: row.get(col, "") for col in fieldnames} for row in rows]
+
+    def _adopt(self, rows: List[Dict[str, Any]]) -> None:
+        """Keep rows as the resident table, in the configured layout."""
+        if self.resident and self.columnar:
+            rows = ColumnarTable(self._fieldnames, self.get_schema(), rows)
+        self._rows = rows if self.resident else None
+
+    def _apply(self, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Apply one logged mutation to the resident table and indexes (idempotent)."""
+        key = entry["id"]
+        position = self._pk_index.get(key)
+        self._changed()
+        if entry["op"] == "delete":
+            if position is not None:
+                self._track_aggregates(self._rows[position], None)
+                self._adopt([row for row in self._rows if row.get(self.pk) != key])
+                self._reindex(self._rows)
+            return None
+
+        data = {**entry["data"], self.pk: key}
+        new_columns = [col for col in data if col not in self._fieldnames]
+        if new_columns:
+            if not self._fieldnames:
+                new_columns = [self.pk] + [col for col in new_columns if col != self.pk]
+            self._fieldnames = self._fieldnames + new_columns
+            self._adopt(self._normalized(self._rows, self._fieldnames))
+        self._schema.observe([data], self._fieldnames)
+        old = None
+        if position is None:
+            row = {col: data.get(col, "") for col in self._fieldnames}
+            self._rows.append(row)
+            position = len(self._rows) - 1
+            self._pk_index[key] = position
+        else:
+            old = self._rows[position]
+            row = {**old, **data}
+            self._rows[position] = row
+        self._track_aggregates(old, row)
+        for col, index in self._indexes.items():
+            if old is not None:
+                index.remove(position, old.get(col, ""))
+            index.add(position, row.get(col, ""))
+        if self._search is not None:
+            if old is not None:
+                self._search.remove(position, old)
+            self._search.add(position, row)
+        if self._max_id is not None:
+            try:
+                self._max_id = max(self._max_id, int(key))
+            except ValueError:
+                pass
+        return row
+
+    def _log(self, entry: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Apply a mutation and queue it for the next group commit; call with the lock held."""
+        row = self._apply(entry)
+        batch = self._wal.submit(entry)
+        self._wal_dirty = True
+        if self._checkpoint_timer is None or not self._checkpoint_timer.is_alive():
+            self._checkpoint_timer = threading.Timer(self.checkpoint_interval, self.checkpoint)
+            self._checkpoint_timer.daemon = True
+            self._checkpoint_timer.start()
+        return row, batch
+
+    def checkpoint(self) -> None:
+        """Fold the write-ahead log into a fresh atomic rewrite of the CSV."""
+        if self._wal is None:
+            return
+        with self._lock.write():
+            if self._shared is not None and not self._fresh():
+                # Another worker has written since we loaded; rescanning replays
+                # the shared log and checkpoints it.
+                self._scan(keep_rows=self.resident)
+                return
+            if not self._wal_dirty:
+                return
+            self._write(self._rows, self._fieldnames, adopt=False)
+            # Entries still queued for commit are already in the CSV; replaying them is harmless.
+            self._wal.truncate()
+            self._wal_dirty = False
+            self.checkpoints += 1
+
+    def _committed(self, batch: Optional[int]) -> None:
+        """Wait for a logged batch, then let other workers see it."""
+        if batch is None:
+            return
+        self._wal.wait(batch)
+        if self._shared is not None:
+            with self._lock.write():
+                self._touch()
+
+    def _commit_shared(self, batch: Optional[int]) -> Optional[int]:
+        """With other workers around, commit before unlocking; returns the batch left to wait for.
+
+        Another worker may checkpoint (and truncate the log) as soon as the write
+        lock is released, so entries must be on disk and announced by then.
+        """
+        if self._shared is None:
+            return batch
+        self._committed(batch)
+        return None
+
+    def close(self) -> None:
+        if self._wal is not None:
+            if self._checkpoint_timer is not None:
+                self._checkpoint_timer.cancel()
+            self.checkpoint()
+            self._wal.close()
+        self._schema.save()
+        if self._shared is not None:
+            self._shared.close()
+
+    def _next_id(self) -> str:
+        if self._max_id is None:
+            self._max_id = max_int_key(self._pk_index)
+        return str(self._max_id + 1)
+
+    def invalidate_cache(self) -> None:
+        """Drop the index and resident table so the next read reparses the file."""
+        self._rows = None
+        self._pk_index = None
+        self._signature = None
+        self._fingerprint = None
+        self._aggs = None
+        self._changed()
+
+    def cache_info(self) -> Dict[str, Any]:
+        """Report resident cache and index counters."""
+        return {
+            "resident": self.resident,
+            "columnar": self.columnar,
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "rows": len(self._rows) if self._rows is not None else None,
+            "indexed_keys": len(self._pk_index) if self._pk_index is not None else None,
+            "duplicate_keys": len(self.duplicate_keys),
+            "secondary_indexes": sorted(self._indexes),
+            "search_terms": len(self._search) if self._search is not None else None,
+            "index_hits": self.index_hits,
+            "index_misses": self.index_misses,
+            "wal_entries": self._wal.entries if self._wal is not None else None,
+            "wal_commits": self._wal.commits if self._wal is not None else None,
+            "checkpoints": self.checkpoints,
+            "reloads": dict(self.reloads),
+            "last_reload": self.last_reload,
+            "sidecar_loads": self.sidecar_loads,
+            "sidecar_saves": self.sidecar_saves,
+            "version": self._version,
+        }
+
     def get_schema(self) -> Dict[str, str]:
-        """Get the schema, computing it once and caching the result."""
-        if self._schema_cache is None:
-            self._schema_cache = self._infer_column_types()
-        return self._schema_cache
-    
+        """Column -> type from the sampled schema (see csv_server.schema)."""
+        return self._schema.get()
+
+    def describe_schema(self) -> Dict[str, Any]:
+        return self._schema.describe()
+
     def invalidate_schema_cache(self):
-        """Invalidate the schema cache (call when CSV structure changes)."""
-        self._schema_cache = None
+        """Forget the schema so the next lookup samples the file again."""
+        self._schema.invalidate()
+
+    def _mapped(self) -> MappedCSV:
+        """The current file mapping, remapped once the file is replaced or grows."""
+        # Compare the whole signature: an atomic rewrite can keep the size.
+        if self._map is None or self._map_signature != self._signature:
+            # The old mapping is released once no LazyRow refers to it anymore.
+            self._map = MappedCSV(self.path)
+            self._map_signature = self._signature
+        return self._map
+
+    def _read_at(self, position: int, limit: int) -> List[Dict[str, str]]:
+        """Parse up to ``limit`` rows starting at a row position, seeking via the offset index."""
+        start, skip = self._offsets.locate(position)
+        rows = []
+        if self.use_mmap:
+            mapped = self._mapped()
+            for begin, end in mapped.records(mapped.skip(start, skip)):
+                rows.append(LazyRow(mapped, begin, end, self._fieldnames))
+                if len(rows) >= limit:
+                    break
+            self.metrics.rows_parsed += len(rows)
+            return rows
+        for _, record in iter_records(self.path, start):
+            if skip:
+                skip -= 1
+                continue
+            rows.append(record_to_row(self._fieldnames, record))
+            if len(rows) >= limit:
+                break
+        self.metrics.rows_parsed += len(rows)
+        return rows
+
+    def _row_count(self) -> int:
+        if self._rows is not None:
+            return len(self._rows)
+        return self._offsets.count
+
+    def count(self) -> int:
+        with self._reading():
+            return self._row_count()
 
     def list(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
-        rows = read_rows(self.path)
-        return rows[offset:offset+limit]
+        offset = max(offset, 0)  # the offset index can't seek from the end
+        with self._reading():
+            if self._rows is not None:
+                return self._rows[offset:offset+limit]
+            if limit <= 0 or offset >= self._offsets.count:
+                return []
+            return self._read_at(offset, limit)
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        self._refresh()
+        if self._rows is not None:
+            yield from self._rows
+            return
+        if self._signature is None:
+            return
+        if self.use_mmap:
+            mapped = self._mapped()
+            fieldnames, start = mapped.header()
+            for begin, end in mapped.records(start):
+                self.metrics.rows_parsed += 1
+                yield LazyRow(mapped, begin, end, fieldnames)
+            return
+        records = iter_records(self.path)
+        header = next(records, None)
+        fieldnames = header[1] if header else []
+        for _, record in records:
+            self.metrics.rows_parsed += 1
+            yield record_to_row(fieldnames, record)
+
+    def _rows_at(self, positions: List[int]) -> Iterator[Dict[str, str]]:
+        """Rows at ascending positions of the table as it is now, even if consumed later."""
+        table = self._rows
+        if table is not None:
+            # Writers replace the list rather than shifting it, so positions stay valid.
+            return (table[position] for position in positions)
+        return self._read_positions(positions)
+
+    def _read_positions(self, positions: List[int]) -> Iterator[Dict[str, str]]:
+        """Parse rows at ascending positions, seeking only when the next one is far ahead."""
+        if self.use_mmap:
+            mapped = self._mapped()
+            pos, current = 0, None
+            for position in positions:
+                if current is None or position < current or position - current >= self.offset_stride:
+                    start, skip = self._offsets.locate(position)
+                    pos = mapped.skip(start, skip)
+                else:
+                    pos = mapped.skip(pos, position - current)
+                end = mapped.record_end(pos)
+                self.metrics.rows_parsed += 1
+                yield LazyRow(mapped, pos, end, self._fieldnames)
+                pos, current = end, position + 1
+            return
+        records = None
+        current = 0  # position of the record `records` yields next
+        for position in positions:
+            if records is None or position < current or position - current >= self.offset_stride:
+                start, skip = self._offsets.locate(position)
+                records = iter_records(self.path, start)
+                current = position - skip
+            while current < position:
+                next(records)
+                current += 1
+            _, record = next(records)
+            current += 1
+            self.metrics.rows_parsed += 1
+            yield record_to_row(self._fieldnames, record)
+
+    def _index_candidates(
+        self, filters: List[Tuple[str, str, str]], schema: Optional[Dict[str, str]],
+        q: Optional[str] = None,
+    ) -> Tuple[Optional[List[int]], List[str]]:
+        """Intersect index lookups for the filters (and search term) an index can answer."""
+        schema = schema or {}
+        candidates: Optional[Set[int]] = None
+        used = []
+        for col, op, value in filters:
+            index = self._indexes.get(col)
+            if index is None or index.col_type != schema.get(col, "string"):
+                continue
+            positions = index.lookup(op, value)
+            if positions is None:
+                continue
+            used.append(col)
+            candidates = set(positions) if candidates is None else candidates & set(positions)
+        if q and self.search_index:
+            if self._search is None:
+                # Publish only a complete index; concurrent readers may build one too.
+                search = SearchIndex()
+                search.build(enumerate(self.iter_rows()))
+                self._search = search
+            matches = self._search.candidates(q)
+            if matches is not None:
+                used.append("q")
+                candidates = matches if candidates is None else candidates & matches
+        if filters and isinstance(self._rows, ColumnarTable):
+            positions = self._rows.select(filters, schema)
+            if positions is not None:
+                used.append("columnar")
+                candidates = set(positions) if candidates is None else candidates & set(positions)
+        if candidates is None:
+            return None, used
+        return sorted(candidates), used
+
+    def _candidate_rows(
+        self, parsed: List[Tuple[str, str, str]], schema: Optional[Dict[str, str]],
+        q: Optional[str],
+    ) -> Tuple[Iterator[Dict[str, str]], Dict[str, Any]]:
+        """Rows worth running the predicate on, and the plan that picked them."""
+        candidates, used = self._index_candidates(parsed, schema, q)
+        if candidates is None:
+            if parsed or q:
+                self.index_misses += 1
+            return self.iter_rows(), {"index": None}
+        self.index_hits += 1
+        return self._rows_at(candidates), {"index": used, "candidates": len(candidates)}
+
+    def query(
+        self,
+        q: Optional[str] = None,
+        filters: Optional[Iterable[str]] = None,
+        sort: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+        schema: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        parsed = parse_filters(filters)
+        sort_keys = parse_sort(sort)
+        with self._reading():
+
+            # Ordered scan: a single sort key on an indexed or dictionary-encoded column
+            # needs no sort at all.
+            if not q and not parsed and len(sort_keys) == 1:
+                col, descending = sort_keys[0]
+                index = self._indexes.get(col)
+                if index is not None and index.col_type == "string":
+                    self.index_hits += 1
+                    page = list(islice(index.ordered(descending), offset, offset + limit))
+                    items = list(self._rows_at(sorted(page)))
+                    by_position = dict(zip(sorted(page), items))
+                    return {
+                        "items": [by_position[p] for p in page],
+                        "total": self._row_count(),
+                        "plan": {"index": [col], "candidates": len(page)},
+                    }
+                order = None
+                if isinstance(self._rows, ColumnarTable) and (schema or {}).get(col) not in NUMERIC_TYPES:
+                    order = self._rows.order(col, descending)
+                if order is not None:
+                    page = order[offset:offset + limit]
+                    return {
+                        "items": [self._rows[p] for p in page],
+                        "total": len(order),
+                        "plan": {"index": ["columnar"], "candidates": len(page)},
+                    }
+
+            if not q and not parsed and sort_keys:
+                with stage("sort"):
+                    order = self._sort_permutation(sort_keys, schema)
+                page = list(order[offset:offset + limit])
+                positions = sorted(page)
+                by_position = dict(zip(positions, self._rows_at(positions)))
+                return {
+                    "items": [by_position[p] for p in page],
+                    "total": len(order),
+                    "plan": {"index": ["sort_cache"], "candidates": len(page)},
+                }
+
+            with stage("filter"):
+                rows, plan = self._candidate_rows(parsed, schema, q)
+            result = run_query(rows, q, filters, sort, limit, offset, schema)
+            result["plan"] = plan
+            return result
+
+    def _sort_permutation(self, sort_keys: List[Tuple[str, bool]], schema: Optional[Dict[str, str]]) -> array:
+        """The table's sorted positions, computed once per sort until the next write."""
+        types = schema or {}
+        key = (tuple(sort_keys), tuple(types.get(col, "string") for col, _ in sort_keys))
+        with self._sorts_lock:
+            order = self._sorts.get(key)
+            if order is not None:
+                self._sorts.move_to_end(key)
+                self.index_hits += 1
+                return order
+        order = array("L", sort_positions(self.iter_rows(), sort_keys, schema))
+        with self._sorts_lock:
+            self._sorts[key] = order
+            while len(self._sorts) > SORT_CACHE_SIZE:
+                self._sorts.popitem(last=False)
+        return order
+
+    def _maintained(self, schema: Dict[str, str]) -> List[MaintainedAggregate]:
+        """The declared aggregates, built from one pass over the table on first use."""
+        with self._aggs_lock:
+            if self._aggs is None:
+                aggs = [MaintainedAggregate(group_by, metrics, schema) for group_by, metrics in self.aggregate_specs]
+                for row in self.iter_rows():
+                    for agg in aggs:
+                        agg.add(row)
+                self._aggs = aggs
+            return self._aggs
+
+    def aggregate(
+        self,
+        group_by: Any = None,
+        metrics: Any = None,
+        q: Optional[str] = None,
+        filters: Optional[Iterable[str]] = None,
+        schema: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """Grouped metrics over the rows matching q/filters (see csv_server.aggregate)."""
+        schema = schema or {}
+        parsed = parse_filters(filters)
+        aggregator = Aggregator(parse_group_by(group_by), parse_metrics(metrics), schema)
+        with self._reading():
+            if not q and not parsed:
+                if self.aggregate_specs:
+                    for agg in self._maintained(schema):
+                        if agg.covers(aggregator.group_by, aggregator.metrics, schema):
+                            with self._aggs_lock:
+                                groups, total = agg.result(aggregator.metrics), agg.total
+                            self.index_hits += 1
+                            return {"groups": groups, "total": total,
+                                    "plan": {"index": ["aggregate"], "candidates": len(groups)}}
+                if isinstance(self._rows, ColumnarTable) and self._rows.aggregate_into(aggregator):
+                    return {"groups": aggregator.result(), "total": aggregator.total,
+                            "plan": {"index": ["columnar"], "candidates": len(self._rows)}}
+            rows, plan = self._candidate_rows(parsed, schema, q)
+            predicate = compile_predicate(parsed, schema, q)
+            for row in rows:
+                if predicate is None or predicate(row):
+                    aggregator.add(row)
+            return {"groups": aggregator.result(), "total": aggregator.total, "plan": plan}
+
+    def stream(
+        self,
+        q: Optional[str] = None,
+        filters: Optional[Iterable[str]] = None,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        schema: Optional[Dict[str, str]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        parsed = parse_filters(filters)
+        with self._reading():
+            rows, _ = self._candidate_rows(parsed, schema, q)
+        return iter_query(rows, q, filters, sort, limit, offset, schema)
 
     def get(self, id: str) -> Optional[Dict[str, Any]]:
-        rows = read_rows(self.path)
-        for row in rows:
-            if row.get(self.pk) == id:
-                return row
-        return None
+        with self._reading():
+            position = self._pk_index.get(id)
+            if position is None:
+                return None
+            if self._rows is not None:
+                return self._rows[position]
+            rows = self._read_at(position, 1)
+        if not rows or rows[0].get(self.pk) != id:
+            # The file was replaced between the stat and the read; rescan once.
+            with self._lock.write():
+                self._scan(keep_rows=False)
+                position = self._pk_index.get(id)
+                if position is None:
+                    return None
+                rows = self._read_at(position, 1)
+        return rows[0]
+
+    def _claim(self, data: Dict[str, Any], seen: Set[str]) -> Dict[str, Any]:
+        """Give a new row its pk (checking for duplicates) and reserve it."""
+        key = data.get(self.pk)
+        if key and (key in self._pk_index or key in seen):
+            raise DuplicateKeyError(f"{self.pk}={key} already exists")
+        result = {**data, self.pk: key or self._next_id()}
+        key = result[self.pk]
+        seen.add(key)
+        if self._max_id is not None:
+            try:
+                self._max_id = max(self._max_id, int(key))
+            except ValueError:
+                pass
+        return result
+
+    def _track_append(self, result: Dict[str, Any], offset: int) -> None:
+        """Index a row that was just appended at ``offset``."""
+        self._changed()
+        self._track_aggregates(None, result)
+        self._offsets.add(offset)
+        if self._rows is not None:
+            self._rows.append({k: result.get(k, "") for k in self._fieldnames})
+        position = self._offsets.count - 1
+        key = result.get(self.pk)
+        if key in self._pk_index:
+            self.duplicate_keys.add(key)
+        elif key:
+            self._pk_index[key] = position
+        for col, index in self._indexes.items():
+            index.add(position, result.get(col, ""))
+        if self._search is not None:
+            self._search.add(position, result)
 
     def create(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        result = ensure_pk_and_autoincrement(self.path, data, pk=self.pk)
-        self.invalidate_schema_cache()  # Invalidate cache on structure change
+        self._refresh()
+        if self._wal is None and self.pk not in self._fieldnames:
+            with self._lock.write():
+                # Empty file or no pk column yet: let the helper lay out the header.
+                result = ensure_pk_and_autoincrement(self.path, data, pk=self.pk)
+                self._touch()
+                self.invalidate_cache()
+                return result
+        result = self.bulk_create([data])[0]
+        if isinstance(result, Exception):
+            raise result
         return result
 
+    def bulk_create(self, rows: List[Dict[str, Any]]) -> List[Any]:
+        """Create rows with a single append (or one rewrite if columns are added).
+
+        Each result is the stored row or the DuplicateKeyError that rejected it.
+        """
+        results: List[Any] = []
+        created: List[Dict[str, Any]] = []
+        seen: Set[str] = set()
+        if self._wal is not None:
+            batch = None
+            with self._lock.write():
+                self._refresh()
+                for data in rows:
+                    try:
+                        result = self._claim(data, seen)
+                    except DuplicateKeyError as e:
+                        results.append(e)
+                        continue
+                    _, batch = self._log({"op": "create", "id": result[self.pk], "data": result})
+                    results.append(result)
+                batch = self._commit_shared(batch)
+            self._committed(batch)
+            return results
+
+        with self._lock.write():
+            self._refresh()
+            if self.pk not in self._fieldnames and rows:
+                # The first row lays out the header; the rest can then be batched.
+                try:
+                    first: Any = self.create(rows[0])
+                except DuplicateKeyError as e:
+                    first = e
+                return [first] + self.bulk_create(rows[1:])
+            for data in rows:
+                try:
+                    result = self._claim(data, seen)
+                except DuplicateKeyError as e:
+                    results.append(e)
+                    continue
+                results.append(result)
+                created.append(result)
+            if not created:
+                return results
+
+            new_columns: List[str] = []
+            for result in created:
+                new_columns += [col for col in result if col not in self._fieldnames and col not in new_columns]
+            self._schema.observe(created, self._fieldnames + new_columns)
+            if new_columns:
+                fieldnames = self._fieldnames + new_columns
+                table = self._normalized(list(self._load_rows()) + created, fieldnames)
+                self._write(table, fieldnames)
+                self._reindex(table)
+                stored = dict(zip(map(id, created), table[len(table) - len(created):]))
+                results = [stored.get(id(result), result) for result in results]
+                for result in stored.values():
+                    self._track_aggregates(None, result)
+            else:
+                before = self._signature
+                offsets = append_rows(self.path, [[r.get(k, "") for k in self._fieldnames] for r in created])
+                for result, offset in zip(created, offsets):
+                    self._track_append(result, offset)
+                self._signature = file_signature(self.path)
+                self.metrics.rows_written += len(created)
+                if before is not None and self._signature is not None:
+                    self.metrics.bytes_written += self._signature[1] - before[1]
+                self._fingerprint = self._read_fingerprint(self._signature)
+                self._schema.rekey(before, self._signature)
+                self._touch()
+            return results
+
     def update(self, id: str, data: Dict[str, Any]) -> Dict[str, Any]:
-        rows = read_rows(self.path)
-        updated = False
-        for i, row in enumerate(rows):
-            if row.get(self.pk) == id:
-                rows[i] = {**row, **data, self.pk: id}
-                updated = True
-                break
-        if not updated:
-            raise KeyError(f"{self.pk}={id} not found")
-        # If the update adds new columns, invalidate cache
-        result = rows[i]
-        # Only invalidate if new columns were added
-        if any(col not in self.get_schema() for col in data.keys()):
-            self.invalidate_schema_cache()
-        write_rows_atomic(self.path, rows)
+        result = self.bulk_update([(id, data)])[0]
+        if isinstance(result, Exception):
+            raise result
         return result
 
+    def bulk_update(self, changes: List[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """Apply (id, data) merges with one rewrite; a missing id yields a KeyError result."""
+        results: List[Any] = []
+        if self._wal is not None:
+            batch = None
+            with self._lock.write():
+                self._refresh()
+                for id, data in changes:
+                    if id not in self._pk_index:
+                        results.append(KeyError(f"{self.pk}={id} not found"))
+                        continue
+                    result, batch = self._log({"op": "update", "id": id, "data": data})
+                    results.append(result)
+                batch = self._commit_shared(batch)
+            self._committed(batch)
+            return results
+
+        with self._lock.write():
+            rows = list(self._load_rows())
+            new_columns: List[str] = []
+            positions: List[Optional[int]] = []
+            for id, data in changes:
+                position = self._pk_index.get(id)
+                positions.append(position)
+                if position is None:
+                    results.append(KeyError(f"{self.pk}={id} not found"))
+                    continue
+                old = rows[position]
+                result = {**old, **data, self.pk: id}
+                rows[position] = result
+                self._track_aggregates(old, result)
+                for col, index in self._indexes.items():
+                    index.remove(position, old.get(col, ""))
+                    index.add(position, result.get(col, ""))
+                if self._search is not None:
+                    self._search.remove(position, old)
+                    self._search.add(position, result)
+                new_columns += [col for col in data if col not in self._fieldnames and col not in new_columns]
+                results.append(result)
+            if len(results) == sum(isinstance(r, Exception) for r in results):
+                return results
+            fieldnames = self._fieldnames + new_columns
+            self._schema.observe([r for r in results if not isinstance(r, Exception)], fieldnames)
+            if new_columns:
+                rows = self._normalized(rows, fieldnames)
+                results = [rows[p] if p is not None else r for p, r in zip(positions, results)]
+            self._write(rows, fieldnames)
+            return results
+
     def delete(self, id: str) -> None:
-        rows = read_rows(self.path)
-        rows = [row for row in rows if row.get(self.pk) != id]
-        write_rows_atomic(self.path, rows)
\ No newline at end of file
+        self.bulk_delete([id])
+
+    def bulk_delete(self, ids: List[str]) -> List[Any]:
+        """Delete rows with one rewrite; each result is True or a KeyError for a missing id."""
+        results: List[Any] = []
+        if self._wal is not None:
+            batch = None
+            with self._lock.write():
+                self._refresh()
+                for id in ids:
+                    if id not in self._pk_index:
+                        results.append(KeyError(f"{self.pk}={id} not found"))
+                        continue
+                    _, batch = self._log({"op": "delete", "id": id})
+                    results.append(True)
+                batch = self._commit_shared(batch)
+            self._committed(batch)
+            return results
+
+        with self._lock.write():
+            rows = self._load_rows()
+            doomed = set()
+            for id in ids:
+                if id in self._pk_index and id not in doomed:
+                    doomed.add(id)
+                    results.append(True)
+                else:
+                    results.append(KeyError(f"{self.pk}={id} not found"))
+            if not doomed:
+                return results
+            kept = []
+            for row in rows:
+                if row.get(self.pk) in doomed:
+                    self._track_aggregates(row, None)
+                else:
+                    kept.append(row)
+            rows = kept
+            self._write(rows, self._fieldnames)
+            self._reindex(rows)
+            return results
@@ -0,0 +1,132 @@
+# Secondary column indexes for CSVStorage.
+# Each declared column gets a hash index (typed value -> row positions) for
+# equality lookups and a sorted index ((typed value, position) pairs kept in
+# order with bisect) for range predicates and ordered scans. Indexes only
+# narrow the candidate rows; the compiled query predicate still checks them.
+
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from csv_server.query import NUMERIC_TYPES, to_number
+
+_MAX_CHAR = "\U0010ffff"
+
+class ColumnIndex:
+    def __init__(self, column: str, col_type: str = "string"):
+        self.column = column
+        self.col_type = col_type
+        self._hash: Dict[Any, List[int]] = {}
+        self._sorted: List[Tuple[Any, int]] = []
+
+    def _key(self, value: Optional[str]) -> Any:
+        """Typed key for a cell, None for empty cells, the raw text if it won't convert."""
+        if value is None or value == "":
+            return None
+        if self.col_type in NUMERIC_TYPES:
+            try:
+                return to_number(value)
+            except ValueError:
+                return value
+        return value
+
+    def _sortable(self, key: Any) -> bool:
+        if self.col_type in NUMERIC_TYPES:
+            return isinstance(key, (int, float))
+        return True
+
+    def _sort_key(self, key: Any) -> Any:
+        # Empty strings sort first, matching query.sort_rows.
+        return "" if key is None else key
+
+    def build(self, values: Iterable[Optional[str]]) -> None:
+        """Rebuild from cell values in row-position order."""
+        self._hash = {}
+        pairs = []
+        for position, value in enumerate(values):
+            key = self._key(value)
+            self._hash.setdefault(key, []).append(position)
+            if self._sortable(key):
+                pairs.append((self._sort_key(key), position))
+        pairs.sort()
+        self._sorted = pairs
+
+    def add(self, position: int, value: Optional[str]) -> None:
+        key = self._key(value)
+        self._hash.setdefault(key, []).append(position)
+        if self._sortable(key):
+            insort(self._sorted, (self._sort_key(key), position))
+
+    def remove(self, position: int, value: Optional[str]) -> None:
+        key = self._key(value)
+        bucket = self._hash.get(key)
+        if bucket and position in bucket:
+            bucket.remove(position)
+            if not bucket:
+                del self._hash[key]
+        if self._sortable(key):
+            i = bisect_left(self._sorted, (self._sort_key(key), position))
+            if i < len(self._sorted) and self._sorted[i] == (self._sort_key(key), position):
+                del self._sorted[i]
+
+    def _range(self, lo: Optional[Tuple[Any, bool]], hi: Optional[Tuple[Any, bool]]) -> List[int]:
+        """Positions with keys between lo and hi; each bound is (key, inclusive)."""
+        # (key,) sorts before every (key, position) pair and (key, inf) after them.
+        start, end = 0, len(self._sorted)
+        if lo is not None:
+            key, inclusive = lo
+            if inclusive:
+                start = bisect_left(self._sorted, (key,))
+            else:
+                start = bisect_right(self._sorted, (key, float("inf")))
+        if hi is not None:
+            key, inclusive = hi
+            if inclusive:
+                end = bisect_right(self._sorted, (key, float("inf")))
+            else:
+                end = bisect_left(self._sorted, (key,))
+        return [position for _, position in self._sorted[start:end]]
+
+    def lookup(self, op: str, value: str) -> Optional[List[int]]:
+        """Candidate positions for ``col op value``, or None if this index can't answer it."""
+        numeric = self.col_type in NUMERIC_TYPES
+        if op == "isnull":
+            if value.lower() in ("false", "0", "no"):
+                return None
+            return list(self._hash.get(None, []))
+        if op in ("eq", "in"):
+            values = value.split(",") if op == "in" else [value]
+            positions: List[int] = []
+            for v in values:
+                positions.extend(self._hash.get(self._key(v), []))
+            return positions
+        if op == "startswith" and not numeric:
+            return self._range((value, True), (value + _MAX_CHAR, False))
+        if op in ("lt", "lte", "gt", "gte"):
+            key = self._key(value)
+            if key is None or not self._sortable(key):
+                return None
+            if op in ("gt", "gte"):
+                return self._range((key, op == "gte"), None)
+            positions = self._range(None, (key, op == "lte"))
+            if not numeric:
+                # Empty cells never satisfy a range filter.
+                nulls = set(self._hash.get(None, []))
+                positions = [p for p in positions if p not in nulls]
+            return positions
+        return None
+
+    def ordered(self, descending: bool = False) -> Iterator[int]:
+        """Row positions in sort order; ties keep file order in both directions."""
+        if not descending:
+            for _, position in self._sorted:
+                yield position
+            return
+        i = len(self._sorted)
+        while i > 0:
+            key = self._sorted[i - 1][0]
+            start = bisect_left(self._sorted, (key,), 0, i)
+            for _, position in self._sorted[start:i]:
+                yield position
+            i = start
+
+    def __len__(self) -> int:
+        return len(self._sorted)
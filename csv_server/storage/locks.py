@@ -0,0 +1,153 @@
+# Reader/writer locks for storage.
+# ReadWriteLock is for threads in one process: any number of readers, or one
+# writer. Waiting writers block new readers so a steady read load can't starve
+# writes. Both sides are re-entrant per thread, and the writing thread may also
+# take read locks.
+# ProcessLock extends that across processes (e.g. uvicorn --workers) with flock
+# on a sidecar `<file>.lock`. The first reader in a process takes it shared and
+# the writer takes it exclusive. Its first 8 bytes, mapped into every process,
+# hold a version counter that writers bump, so each worker can tell when its
+# caches are stale.
+# An optional on_wait(mode, seconds) callback hears how long each outermost
+# acquisition waited (zero when uncontended), for lock-wait metrics.
+
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+import portalocker
+
+_VERSION = struct.Struct("<Q")
+
+class ProcessLock:
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "a+b")
+        portalocker.lock(self._file, portalocker.LOCK_EX)
+        try:
+            if os.fstat(self._file.fileno()).st_size < _VERSION.size:
+                self._file.write(b"\0" * _VERSION.size)
+                self._file.flush()
+        finally:
+            portalocker.unlock(self._file)
+        self._map = mmap.mmap(self._file.fileno(), _VERSION.size)
+
+    def acquire(self, exclusive: bool) -> None:
+        portalocker.lock(self._file, portalocker.LOCK_EX if exclusive else portalocker.LOCK_SH)
+
+    def release(self) -> None:
+        portalocker.unlock(self._file)
+
+    @property
+    def version(self) -> int:
+        return _VERSION.unpack_from(self._map, 0)[0]
+
+    def bump(self) -> int:
+        """Advance the shared version; call with the lock held exclusively."""
+        version = self.version + 1
+        _VERSION.pack_into(self._map, 0, version)
+        return version
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+class ReadWriteLock:
+    def __init__(self, process_lock: Optional[ProcessLock] = None,
+                 on_wait: Optional[Callable[[str, float], None]] = None):
+        self.process_lock = process_lock
+        self.on_wait = on_wait
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    def _read_depth(self) -> int:
+        return getattr(self._local, "depth", 0)
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        me = threading.get_ident()
+        depth = self._read_depth()
+        waited = None
+        with self._cond:
+            if self._writer != me and depth == 0:
+                waited = 0.0
+                if self._writer is not None or self._waiting_writers:
+                    started = time.perf_counter()
+                    while self._writer is not None or self._waiting_writers:
+                        self._cond.wait()
+                    waited = time.perf_counter() - started
+                if not self._readers and self.process_lock is not None:
+                    started = time.perf_counter()
+                    self.process_lock.acquire(exclusive=False)
+                    waited += time.perf_counter() - started
+                self._readers += 1
+        if waited is not None and self.on_wait is not None:
+            self.on_wait("read", waited)
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if self._writer != me and depth == 0:
+                with self._cond:
+                    self._readers -= 1
+                    if not self._readers:
+                        if self.process_lock is not None:
+                            self.process_lock.release()
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        me = threading.get_ident()
+        if self._read_depth() and self._writer != me:
+            raise RuntimeError("Cannot upgrade a read lock to a write lock")
+        waited = 0.0
+        with self._cond:
+            if self._writer != me:
+                self._waiting_writers += 1
+                try:
+                    if self._writer is not None or self._readers:
+                        started = time.perf_counter()
+                        while self._writer is not None or self._readers:
+                            self._cond.wait()
+                        waited = time.perf_counter() - started
+                finally:
+                    self._waiting_writers -= 1
+                self._writer = me
+            self._write_depth += 1
+            first = self._write_depth == 1
+        if first and self.process_lock is not None:
+            started = time.perf_counter()
+            try:
+                self.process_lock.acquire(exclusive=True)
+            except BaseException:
+                self._leave_write()
+                raise
+            waited += time.perf_counter() - started
+        if first and self.on_wait is not None:
+            self.on_wait("write", waited)
+        try:
+            yield
+        finally:
+            if first and self.process_lock is not None:
+                self.process_lock.release()
+            self._leave_write()
+
+    def _leave_write(self) -> None:
+        with self._cond:
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    def reading(self) -> bool:
+        """Whether the current thread holds a read lock."""
+        return self._read_depth() > 0
@@ -0,0 +1,98 @@
+# Memory-mapped CSV reader with lazy row decoding.
+# The file stays mapped read-only; record boundaries are found with
+# quote-aware newline scans over the mapping, so skipping rows costs no
+# parsing or allocation. A record is decoded into a dict only when one of its
+# fields is first accessed.
+
+import csv
+import mmap
+import os
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from csv_server.utils_csv_ids import record_to_row
+
+_NEWLINE = b"\n"
+_QUOTE = b'"'
+_BLANK = (0x0A, 0x0D)  # "\n", "\r"
+
+class MappedCSV:
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            # mmap refuses empty files; an empty bytes object behaves the same here.
+            self._mm: Any = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+
+    def _skip_blank(self, pos: int) -> int:
+        mm = self._mm
+        while pos < self.size and mm[pos] in _BLANK:
+            pos += 1
+        return pos
+
+    def record_end(self, start: int) -> int:
+        """Offset just past the record starting at ``start``; newlines inside quotes don't count."""
+        mm = self._mm
+        quotes = 0
+        pos = start
+        while True:
+            nl = mm.find(_NEWLINE, pos)
+            if nl == -1:
+                return self.size
+            quotes += mm[pos:nl].count(_QUOTE)
+            pos = nl + 1
+            if quotes % 2 == 0:
+                return pos
+
+    def records(self, start: int = 0) -> Iterator[Tuple[int, int]]:
+        """Yield (start, end) spans of the records from ``start``, skipping blank lines."""
+        pos = self._skip_blank(start)
+        while pos < self.size:
+            end = self.record_end(pos)
+            yield pos, end
+            pos = self._skip_blank(end)
+
+    def skip(self, start: int, count: int) -> int:
+        """Offset of the record ``count`` records after the one at ``start``."""
+        pos = self._skip_blank(start)
+        for _ in range(count):
+            pos = self._skip_blank(self.record_end(pos))
+        return pos
+
+    def decode(self, start: int, end: int) -> List[str]:
+        text = self._mm[start:end].decode("utf-8")
+        return next(csv.reader([text]), [])
+
+    def header(self) -> Tuple[List[str], int]:
+        """Return (fieldnames, offset of the first data record)."""
+        for start, end in self.records(0):
+            return self.decode(start, end), end
+        return [], self.size
+
+class LazyRow(Mapping):
+    """Read-only row that decodes its record on first access."""
+
+    __slots__ = ("_source", "_start", "_end", "_fieldnames", "_row")
+
+    def __init__(self, source: MappedCSV, start: int, end: int, fieldnames: List[str]):
+        self._source = source
+        self._start = start
+        self._end = end
+        self._fieldnames = fieldnames
+        self._row: Optional[Dict[str, str]] = None
+
+    def _decoded(self) -> Dict[str, str]:
+        if self._row is None:
+            self._row = record_to_row(self._fieldnames, self._source.decode(self._start, self._end))
+        return self._row
+
+    def __getitem__(self, key: str) -> str:
+        return self._decoded()[key]
+
+    def __iter__(self):
+        return iter(self._decoded())
+
+    def __len__(self) -> int:
+        return len(self._decoded())
+
+    def __repr__(self) -> str:
+        return f"LazyRow({self._decoded()!r})"
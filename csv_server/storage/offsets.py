@@ -0,0 +1,40 @@
+# Sparse row-offset index for CSV files.
+# Records the byte offset of every `stride`-th row start plus the exact row
+# count, so paging and lookups by row position can seek close to the target
+# and parse at most `stride - 1` extra rows.
+
+from array import array
+from typing import Iterable, Tuple
+
+DEFAULT_STRIDE = 1024
+
+class RowOffsetIndex:
+    def __init__(self, stride: int = DEFAULT_STRIDE):
+        if stride < 1:
+            raise ValueError("stride must be >= 1")
+        self.stride = stride
+        self.offsets = array("q")
+        self.count = 0
+
+    @classmethod
+    def from_offsets(cls, offsets: Iterable[int], stride: int = DEFAULT_STRIDE) -> "RowOffsetIndex":
+        index = cls(stride)
+        for offset in offsets:
+            index.add(offset)
+        return index
+
+    def add(self, offset: int) -> None:
+        """Record the start of the next row (rows must be added in file order)."""
+        if self.count % self.stride == 0:
+            self.offsets.append(offset)
+        self.count += 1
+
+    def locate(self, position: int) -> Tuple[int, int]:
+        """Return (byte offset to seek to, rows to skip from there) for a row position."""
+        if not 0 <= position < self.count:
+            raise IndexError(position)
+        block = position // self.stride
+        return self.offsets[block], position - block * self.stride
+
+    def __len__(self) -> int:
+        return self.count
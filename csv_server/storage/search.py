@@ -0,0 +1,58 @@
+# Inverted trigram index for the `q` full-text search.
+# Every lowercased cell is split into 3-character grams, each mapped to the
+# set of row positions containing it. A search term's grams are intersected
+# to get candidate rows, which the compiled query predicate then verifies, so
+# results are identical to a full scan.
+
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+GRAM = 3
+
+def _grams(text: str) -> Set[str]:
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+class SearchIndex:
+    def __init__(self):
+        self._postings: Dict[str, Set[int]] = {}
+
+    @staticmethod
+    def _row_grams(row: Dict[str, Any]) -> Set[str]:
+        grams: Set[str] = set()
+        for value in row.values():
+            grams |= _grams(str(value).lower())
+        return grams
+
+    def build(self, rows: Iterable[Tuple[int, Dict[str, Any]]]) -> None:
+        self._postings = {}
+        for position, row in rows:
+            self.add(position, row)
+
+    def add(self, position: int, row: Dict[str, Any]) -> None:
+        for gram in self._row_grams(row):
+            self._postings.setdefault(gram, set()).add(position)
+
+    def remove(self, position: int, row: Dict[str, Any]) -> None:
+        for gram in self._row_grams(row):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(position)
+                if not posting:
+                    del self._postings[gram]
+
+    def candidates(self, q: str) -> Optional[Set[int]]:
+        """Rows that may contain every term of ``q``; None if no term is long enough to narrow."""
+        result: Optional[Set[int]] = None
+        for term in q.lower().split():
+            grams = _grams(term)
+            # Rarest grams first so the running intersection shrinks quickly.
+            for gram in sorted(grams, key=lambda g: len(self._postings.get(g, ()))):
+                posting = self._postings.get(gram)
+                if not posting:
+                    return set()
+                result = set(posting) if result is None else result & posting
+                if not result:
+                    return result
+        return result
+
+    def __len__(self) -> int:
+        return len(self._postings)
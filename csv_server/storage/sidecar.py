@@ -0,0 +1,199 @@
+# Binary column sidecar for CSVStorage (`cache_dir`).
+# After a CSV is parsed, its columns are written to `<cache_dir>/<file>.<hash>.cols`
+# as typed blocks (storage/columnar.py encodings: integer/float arrays with
+# exact-text overrides, dictionary codes plus distinct values), together with
+# the sparse row-offset index, the pk column and the duplicate keys the pk
+# index needs. The sidecar is keyed by the source's size, mtime and a hash of
+# its first and last bytes; any other file state is a miss and it is rewritten
+# after the next parse.
+# Later loads map the sidecar read-only and build columns on memoryviews cast
+# over their blocks, without copying: a start costs no CSV parse, and workers
+# on one machine share the column pages through the OS page cache. A column is
+# copied into private memory only when it is first written (columnar.py), and
+# the sparse row-offset index, which later appends grow, is always copied.
+# The mapping stays open while any column still uses it.
+#
+# Layout: MAGIC, header length (u64 little-endian), JSON header, then blocks
+# aligned to 8 bytes, addressed from the start of the data section.
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .columnar import Column, NumericColumn, StringColumn, typecode_of
+from .offsets import RowOffsetIndex
+
+MAGIC = b"CSVCOLS1"
+ALIGN = 8
+
+def sidecar_path(cache_dir: Path, source: Path) -> Path:
+    """Where the sidecar of ``source`` lives; the hash keeps same-named files apart."""
+    digest = hashlib.blake2b(str(Path(source).resolve()).encode("utf-8"), digest_size=8).hexdigest()
+    return Path(cache_dir) / f"{Path(source).name}.{digest}.cols"
+
+def source_key(signature: Any, fingerprint: Tuple[bytes, bytes]) -> Dict[str, Any]:
+    """Identity of the CSV a sidecar was built from: size, mtime and a hash of both ends."""
+    head, tail = fingerprint
+    return {
+        "size": signature[1],
+        "mtime_ns": signature[0],
+        "hash": hashlib.blake2b(head + tail, digest_size=16).hexdigest(),
+    }
+
+class Snapshot:
+    """What a scan of the CSV produces, minus the row dicts."""
+
+    def __init__(self, fieldnames: List[str], count: int, offsets: RowOffsetIndex,
+                 duplicates: Dict[str, int], columns: Dict[str, Column],
+                 schema: Optional[Dict[str, Any]] = None):
+        self.fieldnames = fieldnames
+        self.count = count
+        self.offsets = offsets
+        self.duplicates = duplicates  # duplicated pk -> position of its first row
+        self.columns = columns  # all, or just the ones a non-resident scan keeps
+        self.schema = schema
+
+    def pk_index(self, pk: str) -> Dict[str, int]:
+        """pk -> first row position, built without a Python-level loop over rows."""
+        column = self.columns.get(pk)
+        if column is None:
+            return {}
+        keys = column.tolist()
+        index = dict(zip(keys, range(len(keys))))
+        index.pop("", None)
+        index.update(self.duplicates)
+        return index
+
+    def rows(self) -> List[Dict[str, str]]:
+        values = [self.columns[col].tolist() for col in self.fieldnames]
+        return [dict(zip(self.fieldnames, record)) for record in zip(*values)]
+
+def _pad(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % ALIGN)
+
+def save(path: Path, key: Dict[str, Any], snapshot: Snapshot) -> bool:
+    """Write ``snapshot`` atomically; False if the cache directory isn't writable."""
+    blocks: List[bytes] = []
+    size = 0
+
+    def block(data: Any) -> List[int]:
+        nonlocal size
+        data = bytes(data)
+        where = [size, len(data)]
+        blocks.append(_pad(data))
+        size += len(blocks[-1])
+        return where
+
+    def strings(value: Any) -> List[int]:
+        return block(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    columns = {}
+    for col, column in snapshot.columns.items():
+        if isinstance(column, NumericColumn):
+            columns[col] = {
+                "kind": column.kind,
+                "values": block(column.values) + [typecode_of(column.values)],
+                "overrides": strings(column.overrides),
+            }
+        else:
+            columns[col] = {
+                "kind": "string",
+                "codes": block(column.codes) + [typecode_of(column.codes)],
+                "dictionary": strings(column.dictionary),
+            }
+    header = {
+        "key": key,
+        "byteorder": sys.byteorder,
+        "itemsizes": {code: array(code).itemsize for code in "Lqd"},
+        "fieldnames": snapshot.fieldnames,
+        "count": snapshot.count,
+        "stride": snapshot.offsets.stride,
+        "offsets": block(snapshot.offsets.offsets),
+        "duplicates": snapshot.duplicates,
+        "schema": snapshot.schema,
+        "columns": columns,
+    }
+    encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(encoded)))
+            f.write(_pad(encoded))
+            for data in blocks:
+                f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        return False
+    return True
+
+def _view(view: memoryview, start: int, where: List[Any]) -> memoryview:
+    """A typed, read-only view of a block; it keeps the mapping alive."""
+    offset, length, typecode = where
+    return view[start + offset:start + offset + length].cast(typecode)
+
+def _array(view: memoryview, start: int, where: List[Any]) -> array:
+    offset, length, typecode = where
+    values = array(typecode)
+    values.frombytes(view[start + offset:start + offset + length])
+    return values
+
+def _json(view: memoryview, start: int, where: List[int]) -> Any:
+    offset, length = where
+    return json.loads(bytes(view[start + offset:start + offset + length]))
+
+def load(path: Path, key: Dict[str, Any], stride: int, columns: Optional[Iterable[str]] = None) -> Optional[Snapshot]:
+    """The snapshot saved for the CSV at ``key`` with at least ``columns`` (default: all), else None.
+
+    Columns are zero-copy views over the mapped file; only the row offsets are copied.
+    """
+    try:
+        with open(path, "rb") as f:
+            # Not closed here: the column views keep the mapping referenced, and
+            # it is unmapped when the last of them is dropped.
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:len(MAGIC)] != MAGIC:
+            return None
+        (length,) = struct.unpack_from("<Q", mapped, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(mapped[start:start + length])
+        if (header["key"] != key or header["byteorder"] != sys.byteorder or header["stride"] != stride
+                or header["itemsizes"] != {code: array(code).itemsize for code in "Lqd"}):
+            return None
+        fieldnames = header["fieldnames"]
+        wanted = fieldnames if columns is None else [col for col in columns if col in fieldnames]
+        if any(col not in header["columns"] for col in wanted):
+            return None
+        start += length + (-length % ALIGN)
+        view = memoryview(mapped)
+        try:
+            loaded: Dict[str, Column] = {}
+            for col in dict.fromkeys(wanted):
+                spec = header["columns"][col]
+                if spec["kind"] == "string":
+                    loaded[col] = StringColumn.from_parts(
+                        _view(view, start, spec["codes"]), _json(view, start, spec["dictionary"]),
+                    )
+                else:
+                    overrides = {int(i): text for i, text in _json(view, start, spec["overrides"]).items()}
+                    loaded[col] = NumericColumn.from_parts(
+                        spec["kind"], _view(view, start, spec["values"]), overrides,
+                    )
+            offsets = RowOffsetIndex(stride)
+            offsets.offsets = _array(view, start, header["offsets"] + ["q"])
+            offsets.count = header["count"]
+        finally:
+            view.release()
+    except (OSError, ValueError, KeyError, TypeError, struct.error):
+        return None
+    return Snapshot(fieldnames, header["count"], offsets, header["duplicates"], loaded, header["schema"])
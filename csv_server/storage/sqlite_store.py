@@ -1 +1,414 @@
-# This file is intentionally left blank.
\ No newline at end of file
+# SQLite storage backend for CSV Server.
+# - Imports the CSV into a SQLite database (WAL mode). Cells are stored as the
+#   exact CSV text, so an export writes back what was read ("007", "10.50");
+#   numeric columns (from the inferred schema) are compared and sorted through
+#   CAST(... AS NUMERIC), and declared indexes on them are on that expression.
+# - Serves CRUD and filtered/sorted list queries with SQL.
+# - The database file is shared by every worker, so the version behind
+#   ETags is a write counter stored in it, bumped in each write transaction.
+# - The CSV is re-imported when it changed since the last import/export, and
+#   written back with export_csv(), either on demand, on close() or every
+#   `export_interval` seconds.
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from csv_server.exceptions import DuplicateKeyError, StorageError, ValidationError
+from csv_server.query import NUMERIC_TYPES, parse_filters, parse_sort, to_number
+from csv_server.schema import SchemaCache, HEAD_ROWS, SAMPLE_ROWS
+from csv_server.metrics import StorageMetrics
+from csv_server.utils_csv_ids import (
+    file_signature, iter_records, record_to_row, write_rows_atomic, max_int_key,
+)
+from .base import BaseStorage
+
+TABLE = "rows"
+LAYOUT = "text"  # databases from before cells were kept as text are re-imported
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _cast(name: str) -> str:
+    """A numeric column's value for comparisons and sorts; cells stay text."""
+    return f"CAST({_quote(name)} AS NUMERIC)"
+
+def _to_text(value: Any) -> str:
+    return "" if value is None else str(value)
+
+class SQLiteStorage(BaseStorage):
+    def __init__(self, path: Path, pk: str = "id", db_path: Optional[Path] = None,
+                 indexes: Optional[Iterable[str]] = None, export_interval: Optional[float] = None,
+                 schema_head: int = HEAD_ROWS, schema_sample: int = SAMPLE_ROWS):
+        self.path = Path(path)
+        self.pk = pk
+        self.db_path = Path(db_path) if db_path else self.path.with_suffix(".sqlite")
+        self.index_columns: List[str] = list(indexes or [])
+        self._lock = threading.RLock()
+        self.metrics = StorageMetrics()  # CSV import/export I/O; queries run in SQLite
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS _meta (key TEXT PRIMARY KEY, value TEXT)")
+            # Identifies this database file, so a recreated one never repeats a version.
+            self._conn.execute("INSERT OR IGNORE INTO _meta (key, value) VALUES ('created', ?)",
+                               (f"{time.time_ns():x}",))
+        # version() reads through its own connection: WAL readers don't wait for
+        # writers, so it never queues behind an import or export holding _lock.
+        self._reader = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._reader_lock = threading.Lock()  # held for one small read only
+        self._columns: List[str] = []
+        self._types: Dict[str, str] = {}
+        self._dirty = False
+        self._schema = SchemaCache(self.path, schema_head, schema_sample)
+        self._sync_from_csv()
+        self._timer: Optional[threading.Timer] = None
+        self.export_interval = export_interval
+        if export_interval:
+            self._schedule_export()
+
+    # -- import / export -------------------------------------------------
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM _meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO _meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _load_columns(self) -> None:
+        info = self._conn.execute(f"PRAGMA table_info({_quote(TABLE)})").fetchall()
+        self._columns = [r[1] for r in info]
+        types = json.loads(self._meta("types") or "{}")
+        self._types = {col: types.get(col, "string") for col in self._columns}
+
+    def _sync_from_csv(self) -> None:
+        """Import the CSV unless the database already holds what it contains."""
+        signature = str(file_signature(self.path))
+        with self._lock:
+            table_exists = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (TABLE,)
+            ).fetchone()
+            if (table_exists and self._meta("source_signature") == signature
+                    and self._meta("layout") == LAYOUT):
+                self._load_columns()
+                return
+            self.import_csv()
+
+    def import_csv(self) -> None:
+        """(Re)build the table from the CSV file."""
+        schema = self._schema.get()
+        fieldnames: List[str] = []
+        records: Iterator[Tuple[int, List[str]]] = iter(())
+        if self.path.exists():
+            records = iter_records(self.path)
+            header = next(records, None)
+            fieldnames = header[1] if header else []
+        if self.pk not in fieldnames:
+            fieldnames = [self.pk] + fieldnames
+
+        columns = []
+        for col in fieldnames:
+            decl = f"{_quote(col)} TEXT"
+            if col == self.pk:
+                decl += " PRIMARY KEY"
+            columns.append(decl)
+        types = {col: schema.get(col, "string") for col in fieldnames}
+        placeholders = ", ".join("?" for _ in fieldnames)
+        insert = f"INSERT INTO {_quote(TABLE)} VALUES ({placeholders})"
+
+        with self._lock, self._conn:
+            self._conn.execute(f"DROP TABLE IF EXISTS {_quote(TABLE)}")
+            self._conn.execute(f"CREATE TABLE {_quote(TABLE)} ({', '.join(columns)})")
+
+            def values() -> Iterator[List[Optional[str]]]:
+                for _, record in records:
+                    self.metrics.rows_parsed += 1
+                    row = record_to_row(fieldnames, record)
+                    yield [row[c] if row[c] != "" else None for c in fieldnames]
+            try:
+                self._conn.executemany(insert, values())
+            except sqlite3.IntegrityError as e:
+                raise StorageError(f"Cannot import {self.path.name}: duplicate {self.pk} ({e})")
+            for col in self.index_columns:
+                if col in fieldnames and col != self.pk:
+                    # Indexed as queries use it: numeric columns by their CAST.
+                    expr = _cast(col) if types[col] in NUMERIC_TYPES else _quote(col)
+                    self._conn.execute(
+                        f"CREATE INDEX {_quote('idx_' + col)} ON {_quote(TABLE)} ({expr})"
+                    )
+            self._set_meta("source_signature", str(file_signature(self.path)))
+            self._set_meta("types", json.dumps(types))
+            self._set_meta("layout", LAYOUT)
+            self._conn.execute("DELETE FROM _meta WHERE key = 'max_id'")
+            self._bump()
+        self.metrics.bytes_read += (file_signature(self.path) or (0, 0, 0))[1]
+        self._load_columns()
+        self._dirty = False
+
+    def export_csv(self) -> None:
+        """Write the table back to the CSV file atomically."""
+        with self._lock:
+            rows = list(self.iter_rows())
+            before = file_signature(self.path)
+            started = time.perf_counter()
+            write_rows_atomic(self.path, rows, self._columns)
+            self.metrics.rewrites.observe(time.perf_counter() - started)
+            self.metrics.rows_written += len(rows)
+            self.metrics.bytes_written += (file_signature(self.path) or (0, 0, 0))[1]
+            self._schema.rekey(before, file_signature(self.path))
+            with self._conn:
+                self._set_meta("source_signature", str(file_signature(self.path)))
+            self._dirty = False
+
+    def _schedule_export(self) -> None:
+        def tick():
+            if self._dirty:
+                self.export_csv()
+            self._schedule_export()
+        self._timer = threading.Timer(self.export_interval, tick)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._dirty:
+            self.export_csv()
+        self._conn.close()
+        self._reader.close()
+
+    def _bump(self) -> None:
+        """Move the shared version on; call inside the write transaction."""
+        self._conn.execute("INSERT OR IGNORE INTO _meta (key, value) VALUES ('version', '0')")
+        self._conn.execute("UPDATE _meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+        self._set_meta("modified", repr(time.time()))
+
+    def _next_id(self) -> str:
+        """Highest integer pk + 1, kept as a running max in _meta; call inside the write transaction."""
+        if self._meta("max_id") is None:  # first auto id since the import: one scan
+            keys = (r[0] for r in self._conn.execute(f"SELECT {_quote(self.pk)} FROM {_quote(TABLE)}"))
+            # OR IGNORE: another worker may have seeded it meanwhile, and is ahead of this scan.
+            self._conn.execute("INSERT OR IGNORE INTO _meta (key, value) VALUES ('max_id', ?)",
+                               (str(max_int_key(_to_text(k) for k in keys)),))
+        self._conn.execute("UPDATE _meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'max_id'")
+        return self._meta("max_id")
+
+    def _raise_max_id(self, key: Any) -> None:
+        try:
+            self._conn.execute(
+                "UPDATE _meta SET value = MAX(CAST(value AS INTEGER), ?) WHERE key = 'max_id'", (int(key),))
+        except (TypeError, ValueError, OverflowError):
+            pass  # not an integer key (or beyond SQLite's), so never the next auto id
+
+    def _changed(self) -> None:
+        self._dirty = True
+        self._bump()
+
+    def version(self) -> Tuple[str, float]:
+        """(token, last-modified time) read from the database, so writes by other workers count."""
+        with self._reader_lock:
+            meta = dict(self._reader.execute(
+                "SELECT key, value FROM _meta WHERE key IN ('created', 'version', 'modified')"
+            ).fetchall())
+        return f"{meta.get('created', '0')}-{int(meta.get('version', 0)):x}", float(meta.get("modified", 0))
+
+    def get_schema(self) -> Dict[str, str]:
+        """Sampled CSV types; columns added through the API since the import are strings."""
+        sampled = self._schema.get()
+        with self._lock:
+            return {col: sampled.get(col, self._types.get(col, "string")) for col in self._columns}
+
+    def describe_schema(self) -> Dict[str, Any]:
+        schema = self.get_schema()
+        return {"schema": schema, "nullable": [col for col in self._schema.nullable if col in schema]}
+
+    # -- helpers ---------------------------------------------------------
+
+    def _row(self, values: Tuple[Any, ...]) -> Dict[str, str]:
+        return {col: _to_text(v) for col, v in zip(self._columns, values)}
+
+    def _value(self, col: str, value: Any) -> Optional[str]:
+        return None if value is None or value == "" else str(value)
+
+    def _add_columns(self, data: Dict[str, Any]) -> None:
+        for col in data:
+            if col not in self._columns:
+                self._conn.execute(f"ALTER TABLE {_quote(TABLE)} ADD COLUMN {_quote(col)} TEXT")
+                self._columns.append(col)
+                self._types[col] = "string"
+
+    def _where(self, q: Optional[str], filters: Iterable[str]) -> Tuple[str, List[Any]]:
+        """Translate q and col:op:value filters into a WHERE clause using the column types."""
+        clauses: List[str] = []
+        params: List[Any] = []
+        for col, op, value in parse_filters(filters):
+            text = _quote(col) if col in self._columns else "NULL"
+            numeric = self._types.get(col, "string") in NUMERIC_TYPES
+            convert = to_number if numeric else str
+            expr = text
+            if op == "isnull":
+                want = value.lower() not in ("false", "0", "no")
+                clause = f"({expr} IS NULL OR {expr} = '')"
+                clauses.append(clause if want else f"NOT {clause}")
+                continue
+            if op == "contains":
+                clauses.append(f"instr({expr}, ?) > 0")
+                params.append(value)
+                continue
+            if op == "startswith":
+                clauses.append(f"substr({expr}, 1, ?) = ?")
+                params.extend([len(value), value])
+                continue
+            if numeric and col in self._columns:
+                expr = _cast(col)
+            try:
+                if op == "in":
+                    values = [convert(v) for v in value.split(",")]
+                else:
+                    target = convert(value)
+            except ValueError:
+                raise ValidationError(f"Filter value '{value}' is not a valid number for '{col}'")
+            if op == "in":
+                clauses.append(f"{expr} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+            elif op == "ne":
+                clauses.append(f"({expr} IS NULL OR {expr} != ?)")
+                params.append(target)
+            else:
+                sql_op = {"eq": "=", "lt": "<", "lte": "<=", "gt": ">", "gte": ">="}[op]
+                clauses.append(f"{expr} {sql_op} ?")
+                params.append(target)
+        for term in (q or "").lower().split():
+            cells = " OR ".join(f"instr(lower({_quote(c)}), ?) > 0" for c in self._columns)
+            clauses.append(f"({cells})")
+            params.extend([term] * len(self._columns))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _order_by(self, sort: Optional[str]) -> str:
+        keys = [
+            f"{_cast(col) if self._types.get(col) in NUMERIC_TYPES else _quote(col)} {'DESC' if descending else 'ASC'}"
+            for col, descending in parse_sort(sort) if col in self._columns
+        ]
+        return " ORDER BY " + ", ".join(keys + ["rowid"])
+
+    # -- BaseStorage -----------------------------------------------------
+
+    def list(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            cur = self._conn.execute(
+                f"SELECT * FROM {_quote(TABLE)} ORDER BY rowid LIMIT ? OFFSET ?", (limit, offset)
+            )
+            return [self._row(r) for r in cur]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {_quote(TABLE)}").fetchone()[0]
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM {_quote(TABLE)} ORDER BY rowid").fetchall()
+        for r in rows:
+            yield self._row(r)
+
+    def query(
+        self,
+        q: Optional[str] = None,
+        filters: Optional[Iterable[str]] = None,
+        sort: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+        schema: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        where, params = self._where(q, filters or [])
+        with self._lock:
+            total = self._conn.execute(
+                f"SELECT COUNT(*) FROM {_quote(TABLE)}{where}", params
+            ).fetchone()[0]
+            cur = self._conn.execute(
+                f"SELECT * FROM {_quote(TABLE)}{where}{self._order_by(sort)} LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            )
+            items = [self._row(r) for r in cur]
+        return {"items": items, "total": total, "plan": {"index": None}}
+
+    def stream(
+        self,
+        q: Optional[str] = None,
+        filters: Optional[Iterable[str]] = None,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        schema: Optional[Dict[str, str]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        where, params = self._where(q, filters or [])
+        sql = f"SELECT * FROM {_quote(TABLE)}{where}{self._order_by(sort)} LIMIT ? OFFSET ?"
+        params = params + [-1 if limit is None else limit, offset]
+
+        def rows() -> Iterator[Dict[str, Any]]:
+            # A dedicated connection lets the cursor stream without holding the lock.
+            conn = sqlite3.connect(str(self.db_path))
+            try:
+                for r in conn.execute(sql, params):
+                    yield self._row(r)
+            finally:
+                conn.close()
+        return rows()
+
+    def get(self, id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            r = self._conn.execute(
+                f"SELECT * FROM {_quote(TABLE)} WHERE {_quote(self.pk)} = ?",
+                (self._value(self.pk, id),),
+            ).fetchone()
+        return self._row(r) if r else None
+
+    def create(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock, self._conn:
+            self._add_columns(data)
+            row = dict(data)
+            if not row.get(self.pk):
+                row[self.pk] = self._next_id()
+            else:
+                self._raise_max_id(row[self.pk])
+            cols = list(row)
+            if cols:
+                sql = (f"INSERT INTO {_quote(TABLE)} ({', '.join(_quote(c) for c in cols)}) "
+                       f"VALUES ({', '.join('?' for _ in cols)})")
+            else:
+                sql = f"INSERT INTO {_quote(TABLE)} DEFAULT VALUES"
+            try:
+                cur = self._conn.execute(sql, [self._value(c, row[c]) for c in cols])
+            except sqlite3.IntegrityError:
+                raise DuplicateKeyError(f"{self.pk}={row.get(self.pk)} already exists")
+            self._changed()
+        return {**data, self.pk: row[self.pk]}
+
+    def update(self, id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock, self._conn:
+            self._add_columns(data)
+            changes = {c: v for c, v in data.items() if c != self.pk}
+            if changes:
+                assignments = ", ".join(f"{_quote(c)} = ?" for c in changes)
+                cur = self._conn.execute(
+                    f"UPDATE {_quote(TABLE)} SET {assignments} WHERE {_quote(self.pk)} = ?",
+                    [self._value(c, v) for c, v in changes.items()] + [self._value(self.pk, id)],
+                )
+                if cur.rowcount == 0:
+                    raise KeyError(f"{self.pk}={id} not found")
+                self._changed()
+            row = self.get(id)
+        if row is None:
+            raise KeyError(f"{self.pk}={id} not found")
+        return row
+
+    def delete(self, id: str) -> None:
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                f"DELETE FROM {_quote(TABLE)} WHERE {_quote(self.pk)} = ?", (self._value(self.pk, id),)
+            )
+            if cur.rowcount:
+                self._changed()
@@ -0,0 +1,102 @@
+# Write-ahead log with group commit for CSVStorage mutations.
+# Each mutation is one JSON line in `<file>.wal`. Writers queue their line and
+# then wait. The first waiter becomes the leader: it holds the batch open for a
+# short window (or until it is full), writes every queued line in one write,
+# fsyncs once and wakes the rest. Entries are idempotent upserts and deletes,
+# so replaying a log over a CSV that already contains some of them is safe.
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from csv_server.exceptions import StorageError
+
+DEFAULT_WINDOW = 0.005  # seconds a batch stays open for more writers
+DEFAULT_BATCH = 256  # entries that close a batch early
+
+class WriteAheadLog:
+    def __init__(self, path: Path, window: float = DEFAULT_WINDOW, max_batch: int = DEFAULT_BATCH):
+        self.path = path
+        self.window = window
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._io = threading.Lock()  # serializes file writes with truncation
+        self._pending: List[bytes] = []
+        self._batch = 0  # number of the batch currently being filled
+        self._flushed = 0  # batches below this number are on disk
+        self._leader = False
+        self._error: Optional[Tuple[int, Exception]] = None
+        self._file = open(path, "ab")
+        self.entries = 0  # entries written since the last truncate
+        self.commits = 0  # fsyncs, i.e. committed batches
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """Yield the logged entries in order; a torn last line (crash mid-write) is ignored."""
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    break
+
+    def submit(self, entry: Dict[str, Any]) -> int:
+        """Queue an entry and return the batch it will be committed in."""
+        line = json.dumps(entry, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._cond:
+            self._pending.append(line)
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+            return self._batch
+
+    def wait(self, batch: int) -> None:
+        """Block until ``batch`` is durable, committing it ourselves if nobody else is."""
+        with self._cond:
+            while self._flushed <= batch:
+                if self._leader:
+                    self._cond.wait()
+                    continue
+                self._leader = True
+                self._cond.wait_for(lambda: len(self._pending) >= self.max_batch, self.window)
+                lines, self._pending = self._pending, []
+                current = self._batch
+                self._batch += 1
+                self._cond.release()
+                try:
+                    self._commit(lines)
+                except OSError as exc:
+                    self._error = (current, exc)
+                finally:
+                    self._cond.acquire()
+                    self._flushed = current + 1
+                    self._leader = False
+                    self._cond.notify_all()
+            if self._error is not None and self._error[0] == batch:
+                raise StorageError(f"Write-ahead log commit failed: {self._error[1]}")
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        self.wait(self.submit(entry))
+
+    def _commit(self, lines: List[bytes]) -> None:
+        if not lines:
+            return
+        with self._io:
+            self._file.write(b"".join(lines))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.entries += len(lines)
+            self.commits += 1
+
+    def truncate(self) -> None:
+        """Drop the logged entries once a checkpoint has folded them into the CSV."""
+        with self._io:
+            self._file.truncate(0)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.entries = 0
+
+    def close(self) -> None:
+        with self._io:
+            self._file.close()
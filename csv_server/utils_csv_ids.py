@@ -1,7 +1,7 @@
 from pathlib import Path
 from tempfile import NamedTemporaryFile
-import csv, os
-from typing import Dict, List, Optional, Iterable
+import csv, io, os
+from typing import Dict, List, Optional, Iterable, Iterator, Tuple
 import portalocker
 
 def read_rows(path: Path) -> List[Dict[str, str]]:
@@ -10,15 +10,102 @@ def read_rows(path: Path) -> List[Dict[str, str]]:
     with open(path, "r", newline="", encoding="utf-8") as f:
         return list(csv.DictReader(f))
 
-def write_rows_atomic(path: Path, rows: List[Dict[str, str]], field_order: Optional[Iterable[str]] = None):
+def file_signature(path: Path) -> Optional[Tuple[int, int, int]]:
+    """Return a cheap change fingerprint (mtime_ns, size, inode), or None if missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+def iter_records(path: Path, start: int = 0) -> Iterator[Tuple[int, List[str]]]:
+    """Yield (byte_offset, fields) for every CSV record from ``start``, header included.
+
+    Lines are fed to csv.reader one at a time, so the reader never reads ahead and the
+    position after the previous record is the start of the next one, even when quoted
+    fields span several lines. Blank lines are skipped.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        pos = start
+
+        def lines() -> Iterator[str]:
+            nonlocal pos
+            for raw in f:
+                pos += len(raw)
+                yield raw.decode("utf-8")
+
+        reader = csv.reader(lines())
+        while True:
+            begin = pos
+            try:
+                record = next(reader)
+            except StopIteration:
+                return
+            if record:
+                yield begin, record
+
+def record_to_row(fieldnames: List[str], record: List[str]) -> Dict[str, str]:
+    row = dict(zip(fieldnames, record))
+    if len(record) < len(fieldnames):
+        for k in fieldnames[len(record):]:
+            row[k] = ""
+    return row
+
+def encode_row(values: Iterable[str]) -> bytes:
+    buf = io.StringIO()
+    csv.writer(buf).writerow(values)
+    return buf.getvalue().encode("utf-8")
+
+def write_rows_atomic(path: Path, rows: List[Dict[str, str]], field_order: Optional[Iterable[str]] = None) -> List[int]:
+    """Rewrite ``path`` with ``rows`` via a temp file; return each row's byte offset."""
     keys = list(field_order) if field_order else (list(rows[0].keys()) if rows else [])
-    tmp = NamedTemporaryFile("w", delete=False, newline="", encoding="utf-8")
+    offsets = []
+    tmp = NamedTemporaryFile("wb", delete=False, dir=Path(path).parent, suffix=".tmp")
     with tmp as tf:
-        writer = csv.DictWriter(tf, fieldnames=keys)
-        writer.writeheader()
+        pos = tf.write(encode_row(keys))
         for r in rows:
-            writer.writerow({k: r.get(k, "") for k in keys})
+            line = encode_row([r.get(k, "") for k in keys])
+            offsets.append(pos)
+            pos += tf.write(line)
+        # Durable before it replaces the original (a WAL checkpoint truncates its log next).
+        tf.flush()
+        os.fsync(tf.fileno())
     os.replace(tmp.name, path)
+    return offsets
+
+def append_rows(path: Path, records: Iterable[Iterable[str]]) -> List[int]:
+    """Append encoded records in one write under the file lock; return their byte offsets."""
+    lines = [encode_row(values) for values in records]
+    with portalocker.Lock(str(path), "ab", timeout=5) as f:
+        f.seek(0, os.SEEK_END)
+        offset = f.tell()
+        if offset:
+            with open(path, "rb") as r:
+                r.seek(offset - 1)
+                if r.read(1) != b"\n":
+                    offset += f.write(b"\r\n")
+        offsets = []
+        for line in lines:
+            offsets.append(offset)
+            offset += len(line)
+        f.write(b"".join(lines))
+        f.flush()
+    return offsets
+
+def append_row(path: Path, values: Iterable[str]) -> int:
+    """Append one encoded record under the file lock; return its byte offset."""
+    return append_rows(path, [values])[0]
+
+def max_int_key(keys: Iterable[str]) -> int:
+    """Largest integer among ``keys`` (non-numeric keys are ignored), or 0."""
+    best = 0
+    for k in keys:
+        try:
+            best = max(best, int(k))
+        except (TypeError, ValueError):
+            continue
+    return best
 
 def ensure_pk_and_autoincrement(path: Path, payload: Dict[str, str], pk: str = "id") -> Dict[str, str]:
     rows = read_rows(path)
@@ -38,19 +125,17 @@ def ensure_pk_and_autoincrement(path: Path, payload: Dict[str, str], pk: str = "
         header = [pk] + header
         write_rows_atomic(path, rows, header)
 
-    # If pk column exists and payload provides pk, use as-is
+    # New columns force a header change and therefore a full rewrite;
+    # otherwise the row is appended in place.
     if pk in header and payload.get(pk):
         row = {**payload}
+    else:
+        max_id = max_int_key(r.get(pk) for r in rows)
+        row = {**payload, pk: str(max_id + 1)}
+    new_columns = [k for k in row if k not in header]
+    if new_columns:
         rows.append(row)
-        with portalocker.Lock(str(path), "w", timeout=5):
-            write_rows_atomic(path, rows, header)
-        return row
-
-    # Otherwise, auto-increment pk
-    max_id = max((int(r.get(pk, 0) or 0) for r in rows if r.get(pk)), default=0)
-    new_id = str(max_id + 1)
-    row = {**payload, pk: new_id}
-    rows.append(row)
-    with portalocker.Lock(str(path), "w", timeout=5):
-        write_rows_atomic(path, rows, header)
-    return row
\ No newline at end of file
+        write_rows_atomic(path, rows, header + new_columns)
+    else:
+        append_row(path, [row.get(k, "") for k in header])
+    return row
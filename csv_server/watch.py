@@ -0,0 +1,63 @@
+# Watches resource files for changes made by other programs (e.g. ETL jobs).
+# One daemon thread per watched resource polls the file's stat every `interval`
+# seconds (stdlib only, so it works wherever the server does) and has the
+# storage catch up as soon as the file changes, instead of on the next request.
+# Appends are parsed incrementally by CSVStorage.reload; every reload is logged
+# with its kind, row count and duration, and the latest ones are kept in
+# `events`.
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 1.0
+HISTORY = 100  # reload events kept per watcher
+
+class FileWatcher:
+    """Polls one storage's file and reloads it when it changes."""
+
+    def __init__(self, name: str, storage: Any, interval: float = DEFAULT_INTERVAL):
+        self.name = name
+        self.storage = storage
+        self.interval = interval
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=HISTORY)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def poll(self) -> Optional[Dict[str, Any]]:
+        """Reload if the file changed; returns the reload event, if any."""
+        if not self.storage.stale():
+            return None
+        event = self.storage.reload()
+        if event is None:
+            return None  # a request caught up first
+        event = {"resource": self.name, "time": time.time(), **event}
+        self.events.append(event)
+        logger.info(
+            "reloaded %s: %s of %d rows in %.3fs",
+            self.name, event["kind"], event["rows"], event["seconds"],
+        )
+        return event
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                # Keep watching; the next request will report the problem.
+                logger.exception("reloading %s failed", self.name)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"watch-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
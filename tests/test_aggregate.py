@@ -0,0 +1,81 @@
+import pytest
+from csv_server.aggregate import aggregate_rows, parse_metrics
+from csv_server.exceptions import ValidationError
+from csv_server.storage.csv_store import CSVStorage
+
+ORDERS = (
+    "id,status,amount,created_at\n"
+    "1,open,10,2024-01-03\n"
+    "2,open,20.5,2024-01-02\n"
+    "3,closed,5,2024-01-05\n"
+    "4,closed,,2024-01-01\n"
+    "5,open,7,2024-01-04\n"
+)
+METRICS = "count,count:amount,sum:amount,avg:amount,min:amount,max:amount,min:created_at"
+
+def brute_force(storage, group_by="status", metrics=METRICS, filters=None):
+    return aggregate_rows(storage.iter_rows(), group_by, metrics, filters=filters, schema=storage.get_schema())
+
+def test_aggregate_groups_and_filters():
+    rows = [{"status": s, "amount": a} for s, a in [("open", "10"), ("open", "2.5"), ("closed", ""), ("closed", "4")]]
+    schema = {"status": "string", "amount": "float"}
+    result = aggregate_rows(rows, "status", "count,sum:amount,avg:amount,max:amount", schema=schema)
+    assert result == {"total": 4, "groups": [
+        {"status": "closed", "count": 2, "sum:amount": 4.0, "avg:amount": 4.0, "max:amount": 4.0},
+        {"status": "open", "count": 2, "sum:amount": 12.5, "avg:amount": 6.25, "max:amount": 10.0},
+    ]}
+    filtered = aggregate_rows(rows, None, None, filters=["amount:gt:3"], schema=schema)
+    assert filtered == {"total": 2, "groups": [{"count": 2}]}
+    with pytest.raises(ValidationError):
+        parse_metrics("median:amount")
+    with pytest.raises(ValidationError):
+        aggregate_rows(rows, "amount", "sum:status", schema=schema)
+
+@pytest.mark.parametrize("options", [{}, {"resident": True}, {"columnar": True}, {"wal": True}])
+def test_declared_aggregate_is_maintained_across_writes(tmp_path, options):
+    file = tmp_path / "orders.csv"
+    file.write_text(ORDERS)
+    storage = CSVStorage(file, aggregates=[{"group_by": "status", "metrics": METRICS}], **options)
+    schema = storage.get_schema()
+    result = storage.aggregate("status", METRICS, schema=schema)
+    assert result.pop("plan") == {"index": ["aggregate"], "candidates": 2}
+    assert result == brute_force(storage)
+
+    storage.create({"status": "open", "amount": "1", "created_at": "2023-12-31"})
+    storage.update("2", {"status": "closed"})
+    storage.update("3", {"amount": "50"})
+    storage.delete("1")  # open's max amount goes away
+    storage.bulk_create([{"status": "void", "amount": "3", "created_at": "2024-02-01"}])
+    storage.bulk_delete(["5"])
+    result = storage.aggregate("status", METRICS, schema=schema)
+    assert result.pop("plan")["index"] == ["aggregate"]
+    assert result == brute_force(storage)
+    assert {g["status"]: g["max:amount"] for g in result["groups"]} == {"closed": 50, "open": 1, "void": 3}
+
+    # Filters and undeclared groupings are computed from the rows.
+    filtered = storage.aggregate("status", "count,sum:amount", filters=["amount:gte:3"], schema=schema)
+    assert filtered.pop("plan")["index"] != ["aggregate"]
+    assert filtered == brute_force(storage, metrics="count,sum:amount", filters=["amount:gte:3"])
+    storage.close()
+
+def test_non_resident_writes_adjust_aggregates_without_a_reparse(tmp_path):
+    file = tmp_path / "orders.csv"
+    file.write_text(ORDERS)
+    storage = CSVStorage(file, aggregates=[{"group_by": "status", "metrics": "count,sum:amount"}])
+    schema = storage.get_schema()
+    storage.aggregate("status", "count,sum:amount", schema=schema)
+    for write in (lambda: storage.update("2", {"status": "closed"}),
+                  lambda: storage.delete("1"),
+                  lambda: storage.create({"status": "void", "amount": "3"})):
+        write()
+        parsed = storage.metrics.rows_parsed
+        result = storage.aggregate("status", "count,sum:amount", schema=schema)
+        assert storage.metrics.rows_parsed == parsed  # answered from the adjusted aggregate
+        assert result.pop("plan")["index"] == ["aggregate"]
+        assert result == brute_force(storage, metrics="count,sum:amount")
+
+    # A change made by another program still rebuilds them.
+    with open(file, "a") as f:
+        f.write("9,open,100,2024-03-01\n")
+    groups = storage.aggregate("status", "count,sum:amount", schema=schema)["groups"]
+    assert {g["status"]: g["sum:amount"] for g in groups}["open"] == 107
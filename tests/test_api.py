@@ -5,6 +5,7 @@ from pathlib import Path
 import shutil
 import tempfile
 import os
+import json
 
 @pytest.fixture
 def temp_data_dir():
@@ -36,6 +37,11 @@ def test_list_users(client):
     assert "items" in data
     assert data["total"] == 2
 
+def test_list_users_rejects_negative_paging(client):
+    assert client.get("/users", params={"offset": -1}).status_code == 422
+    assert client.get("/users", params={"limit": -1}).status_code == 422
+    assert client.get("/users", params={"offset": 1, "limit": 5}).json()["items"][0]["id"] == "2"
+
 def test_get_user(client):
     resp = client.get("/users/1")
     assert resp.status_code == 200
@@ -58,4 +64,117 @@ def test_delete_user(client):
     assert resp.status_code == 204
     # Confirm deletion
     resp2 = client.get("/users/2")
-    assert resp2.status_code == 404
\ No newline at end of file
+    assert resp2.status_code == 404
+
+def test_create_duplicate_id_conflicts(client):
+    resp = client.post("/users", json={"id": "1", "name": "Imposter"})
+    assert resp.status_code == 409
+
+def test_list_users_with_filter_and_sort(client):
+    resp = client.get("/users", params={"filter": "id:gte:1", "sort": "-name"})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert [u["name"] for u in data["items"]] == ["Bob", "Alice"]
+    assert data["total"] == 2
+    assert client.get("/users", params={"q": "alice"}).json()["total"] == 1
+    assert client.get("/users", params={"filter": "id:nope:1"}).status_code == 400
+
+def test_list_users_streams_ndjson_and_csv(client):
+    resp = client.get("/users", headers={"Accept": "application/x-ndjson"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = resp.text.strip().split("\n")
+    assert [json.loads(line)["name"] for line in lines] == ["Alice", "Bob"]
+
+    resp = client.get("/users", params={"format": "csv", "filter": "name:eq:Bob"})
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert resp.text.splitlines() == ["id,name,email", "2,Bob,bob@example.com"]
+    assert client.get("/users", params={"format": "xml"}).status_code == 400
+
+def test_bulk_create_update_delete(client, temp_data_dir):
+    resp = client.post("/users/_bulk", json=[
+        {"name": "Carol", "email": "carol@example.com"},
+        {"id": "1", "name": "Dup"},
+        "not an object",
+        {"name": "Dave", "email": "dave@example.com"},
+    ])
+    assert resp.status_code == 200
+    summary = resp.json()
+    assert [item["status"] for item in summary["items"]] == [201, 409, 422, 201]
+    assert [summary["items"][i]["id"] for i in (0, 3)] == ["3", "4"]
+    assert summary["failed"] == 2
+
+    csv_body = 'name,email\nEve,"eve@example.com"\n"Frank\nJr",frank@example.com\n'
+    resp = client.post("/users/_bulk", content=csv_body, headers={"content-type": "text/csv"})
+    assert resp.json()["succeeded"] == 2
+    assert client.get("/users/6").json()["name"] == "Frank\nJr"
+
+    ndjson_body = '{"id": "3", "name": "Carol B"}\n{"id": "99", "name": "Ghost"}\n{"name": "No id"}\n'
+    resp = client.patch("/users/_bulk", content=ndjson_body, headers={"content-type": "application/x-ndjson"})
+    assert [item["status"] for item in resp.json()["items"]] == [200, 404, 422]
+    assert client.get("/users/3").json()["name"] == "Carol B"
+
+    resp = client.request("DELETE", "/users/_bulk", json=["2", {"id": "4"}, "42"])
+    assert [item["status"] for item in resp.json()["items"]] == [204, 204, 404]
+    assert client.get("/users").json()["total"] == 4
+
+    resp = client.post("/users/_bulk", content="{not json", headers={"content-type": "application/json"})
+    assert resp.status_code == 400
+
+def test_conditional_requests_and_response_cache(client):
+    first = client.get("/users", params={"sort": "-name", "limit": 1})
+    tag = first.headers["etag"]
+    assert first.headers["last-modified"]
+    cache = client.app.state.response_cache
+    again = client.get("/users", params={"limit": 1, "sort": "-name"})
+    assert again.json() == first.json() and cache.hits == 1
+    assert again.headers["x-query-plan"] == first.headers["x-query-plan"]
+    assert client.get("/users", params={"sort": "-name", "limit": 1}, headers={"If-None-Match": tag}).status_code == 304
+
+    item = client.get("/users/1")
+    assert client.get("/users/1", headers={"If-None-Match": item.headers["etag"]}).status_code == 304
+    schema = client.get("/users/schema")
+    assert client.get("/users/schema", headers={"If-None-Match": schema.headers["etag"]}).status_code == 304
+
+    client.put("/users/1", json={"name": "Zed"})
+    stale = client.get("/users", params={"sort": "-name", "limit": 1}, headers={"If-None-Match": tag})
+    assert stale.status_code == 200
+    assert stale.json()["items"][0]["name"] == "Zed"
+    assert client.get("/users/1", headers={"If-None-Match": item.headers["etag"]}).json()["name"] == "Zed"
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_fast_json_stitches_pages_from_row_fragments(temp_data_dir, monkeypatch, use_orjson):
+    import csv_server.encoding as encoding
+    if not use_orjson:
+        monkeypatch.setattr(encoding, "orjson", None)
+    app = create_app(temp_data_dir, readonly=False, config={"fast_json": True, "resources": {"users": {"file": "users.csv"}}})
+    fast = TestClient(app)
+    assert fast.post("/users", json={"name": "Zoë"}).json()["name"] == "Zoë"
+    full = fast.get("/users").json()
+    assert [r["name"] for r in full["items"]] == ["Alice", "Bob", "Zoë"] and full["total"] == 3
+    assert fast.get("/users", params={"sort": "-name"}).json()["items"] == full["items"][::-1]
+    assert fast.get("/users/3").json() == full["items"][2]
+    handlers = next(r.endpoint.__self__ for r in app.routes if getattr(r, "path", None) == "/users/{item_id}")
+    assert handlers.fragments.hits == 4  # the sorted page and the item reused encoded rows
+
+def test_aggregate_endpoint(temp_data_dir):
+    with open(temp_data_dir / "orders.csv", "w") as f:
+        f.write("id,status,amount\n1,open,10\n2,open,5\n3,closed,2\n")
+    app = create_app(temp_data_dir, readonly=False, config={"resources": {
+        "orders": {"file": "orders.csv", "aggregates": [{"group_by": "status", "metrics": ["count", "sum:amount"]}]},
+    }})
+    client = TestClient(app)
+    resp = client.get("/orders/_aggregate", params={"group_by": "status", "metrics": "count,sum:amount"})
+    assert resp.status_code == 200
+    assert resp.headers["X-Query-Plan"] == "index=aggregate; candidates=2"
+    assert resp.json() == {"total": 3, "groups": [
+        {"status": "closed", "count": 1, "sum:amount": 2},
+        {"status": "open", "count": 2, "sum:amount": 15},
+    ]}
+    assert client.get("/orders/_aggregate", headers={"If-None-Match": resp.headers["ETag"]},
+                      params={"group_by": "status", "metrics": "count,sum:amount"}).status_code == 304
+
+    client.post("/orders", json={"status": "closed", "amount": "4"})
+    resp = client.get("/orders/_aggregate", params={"group_by": "status", "metrics": "sum:amount", "filter": "amount:lt:5"})
+    assert resp.json() == {"total": 2, "groups": [{"status": "closed", "sum:amount": 6}]}
+    assert client.get("/orders/_aggregate", params={"metrics": "sum:status"}).status_code == 400
@@ -0,0 +1,41 @@
+import json
+import pytest
+from click.testing import CliRunner
+from csv_server import bench
+from csv_server.cli import main
+
+def test_parse_size_and_percentiles():
+    assert [bench.parse_size(s) for s in ["10k", "1M", "2500", "1.5k"]] == [10_000, 1_000_000, 2500, 1500]
+    with pytest.raises(ValueError):
+        bench.parse_size("lots")
+    latencies = [i / 1000 for i in range(1, 101)]
+    assert bench.summarize(latencies, 2.0) == {
+        "requests": 100, "rps": 50.0, "p50_ms": 50.0, "p95_ms": 95.0, "p99_ms": 99.0,
+    }
+
+def test_bench_cli_runs_every_operation_and_compares(tmp_path):
+    runner = CliRunner()
+    results = tmp_path / "results.json"
+    args = ["bench", "-n", "50", "-r", "3", "--data-dir", str(tmp_path / "data"), "-o", str(results)]
+    outcome = runner.invoke(main, args)
+    assert outcome.exit_code == 0, outcome.output
+    # Runs write to a copy, so every run starts from freshly generated data.
+    fresh = bench.generate(tmp_path / "fresh", 50)
+    for name in ("users.csv", "orders.csv"):
+        assert (tmp_path / "data" / "50" / name).read_bytes() == (fresh / name).read_bytes()
+    report = json.loads(results.read_text())
+    assert report["mode"] == "in-process"
+    assert list(report["results"]["50"]) == list(bench.OPERATIONS)
+    assert all(stats["requests"] == 3 for stats in report["results"]["50"].values())
+    assert (tmp_path / "data" / "50" / "orders.csv").read_text().count("\n") == 51
+
+    faster = json.loads(results.read_text())
+    faster["results"]["50"]["get"]["rps"] *= 10
+    assert bench.compare(report, faster, threshold=0.5) == [
+        f"50 rows get: {report['results']['50']['get']['rps']} req/s vs {faster['results']['50']['get']['rps']} baseline",
+    ]
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(faster))
+    outcome = runner.invoke(main, args[:-2] + ["--operation", "get", "--baseline", str(baseline), "--threshold", "0.5"])
+    assert outcome.exit_code == 1
+    assert "REGRESSION 50 rows get" in outcome.output
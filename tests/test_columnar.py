@@ -0,0 +1,61 @@
+from csv_server.storage.columnar import ColumnarTable, NumericColumn, StringColumn
+from csv_server.storage.csv_store import CSVStorage
+
+SCHEMA = {"id": "integer", "price": "float", "status": "string"}
+
+def make_rows():
+    return [
+        {"id": "1", "price": "9.5", "status": "open"},
+        {"id": "2", "price": "250.00", "status": "closed"},
+        {"id": "007", "price": "", "status": "open"},
+        {"id": "4", "price": "3.25", "status": ""},
+    ] + [{"id": str(i), "price": "1.5", "status": "open"} for i in range(10, 38)]
+
+def test_columnar_table_round_trips_text_exactly():
+    table = ColumnarTable(["id", "price", "status"], SCHEMA, make_rows())
+    assert isinstance(table.columns["id"], NumericColumn)
+    assert isinstance(table.columns["status"], StringColumn)
+    assert list(table) == make_rows()
+    assert table[1:3] == make_rows()[1:3]
+    assert table[3] == make_rows()[3]
+
+    table[0] = {"id": "1", "price": "1e3", "status": "closed"}
+    table.append({"id": "5", "price": "2.0", "status": "open"})
+    assert table[0] == {"id": "1", "price": "1e3", "status": "closed"}
+    assert table[-1]["price"] == "2.0"
+    assert len(table) == 33
+
+def test_columnar_select_matches_row_predicates():
+    table = ColumnarTable(["id", "price", "status"], SCHEMA, make_rows())
+    assert table.select([("price", "gt", "5")], SCHEMA) == [0, 1]
+    assert table.select([("id", "lt", "8")], SCHEMA) == [0, 1, 2, 3]
+    assert table.select([("price", "ne", "9.5")], SCHEMA) == list(range(1, 32))
+    assert table.select([("status", "eq", "open"), ("id", "in", "1,4")], SCHEMA) == [0]
+    assert table.select([("status", "contains", "o")], SCHEMA) is None
+    # A column queried as text isn't answered by its numeric array.
+    assert table.select([("id", "eq", "007")], {}) is None
+
+def test_columnar_storage_queries_and_writes(tmp_path):
+    file = tmp_path / "orders.csv"
+    lines = ["id,amount,status"] + [f"{i},{i * 1.5},{'open' if i % 3 else 'closed'}" for i in range(1, 301)]
+    file.write_text("\n".join(lines) + "\n")
+    columnar = CSVStorage(file, columnar=True)
+    rows = CSVStorage(file, resident=True)
+    schema = columnar.get_schema()
+
+    for filters in (["amount:gte:300"], ["status:eq:closed", "id:lt:50"]):
+        result = columnar.query(filters=filters, limit=500, schema=schema)
+        assert "columnar" in result["plan"]["index"]
+        assert result["items"] == rows.query(filters=filters, limit=500, schema=schema)["items"]
+    sorted_page = columnar.query(sort="-status", limit=20, offset=90, schema=schema)
+    assert sorted_page["plan"]["index"] == ["columnar"]
+    assert sorted_page["items"] == rows.query(sort="-status", limit=20, offset=90, schema=schema)["items"]
+
+    columnar.create({"amount": "1.0", "status": "open"})
+    columnar.update("2", {"status": "closed"})
+    columnar.delete("3")
+    assert columnar.get("301")["amount"] == "1.0"
+    assert columnar.get("2")["status"] == "closed"
+    assert columnar.get("3") is None
+    assert columnar.cache_info()["misses"] == 1
+    assert columnar._rows.nbytes() < file.stat().st_size * 2
@@ -0,0 +1,265 @@
+import os
+from pathlib import Path
+import pytest
+from csv_server.storage.csv_store import CSVStorage
+from csv_server.exceptions import DuplicateKeyError
+from csv_server.storage.mmap_reader import LazyRow
+
+def write_users(path: Path):
+    with open(path, "w") as f:
+        f.write("id,name,email\n1,Alice,alice@example.com\n2,Bob,bob@example.com\n")
+
+def test_resident_cache_hits_until_file_changes(tmp_path):
+    file = tmp_path / "users.csv"
+    write_users(file)
+    storage = CSVStorage(file, resident=True)
+    assert storage.get("1")["name"] == "Alice"
+    assert storage.get("2")["name"] == "Bob"
+    assert storage.cache_info()["misses"] == 1
+    assert storage.cache_info()["hits"] == 1
+
+    with open(file, "a") as f:
+        f.write("3,Charlie,charlie@example.com\n")
+    assert storage.get("3")["name"] == "Charlie"
+    assert storage.cache_info()["misses"] == 1  # only the appended tail was parsed
+    assert storage.cache_info()["reloads"]["append"] == 1
+
+    write_users(file)  # rewritten: full reparse
+    assert storage.get("3") is None
+    assert storage.cache_info()["misses"] == 2
+
+def test_resident_cache_survives_own_writes(tmp_path):
+    file = tmp_path / "users.csv"
+    write_users(file)
+    storage = CSVStorage(file, resident=True)
+    storage.update("1", {"name": "Alice Updated"})
+    assert storage.get("1")["name"] == "Alice Updated"
+    storage.delete("2")
+    assert storage.get("2") is None
+    assert storage.cache_info()["misses"] == 1
+
+def test_non_resident_keeps_index_but_not_rows(tmp_path):
+    file = tmp_path / "users.csv"
+    write_users(file)
+    storage = CSVStorage(file)
+    assert storage.get("2")["email"] == "bob@example.com"
+    assert storage.get("1")["name"] == "Alice"
+    info = storage.cache_info()
+    assert info["rows"] is None
+    assert info["indexed_keys"] == 2
+    assert (info["hits"], info["misses"]) == (1, 1)
+
+def test_pk_index_follows_quoted_multiline_rows(tmp_path):
+    file = tmp_path / "notes.csv"
+    with open(file, "w", newline="") as f:
+        f.write('id,body\r\n1,"line one\nline two"\r\n2,"say ""hi"""\r\n')
+    storage = CSVStorage(file)
+    assert storage.get("1")["body"] == "line one\nline two"
+    assert storage.get("2")["body"] == 'say "hi"'
+
+def test_pk_index_kept_in_sync_by_writes(tmp_path):
+    file = tmp_path / "users.csv"
+    write_users(file)
+    storage = CSVStorage(file)
+    storage.update("2", {"name": "Robert", "age": "40"})
+    assert storage.get("2") == {"id": "2", "name": "Robert", "email": "bob@example.com", "age": "40"}
+    storage.delete("1")
+    assert storage.get("1") is None
+    assert storage.get("2")["name"] == "Robert"
+
+def test_duplicate_keys_detected(tmp_path):
+    file = tmp_path / "users.csv"
+    with open(file, "w") as f:
+        f.write("id,name\n1,Alice\n1,Alicia\n2,Bob\n")
+    storage = CSVStorage(file)
+    assert storage.get("1")["name"] == "Alice"
+    assert storage.duplicate_keys == {"1"}
+    with pytest.raises(DuplicateKeyError):
+        storage.create({"id": "2", "name": "Bobby"})
+
+def test_create_appends_without_rewriting(tmp_path):
+    file = tmp_path / "users.csv"
+    write_users(file)
+    inode = os.stat(file).st_ino
+    storage = CSVStorage(file, resident=True)
+    assert storage.create({"name": "Charlie"})["id"] == "3"
+    assert storage.create({"id": "10", "name": "Dana"})["id"] == "10"
+    assert storage.create({"name": "Eve"})["id"] == "11"
+    assert os.stat(file).st_ino == inode
+    assert storage.cache_info()["misses"] == 1
+    assert CSVStorage(file).get("11")["name"] == "Eve"
+
+def test_create_with_new_column_rewrites_header(tmp_path):
+    file = tmp_path / "users.csv"
+    write_users(file)
+    storage = CSVStorage(file)
+    storage.create({"name": "Charlie", "age": "30"})
+    with open(file) as f:
+        assert f.readline().strip() == "id,name,email,age"
+    assert storage.get("3")["age"] == "30"
+    assert storage.get("1")["age"] == ""
+
+def test_paging_seeks_with_sparse_offsets(tmp_path):
+    file = tmp_path / "big.csv"
+    with open(file, "w") as f:
+        f.write("id,name\n")
+        for i in range(1, 101):
+            f.write(f"{i},user{i}\n")
+    storage = CSVStorage(file, offset_stride=8)
+    assert storage.count() == 100
+    assert [r["id"] for r in storage.list(limit=3, offset=42)] == ["43", "44", "45"]
+    assert storage.list(limit=5, offset=98) == [{"id": "99", "name": "user99"}, {"id": "100", "name": "user100"}]
+    assert storage.list(limit=5, offset=100) == []
+    assert storage.get("77")["name"] == "user77"
+
+    storage.create({"name": "appended"})
+    assert storage.count() == 101
+    assert storage.list(limit=1, offset=100)[0]["name"] == "appended"
+
+    # External rewrite: the index must be rebuilt rather than reused
+    with open(file, "w") as f:
+        f.write("id,name\n")
+        for i in range(1, 21):
+            f.write(f"{i},renamed{i}\n")
+    assert storage.count() == 20
+    assert storage.list(limit=2, offset=17)[1]["name"] == "renamed19"
+
+def test_mmap_reads_decode_lazily(tmp_path):
+    file = tmp_path / "notes.csv"
+    with open(file, "w", newline="") as f:
+        f.write('id,body\r\n')
+        for i in range(1, 31):
+            f.write(f'{i},"note {i}\nsecond ""line"""\r\n')
+            if i == 15:
+                f.write("\r\n")  # stray blank line
+    storage = CSVStorage(file, use_mmap=True, offset_stride=4, indexes=["id"])
+    page = storage.list(limit=2, offset=0)
+    assert isinstance(page[0], LazyRow) and page[0]._row is None
+    row = storage.get("17")
+    assert row["body"] == 'note 17\nsecond "line"'
+    assert [r["id"] for r in storage.list(limit=3, offset=14)] == ["15", "16", "17"]
+    assert [r["id"] for r in storage.query(filters=["id:in:3,22,29"])["items"]] == ["3", "22", "29"]
+    assert len(list(storage.iter_rows())) == 30
+    storage.create({"body": "tail"})
+    assert storage.get("31") == {"id": "31", "body": "tail"}
+
+def test_mmap_remaps_same_size_rewrite(tmp_path):
+    file = tmp_path / "users.csv"
+    with open(file, "w", newline="") as f:
+        f.write("id,name\r\n1,aaa\r\n2,bbb\r\n")
+    storage = CSVStorage(file, use_mmap=True)
+    assert storage.get("1")["name"] == "aaa"
+    size = file.stat().st_size
+    storage.update("1", {"name": "zzz"})
+    assert file.stat().st_size == size  # same length, new inode
+    assert storage.get("1")["name"] == "zzz"
+    assert [row["name"] for row in storage.list()] == ["zzz", "bbb"]
+
+@pytest.mark.parametrize("options", [{}, {"resident": True}, {"columnar": True}])
+def test_create_with_new_column_keeps_rows_in_header_order(tmp_path, options):
+    file = tmp_path / "users.csv"
+    file.write_text("id,name\n1,a\n2,b\n")
+    storage = CSVStorage(file, **options)
+    created = storage.create({"name": "c", "age": "3"})
+    assert list(created) == ["id", "name", "age"]
+    assert storage.get("1") == {"id": "1", "name": "a", "age": ""}
+    assert list(storage.get("3").items()) == [("id", "3"), ("name", "c"), ("age", "3")]
+
+@pytest.mark.parametrize("options", [{"resident": True}, {"columnar": True}])
+def test_bulk_update_with_new_column_fills_other_rows(tmp_path, options):
+    file = tmp_path / "users.csv"
+    file.write_text("id,name\n1,a\n2,b\n3,c\n")
+    storage = CSVStorage(file, **options)
+    results = storage.bulk_update([("1", {"team": "red"}), ("9", {"team": "x"}), ("3", {"name": "C"})])
+    assert results[0] == {"id": "1", "name": "a", "team": "red"}
+    assert isinstance(results[1], KeyError)
+    assert storage.get("2") == {"id": "2", "name": "b", "team": ""}
+    assert storage.list() == [
+        {"id": "1", "name": "a", "team": "red"},
+        {"id": "2", "name": "b", "team": ""},
+        {"id": "3", "name": "C", "team": ""},
+    ]
+
+def test_bulk_writes_persist_once(tmp_path, monkeypatch):
+    import csv_server.storage.csv_store as csv_store
+    file = tmp_path / "users.csv"
+    write_users(file)
+    storage = CSVStorage(file)
+    calls = []
+    for name in ("write_rows_atomic", "append_rows"):
+        original = getattr(csv_store, name)
+        monkeypatch.setattr(csv_store, name, lambda *a, _f=original, _n=name: calls.append(_n) or _f(*a))
+
+    results = storage.bulk_create([{"name": f"User {i}"} for i in range(100)] + [{"id": "1"}])
+    assert isinstance(results[-1], DuplicateKeyError)
+    assert results[99]["id"] == "102"
+    assert storage.bulk_update([(str(i), {"team": "blue"}) for i in range(1, 50)])[0]["team"] == "blue"
+    assert sum(r is True for r in storage.bulk_delete([str(i) for i in range(1, 30)])) == 29
+    assert calls == ["append_rows", "write_rows_atomic", "write_rows_atomic"]
+    assert storage.count() == 73
+    assert storage.get("50")["team"] == ""
+
+def test_process_lock_shares_version_between_workers(tmp_path):
+    file = tmp_path / "users.csv"
+    write_users(file)
+    first = CSVStorage(file, process_lock=True, wal=True, checkpoint_interval=60)
+    second = CSVStorage(file, process_lock=True, wal=True, checkpoint_interval=60)
+    assert second.count() == 2
+    # The change only lives in first's WAL; second must still notice it.
+    first.create({"name": "Carol"})
+    assert first.cache_info()["version"] == 1
+    assert second.count() == 3
+    second.checkpoint()  # folds first's log into the CSV
+    assert "Carol" in file.read_text()
+    first.close()
+    second.close()
+    third = CSVStorage(file, process_lock=True)
+    assert third.count() == 3
+    assert third.cache_info()["version"] >= 1  # persisted in users.csv.lock
+    third.close()
+
+def test_read_catches_up_with_a_worker_writing_after_refresh(tmp_path, monkeypatch):
+    file = tmp_path / "users.csv"
+    file.write_text("id,name\n" + "".join(f"{i},n{i}\n" for i in range(1, 11)))
+    first = CSVStorage(file, process_lock=True, offset_stride=1)
+    second = CSVStorage(file, process_lock=True, offset_stride=1)
+    assert first.count() == 10
+    refresh = first._refresh
+    pending = [lambda: second.delete("1")]
+
+    def refresh_then_other_worker_writes():
+        refresh()
+        while pending:
+            pending.pop()()  # lands between the refresh and the shared lock
+
+    monkeypatch.setattr(first, "_refresh", refresh_then_other_worker_writes)
+    assert first.list(limit=2, offset=5) == [{"id": "7", "name": "n7"}, {"id": "8", "name": "n8"}]
+    pending.append(lambda: second.update("9", {"name": "nine"}))
+    assert first.get("9") == {"id": "9", "name": "nine"}
+    first.close()
+    second.close()
+
+def test_unfiltered_sort_pages_reuse_one_permutation(tmp_path, monkeypatch):
+    import csv_server.storage.csv_store as csv_store
+    file = tmp_path / "events.csv"
+    with open(file, "w") as f:
+        f.write("id,score\n")
+        for i in range(1, 41):
+            f.write(f"{i},{(i * 7) % 40}\n")
+    storage = CSVStorage(file)
+    schema = storage.get_schema()
+    calls = []
+    original = csv_store.sort_positions
+    monkeypatch.setattr(csv_store, "sort_positions", lambda *a: calls.append(1) or original(*a))
+    pages = [storage.query(sort="-score", limit=10, offset=o, schema=schema)["items"] for o in range(0, 40, 10)]
+    assert [int(r["score"]) for page in pages for r in page] == list(range(39, -1, -1))
+    assert len(calls) == 1
+    storage.create({"score": "100"})
+    assert storage.query(sort="-score", limit=1, schema=schema)["items"][0]["score"] == "100"
+    assert len(calls) == 2
+
+@pytest.mark.parametrize("options", [{}, {"resident": True}])
+def test_list_clamps_negative_offset(tmp_path, options):
+    file = tmp_path / "users.csv"
+    file.write_text("id,name\n1,Alice\n2,Bob\n")
+    assert [r["id"] for r in CSVStorage(file, **options).list(limit=5, offset=-1)] == ["1", "2"]
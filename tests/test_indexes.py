@@ -0,0 +1,70 @@
+from csv_server.storage.csv_store import CSVStorage
+from csv_server.storage.indexes import ColumnIndex
+
+def write_orders(path):
+    with open(path, "w") as f:
+        f.write("id,user_id,status,total\n")
+        for i in range(1, 41):
+            f.write(f"{i},{i % 4},{'open' if i % 3 else 'closed'},{i * 10}\n")
+
+SCHEMA = {"id": "integer", "user_id": "integer", "status": "string", "total": "integer"}
+
+def test_column_index_lookups():
+    index = ColumnIndex("total", "integer")
+    index.build(["30", "", "5", "100", "5"])
+    assert sorted(index.lookup("eq", "5")) == [2, 4]
+    assert index.lookup("gt", "5") == [0, 3]
+    assert index.lookup("lte", "30") == [2, 4, 0]
+    assert index.lookup("isnull", "true") == [1]
+    assert index.lookup("contains", "5") is None
+    assert list(index.ordered(descending=True)) == [3, 0, 2, 4]
+
+def test_query_uses_indexes_and_matches_scan(tmp_path):
+    file = tmp_path / "orders.csv"
+    write_orders(file)
+    indexed = CSVStorage(file, indexes=["user_id", "total"], offset_stride=4)
+    plain = CSVStorage(file)
+    filters = ["user_id:eq:2", "total:gte:100"]
+    result = indexed.query(filters=filters, schema=SCHEMA)
+    assert result.pop("plan") == {"index": ["user_id", "total"], "candidates": 8}
+    expected = plain.query(filters=filters, schema=SCHEMA)
+    expected.pop("plan")
+    assert result == expected
+    assert indexed.cache_info()["index_hits"] == 1
+
+    result = indexed.query(filters=["status:eq:open"], schema=SCHEMA)
+    assert result["plan"] == {"index": None}
+    assert indexed.cache_info()["index_misses"] == 1
+
+def test_indexes_follow_writes(tmp_path):
+    file = tmp_path / "orders.csv"
+    write_orders(file)
+    storage = CSVStorage(file, resident=True, indexes=["status"])
+    storage.create({"user_id": "9", "status": "refunded", "total": "1"})
+    storage.update("3", {"status": "refunded"})
+    result = storage.query(filters=["status:eq:refunded"], schema=SCHEMA)
+    assert [r["id"] for r in result["items"]] == ["3", "41"]
+    storage.delete("3")
+    result = storage.query(filters=["status:eq:refunded"], schema=SCHEMA)
+    assert [r["id"] for r in result["items"]] == ["41"]
+    page = storage.query(sort="-status", limit=2)
+    assert [r["status"] for r in page["items"]] == ["refunded", "open"]
+
+def test_search_index_narrows_q_and_tracks_writes(tmp_path):
+    file = tmp_path / "users.csv"
+    with open(file, "w") as f:
+        f.write("id,name,city\n1,Alice Martin,Paris\n2,Bob Stone,Berlin\n3,Martina Roe,Lyon\n")
+    storage = CSVStorage(file, search_index=True)
+    result = storage.query(q="MARTIN")
+    assert [r["id"] for r in result["items"]] == ["1", "3"]
+    assert result["plan"] == {"index": ["q"], "candidates": 2}
+
+    result = storage.query(q="martin lyon")
+    assert [r["id"] for r in result["items"]] == ["3"]
+
+    storage.create({"name": "Ada Martinez", "city": "Rome"})
+    storage.update("1", {"name": "Alice Smith"})
+    assert [r["id"] for r in storage.query(q="martin")["items"]] == ["3", "4"]
+    assert storage.query(q="zzz")["items"] == []
+    # Terms shorter than a trigram fall back to scanning
+    assert storage.query(q="ro")["plan"] == {"index": None}
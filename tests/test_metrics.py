@@ -0,0 +1,60 @@
+import json
+import logging
+from fastapi.testclient import TestClient
+from csv_server.app import create_app
+from csv_server.logs import JSONFormatter
+
+def make_client(tmp_path, **config):
+    (tmp_path / "users.csv").write_text("id,name,age\n1,Alice,30\n2,Bob,25\n3,Carol,41\n")
+    app = create_app(tmp_path, readonly=False, config={
+        "resources": {"users": {"file": "users.csv"}}, **config,
+    })
+    return TestClient(app)
+
+def test_metrics_endpoint_reports_routes_storage_and_caches(tmp_path):
+    client = make_client(tmp_path)
+    client.get("/users")
+    client.get("/users")  # served from the response cache
+    client.get("/users/2")
+    client.put("/users/1", json={"name": "Ann"})
+
+    resp = client.get("/_metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = resp.text.splitlines()
+    assert "# TYPE csv_server_request_duration_seconds histogram" in lines
+    assert 'csv_server_request_duration_seconds_count{method="GET",route="/users",status="200"} 2' in lines
+    assert 'csv_server_request_duration_seconds_count{method="GET",route="/users/{item_id}",status="200"} 1' in lines
+    # Non-resident: scan, page, row, and the scan before the rewrite.
+    assert 'csv_server_rows_parsed_total{resource="users"} 10' in lines
+    assert 'csv_server_rows_written_total{resource="users"} 3' in lines
+    assert 'csv_server_file_rewrites_total{resource="users"} 1' in lines
+    assert any(line.startswith('csv_server_lock_wait_seconds_count{resource="users",mode="read"}') for line in lines)
+    assert 'csv_server_cache_hit_ratio{cache="response"} 0.333333' in lines
+    assert "csv_server_response_cache_entries 2" in lines  # /users and /users/2
+    assert any(line.startswith("csv_server_response_cache_bytes ") for line in lines)
+    assert "/_metrics" not in client.get("/openapi.json").text
+
+def test_profile_header_breaks_down_stages(tmp_path):
+    client = make_client(tmp_path)
+    resp = client.get("/users", params={"sort": "-age", "filter": "age:gt:20", "_profile": "1"})
+    assert [item["name"] for item in resp.json()["items"]] == ["Carol", "Alice", "Bob"]
+    stages = [part.split(";")[0] for part in resp.headers["server-timing"].split(", ")]
+    assert stages == ["parse", "filter", "sort", "serialize", "total"]
+    # Profiled requests skip the response cache, unprofiled ones carry no header.
+    assert "parse" not in client.get("/users", params={"sort": "-age", "_profile": "1"}).headers["server-timing"]
+    assert "server-timing" not in client.get("/users").headers
+
+def test_metrics_can_be_disabled_and_logs_are_structured(tmp_path):
+    client = make_client(tmp_path, metrics=False, log_level="warning", log_format="json")
+    assert client.get("/_metrics").status_code == 404
+    assert logging.getLogger("csv_server").level == logging.WARNING
+    record = logging.makeLogRecord({
+        "name": "csv_server.app", "levelname": "DEBUG", "msg": "creating row in %s", "args": ("users",),
+        "resource": "users", "fields": ["name"],
+    })
+    entry = json.loads(JSONFormatter().format(record))
+    assert {k: entry[k] for k in ("level", "logger", "message", "resource", "fields")} == {
+        "level": "DEBUG", "logger": "csv_server.app", "message": "creating row in users",
+        "resource": "users", "fields": ["name"],
+    }
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+from csv_server.offload import StorageExecutor
+from csv_server.storage.locks import ReadWriteLock
+
+def test_executor_keeps_loop_free_and_honours_limits():
+    executor = StorageExecutor(max_workers=4)
+    executor.limit("big", 1)
+    running = {"big": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def slow():
+        with lock:
+            running["big"] += 1
+            running["peak"] = max(running["peak"], running["big"])
+        time.sleep(0.05)
+        with lock:
+            running["big"] -= 1
+
+    async def main():
+        start = time.perf_counter()
+        big = asyncio.gather(*(executor.run("big", slow) for _ in range(3)))
+        small = await executor.run("small", lambda: time.perf_counter() - start)
+        await big
+        return small
+
+    small_latency = asyncio.run(main())
+    executor.shutdown()
+    assert running["peak"] == 1
+    assert small_latency < 0.05
+
+def test_read_write_lock_is_shared_for_readers_and_exclusive_for_writers():
+    rw = ReadWriteLock()
+    events = []
+
+    def write():
+        with rw.write():
+            events.append("w")
+
+    with rw.read():
+        with rw.read():  # re-entrant
+            writer = threading.Thread(target=write)
+            writer.start()
+            time.sleep(0.02)
+            assert events == []
+    writer.join(1)
+    assert events == ["w"]
+
+def test_iterate_pulls_items_on_the_pool_within_the_limit():
+    executor = StorageExecutor(max_workers=4)
+    executor.limit("big", 1)
+    threads, running, peak, closed = set(), [0], [0], []
+
+    def rows(n):
+        try:
+            for i in range(n):
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+                threads.add(threading.current_thread().name)
+                time.sleep(0.005)
+                running[0] -= 1
+                yield i
+        finally:
+            closed.append(n)
+
+    async def consume(n, stop=None):
+        items = []
+        stream = executor.iterate("big", rows(n))
+        async for item in stream:
+            items.append(item)
+            if item == stop:
+                break
+        await stream.aclose()
+        return items
+
+    async def main():
+        return await asyncio.gather(consume(5), consume(6), consume(10, stop=2))
+
+    assert asyncio.run(main()) == [list(range(5)), list(range(6)), [0, 1, 2]]
+    executor.shutdown()
+    assert peak[0] == 1  # the streams shared the resource's single slot
+    assert all(name.startswith("csv-storage") for name in threads)
+    assert sorted(closed) == [5, 6, 10]  # including the one cut short
@@ -0,0 +1,51 @@
+import pytest
+from csv_server.exceptions import ValidationError
+from csv_server.query import query_engine, run_query, filter_rows, parse_sort, sort_rows, sort_positions
+
+ROWS = [
+    {"id": "1", "name": "Alice", "age": "30", "city": "Paris"},
+    {"id": "2", "name": "Bob", "age": "9", "city": ""},
+    {"id": "10", "name": "Carol", "age": "41", "city": "Berlin"},
+]
+SCHEMA = {"id": "integer", "name": "string", "age": "integer", "city": "string"}
+
+def names(result):
+    return [r["name"] for r in result["items"]]
+
+def test_numeric_filters_use_schema_types():
+    assert names(run_query(ROWS, filters=["age:gt:10"], schema=SCHEMA)) == ["Alice", "Carol"]
+    assert names(run_query(ROWS, filters=["age:lte:9"], schema=SCHEMA)) == ["Bob"]
+    assert names(run_query(ROWS, filters=["id:in:1,10"], schema=SCHEMA)) == ["Alice", "Carol"]
+
+def test_string_operators_and_isnull():
+    assert names(run_query(ROWS, filters=["name:startswith:C"])) == ["Carol"]
+    assert names(run_query(ROWS, filters=["city:contains:er"])) == ["Carol"]
+    assert names(run_query(ROWS, filters=["city:isnull"])) == ["Bob"]
+    assert names(run_query(ROWS, filters=["city:isnull:false", "name:ne:Alice"])) == ["Carol"]
+
+def test_search_sort_and_pagination():
+    result = run_query(ROWS, q="O", sort="-name", limit=1, offset=1)
+    assert result == {"items": [ROWS[1]], "total": 2}
+    assert parse_sort("city,-age") == [("city", False), ("age", True)]
+    assert parse_sort("name:desc") == [("name", True)]
+
+def test_sorts_are_typed_and_top_k_matches_full_sort():
+    assert names(run_query(ROWS, sort="id", schema=SCHEMA)) == ["Alice", "Bob", "Carol"]
+    assert names(run_query(ROWS, sort="id")) == ["Alice", "Carol", "Bob"]  # text order without a schema
+    rows = [{"n": str(i % 7), "s": str(i % 3), "i": str(i)} for i in range(100)] + [{"n": "", "s": "x", "i": "x"}]
+    for sort in (parse_sort("-n"), parse_sort("n,-s"), parse_sort("-s,-n")):
+        full = sort_rows(rows, sort, {"n": "integer"})
+        assert sort_rows(rows, sort, {"n": "integer"}, limit=15) == full[:15]
+        assert [rows[p] for p in sort_positions(rows, sort, {"n": "integer"})] == full
+    assert sort_rows(rows, parse_sort("n"), {"n": "integer"})[0]["i"] == "x"  # empty first
+
+def test_query_engine_accepts_parse_qs_params():
+    result = query_engine(ROWS, {"filter": ["age:gte:30"], "sort": ["name"], "order": ["desc"]}, SCHEMA)
+    assert names(result) == ["Carol", "Alice"]
+    assert result["total"] == 2
+
+def test_invalid_filters_raise():
+    with pytest.raises(ValidationError):
+        filter_rows(ROWS, ["age:between:1"])
+    with pytest.raises(ValidationError):
+        run_query(ROWS, filters=["age:gt:old"], schema=SCHEMA)
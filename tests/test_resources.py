@@ -0,0 +1,88 @@
+import time
+from fastapi.testclient import TestClient
+from csv_server import resources
+from csv_server.app import create_app
+from csv_server.resources import ResourceRegistry
+
+def make_app(tmp_path, **config):
+    (tmp_path / "users.csv").write_text("id,name\n1,Alice\n2,Bob\n")
+    return create_app(tmp_path, readonly=False, config={"resources": {}, "lazy_resources": True, **config})
+
+def test_lazy_routes_open_resources_on_first_use(tmp_path):
+    app = make_app(tmp_path, resources={"people": {"file": "users.csv", "readonly": True}})
+    with TestClient(app) as client:
+        assert app.state.storages == {}  # nothing is opened at startup
+        assert client.get("/users/2").json() == {"id": "2", "name": "Bob"}
+        assert set(app.state.storages) == {"users"}
+        assert client.post("/users", json={"name": "Carol"}).status_code == 201
+        assert client.get("/users/schema").json()["schema"]["name"] == "string"
+        assert client.get("/people?limit=1").json()["items"] == [{"id": "1", "name": "Alice"}]
+        assert client.post("/people", json={"name": "Dan"}).status_code == 405
+        assert client.get("/orders").status_code == 404
+        assert client.get("/..%2Fusers").status_code == 404
+
+        # Dropped in after startup: served without a restart.
+        (tmp_path / "orders.csv").write_text("id,status\n1,open\n")
+        assert client.get("/orders").json()["total"] == 1
+        paths = {route.path for route in app.routes}
+        assert "/orders" not in paths and "/{resource}" in paths
+
+def test_lazy_resource_in_a_subdirectory(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "users.csv").write_text("id,name\n1,Alice\n2,Bob\n")
+    (tmp_path / "users.csv").write_text("id,name\n")  # same name at the top: not this one
+    app = create_app(tmp_path, config={"resources": {"users": {"file": "sub/users.csv"}}, "lazy_resources": True})
+    with TestClient(app) as client:
+        assert client.get("/users").json()["total"] == 2
+    assert app.state.registry.as_dict()["users"]["file"] == "sub/users.csv"
+
+def test_idle_and_excess_resources_are_evicted(tmp_path):
+    for name in ("a", "b", "c"):
+        (tmp_path / f"{name}.csv").write_text("id\n1\n")
+    closed = []
+    registry = ResourceRegistry(tmp_path, discover=True, opener=lambda r: r.name, closer=closed.append,
+                                idle_timeout=60, max_open=2)
+    for name in ("a", "b"):
+        registry.acquire(name)
+    registry.release("a")
+    registry.acquire("c")  # over max_open: a is the only idle one
+    assert closed == ["a"] and set(registry.opened) == {"b", "c"}
+
+    registry.release("c")
+    assert registry.evict(now=10 ** 9) == ["c"]  # b is still in use
+    registry.release("b")
+    registry.close()
+    assert closed == ["a", "c", "b"]
+
+def test_idle_resources_are_closed_without_further_requests(tmp_path, monkeypatch):
+    monkeypatch.setattr(resources, "SWEEP_INTERVAL", 0.01)
+    (tmp_path / "a.csv").write_text("id\n1\n")
+    closed = []
+    registry = ResourceRegistry(tmp_path, discover=True, opener=lambda r: r.name, closer=closed.append,
+                                idle_timeout=0.05)
+    registry.start()
+    registry.acquire("a")
+    registry.release("a")
+    deadline = time.monotonic() + 5
+    while not closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    registry.stop()
+    assert closed == ["a"] and registry.opened == {}
+
+def test_streamed_body_holds_the_resource_until_sent(tmp_path):
+    app = make_app(tmp_path)
+    with TestClient(app) as client:
+        assert client.get("/users/1").status_code == 200
+        registry = app.state.registry
+        storage = registry.opened["users"].storage
+        stream, active = storage.stream, []
+
+        def tracked(*args, **kwargs):
+            for row in stream(*args, **kwargs):
+                active.append(registry._active["users"])
+                yield row
+
+        storage.stream = tracked
+        assert client.get("/users?format=ndjson").text.count("\n") == 2
+        assert active == [1, 1]
+        assert registry._active["users"] == 0
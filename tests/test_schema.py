@@ -0,0 +1,39 @@
+import csv_server.schema as schema_module
+from csv_server.schema import SchemaCache, value_type, widen
+from csv_server.storage.csv_store import CSVStorage
+
+def test_value_types_and_widening():
+    assert [value_type(v) for v in ["", "True", "7", "7.5", "2024-02-29", "2024-02-29T10:00:00", "x"]] == [
+        None, "boolean", "integer", "float", "date", "datetime", "string",
+    ]
+    assert widen("integer", "float") == "float"
+    assert widen("date", "datetime") == "datetime"
+    assert widen("boolean", "integer") == "string"
+    assert widen(None, "date") == "date"
+
+def test_sample_is_bounded_and_persisted(tmp_path):
+    file = tmp_path / "events.csv"
+    with open(file, "w") as f:
+        f.write("id,score,day,note\n")
+        for i in range(1, 5001):
+            f.write(f"{i},{i / 2},2024-01-{i % 28 + 1:02d},{'' if i % 1000 == 0 else 'ok'}\n")
+    cache = SchemaCache(file, head=10, sample=50)
+    assert cache.get() == {"id": "integer", "score": "float", "day": "date", "note": "string"}
+    assert cache.sidecar.exists()
+
+    fresh = SchemaCache(file, head=10, sample=50)
+    fresh._sample = None  # must come from the sidecar
+    assert fresh.get() == cache.get()
+
+def test_writes_update_schema_without_resampling(tmp_path, monkeypatch):
+    file = tmp_path / "users.csv"
+    file.write_text("id,name\n1,Alice\n2,Bob\n")
+    storage = CSVStorage(file)
+    assert storage.get_schema() == {"id": "integer", "name": "string"}
+    monkeypatch.setattr(schema_module, "iter_records", None)  # no more file sampling
+    storage.create({"name": "Carol", "active": "true"})
+    storage.update("1", {"joined": "2024-05-01"})
+    assert storage.get_schema() == {"id": "integer", "name": "string", "active": "boolean", "joined": "date"}
+    assert storage.describe_schema()["nullable"] == ["active", "joined"]
+    storage.close()
+    assert SchemaCache(file).get()["joined"] == "date"
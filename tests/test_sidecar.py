@@ -0,0 +1,62 @@
+import os
+from array import array
+import pytest
+from fastapi.testclient import TestClient
+from csv_server.app import create_app
+from csv_server.storage.csv_store import CSVStorage
+
+ROWS = "id,code,price,qty,note\n1,007,9.5,3,plain\n2,12,250.00,,\"multi\nline\"\n3,x,1e5,-4,\n3,dup,0.1,5,again\n,none,2.0,1,no id\n"
+
+@pytest.mark.parametrize("options", [{}, {"resident": True}, {"columnar": True}, {"indexes": ["qty"]}])
+def test_sidecar_replaces_parse_until_file_changes(tmp_path, options):
+    file = tmp_path / "items.csv"
+    file.write_text(ROWS)
+    cache = tmp_path / "cache"
+    first = CSVStorage(file, cache_dir=cache, **options)
+    expected = first.list(limit=10)
+    assert first.cache_info()["sidecar_saves"] == 1
+    os.unlink(f"{file}.schema.json")  # the sidecar carries the schema too
+
+    second = CSVStorage(file, cache_dir=cache, **options)
+    assert second.list(limit=10) == expected
+    assert second.get("3")["code"] == "x"  # first of the duplicated key
+    assert second.query(filters=["qty:gt:2"])["total"] == 2
+    assert second.duplicate_keys == {"3"}
+    assert second.get_schema()["price"] == "float"
+    if second.resident:
+        assert second.metrics.rows_parsed == 0
+    assert second.cache_info()["sidecar_loads"] == 1
+
+    with open(file, "a") as f:
+        f.write("4,new,1.0,1,later\n")
+    third = CSVStorage(file, cache_dir=cache, **options)
+    assert third.get("4")["code"] == "new"
+    assert third.cache_info()["sidecar_loads"] == 0
+    assert third.cache_info()["sidecar_saves"] == 1
+
+def test_app_cache_dir(tmp_path):
+    (tmp_path / "users.csv").write_text("id,name\n1,Alice\n2,Bob\n")
+    config = {"resources": {"users": {"file": "users.csv", "resident": True}}, "cache_dir": ".cache"}
+    for loads in (0, 1):
+        app = create_app(tmp_path, config=config)
+        with TestClient(app) as client:
+            assert client.get("/users/2").json() == {"id": "2", "name": "Bob"}
+        assert app.state.storages["users"].cache_info()["sidecar_loads"] == loads
+    assert len(list((tmp_path / ".cache").glob("users.csv.*.cols"))) == 1
+
+def test_sidecar_columns_map_the_file_until_written(tmp_path):
+    file = tmp_path / "items.csv"
+    file.write_text("id,code,qty,price\n1,a,3,1.5\n2,b,4,2.5\n3,a,5,0.5\n")
+    CSVStorage(file, cache_dir=tmp_path / "cache", columnar=True).list(limit=1)
+    # With the WAL, writes go to the loaded table in place instead of a rewrite.
+    storage = CSVStorage(file, cache_dir=tmp_path / "cache", columnar=True, wal=True)
+    assert storage.get("2")["code"] == "b"
+    columns = storage._rows.columns
+    assert isinstance(columns["qty"].values, memoryview) and isinstance(columns["code"].codes, memoryview)
+
+    storage.update("1", {"qty": "7", "code": "c"})
+    assert isinstance(columns["qty"].values, array) and isinstance(columns["code"].codes, array)
+    assert isinstance(columns["price"].values, memoryview)  # untouched columns stay shared
+    assert storage.get("1") == {"id": "1", "code": "c", "qty": "7", "price": "1.5"}
+    assert storage.query(filters=["qty:gt:4"])["total"] == 2
+    storage.close()
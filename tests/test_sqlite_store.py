@@ -0,0 +1,104 @@
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from csv_server.app import create_app
+from csv_server.exceptions import DuplicateKeyError
+from csv_server.storage.sqlite_store import SQLiteStorage
+from csv_server.utils_csv_ids import read_rows
+
+@pytest.fixture
+def orders_csv(tmp_path):
+    file = tmp_path / "orders.csv"
+    file.write_text(
+        "id,user_id,status,total\n"
+        "1,1,open,9.5\n"
+        "2,2,closed,120\n"
+        "3,1,open,30\n"
+    )
+    return file
+
+def test_crud_and_export(orders_csv):
+    storage = SQLiteStorage(orders_csv, indexes=["user_id"])
+    assert storage.count() == 3
+    assert storage.get("2")["status"] == "closed"
+    assert storage.create({"user_id": "3", "status": "open", "total": "5"})["id"] == "4"
+    with pytest.raises(DuplicateKeyError):
+        storage.create({"id": "1", "status": "dup"})
+    assert storage.update("1", {"status": "closed", "note": "late"})["note"] == "late"
+    with pytest.raises(KeyError):
+        storage.update("99", {"status": "x"})
+    storage.delete("2")
+    storage.close()
+
+    rows = read_rows(orders_csv)
+    assert [r["id"] for r in rows] == ["1", "3", "4"]
+    assert rows[0]["note"] == "late"
+
+    # Reopening reuses the database because the CSV matches the last export
+    reopened = SQLiteStorage(orders_csv)
+    assert reopened.get("4")["user_id"] == "3"
+    reopened.close()
+
+def test_query_filters_and_sorts_in_sql(orders_csv):
+    storage = SQLiteStorage(orders_csv)
+    result = storage.query(filters=["total:gt:10"], sort="-total")
+    assert [r["id"] for r in result["items"]] == ["2", "3"]
+    assert result["total"] == 2
+    assert [r["id"] for r in storage.query(q="clos")["items"]] == ["2"]
+    assert [r["id"] for r in storage.stream(filters=["user_id:in:1"], sort="total")] == ["1", "3"]
+    storage.close()
+
+def test_app_uses_sqlite_backend(orders_csv):
+    app = create_app(orders_csv.parent, readonly=False, config={
+        "resources": {"orders": {"file": "orders.csv", "backend": "sqlite"}}
+    })
+    with TestClient(app) as client:
+        assert client.post("/orders", json={"status": "new"}).json()["id"] == "4"
+        assert client.get("/orders", params={"filter": "status:eq:new"}).json()["total"] == 1
+    assert read_rows(orders_csv)[-1]["status"] == "new"
+
+def test_export_keeps_cell_text(tmp_path):
+    file = tmp_path / "prices.csv"
+    text = "id,code,price,qty\n1,007,10.50,2\n2,12,9.5,2.0\n3,x,1e3,\n"
+    file.write_text(text)
+    storage = SQLiteStorage(file, indexes=["price"])
+    assert storage.get("1") == {"id": "1", "code": "007", "price": "10.50", "qty": "2"}
+    assert [r["id"] for r in storage.query(filters=["price:gt:10"], sort="price")["items"]] == ["1", "3"]
+    assert [r["id"] for r in storage.query(filters=["qty:eq:2"])["items"]] == ["1", "2"]
+    storage.update("3", {"code": "y"})
+    storage.close()
+    assert file.read_text() == text.replace("3,x,", "3,y,")
+
+def test_version_sees_other_workers_writes(orders_csv):
+    first, second = SQLiteStorage(orders_csv), SQLiteStorage(orders_csv)
+    token, _ = first.version()
+    assert second.version()[0] == token
+    second.update("1", {"status": "closed"})
+    assert first.version()[0] != token
+    assert first.version() == second.version()
+    second.close()
+    first.close()
+
+def test_version_does_not_wait_for_the_storage_lock(orders_csv):
+    storage = SQLiteStorage(orders_csv)
+    seen = []
+    with storage._lock:  # e.g. an export in progress
+        reader = threading.Thread(target=lambda: seen.append(storage.version()))
+        reader.start()
+        reader.join(timeout=5)
+    assert seen and seen[0][0] == storage.version()[0]
+    storage.close()
+
+def test_auto_ids_come_from_a_running_max(orders_csv):
+    first, second = SQLiteStorage(orders_csv), SQLiteStorage(orders_csv)
+    assert first.create({"status": "a"})["id"] == "4"
+    statements = []
+    first._conn.set_trace_callback(statements.append)
+    assert first.create({"status": "b"})["id"] == "5"
+    assert not any(s.startswith('SELECT "id"') for s in statements)  # no scan of the keys
+    first._conn.set_trace_callback(None)
+    assert second.create({"id": "10", "status": "c"})["id"] == "10"
+    assert first.create({"status": "d"})["id"] == "11"
+    assert second.create({"status": "e"})["id"] == "12"
+    second.close()
+    first.close()
@@ -23,4 +23,11 @@ def test_ensure_pk_and_autoincrement_increments_id(tmp_path):
     rows = read_rows(file)
     assert len(rows) == 2
     assert rows[1]["name"] == "Bob"
-    assert rows[1]["id"] == "2"
\ No newline at end of file
+    assert rows[1]["id"] == "2"
+
+def test_ensure_pk_and_autoincrement_appends_to_unterminated_file(tmp_path):
+    file = tmp_path / "users.csv"
+    file.write_text("id,name\n1,Alice")
+    row = ensure_pk_and_autoincrement(file, {"name": "Bob"})
+    assert row["id"] == "2"
+    assert [r["name"] for r in read_rows(file)] == ["Alice", "Bob"]
@@ -0,0 +1,58 @@
+import threading
+from csv_server.storage.csv_store import CSVStorage
+from csv_server.storage.wal import WriteAheadLog
+
+def write_users(path):
+    path.write_text("id,name,email\n1,Alice,alice@example.com\n2,Bob,bob@example.com\n")
+
+def test_group_commit_batches_concurrent_writers(tmp_path):
+    wal = WriteAheadLog(tmp_path / "t.wal", window=0.05, max_batch=1000)
+    threads = [
+        threading.Thread(target=wal.append, args=({"op": "delete", "id": str(i)},))
+        for i in range(20)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert wal.entries == 20
+    assert wal.commits < 20
+    assert sorted(int(e["id"]) for e in wal.replay()) == list(range(20))
+
+def test_wal_mutations_overlay_until_checkpoint(tmp_path):
+    file = tmp_path / "users.csv"
+    write_users(file)
+    before = file.read_bytes()
+    storage = CSVStorage(file, wal=True, wal_window=0, checkpoint_interval=60)
+    storage.update("1", {"name": "Alice Updated"})
+    created = storage.create({"name": "Charlie", "email": "c@example.com"})
+    storage.delete("2")
+
+    assert file.read_bytes() == before
+    assert storage.get("1")["name"] == "Alice Updated"
+    assert storage.get("2") is None
+    assert [row["id"] for row in storage.list()] == ["1", created["id"]]
+    assert storage.cache_info()["wal_entries"] == 3
+
+    storage.close()
+    assert file.read_text().splitlines() == [
+        "id,name,email", "1,Alice Updated,alice@example.com", "3,Charlie,c@example.com",
+    ]
+    assert (tmp_path / "users.csv.wal").read_bytes() == b""
+
+def test_wal_replayed_after_crash(tmp_path):
+    file = tmp_path / "users.csv"
+    write_users(file)
+    crashed = CSVStorage(file, wal=True, wal_window=0, checkpoint_interval=60)
+    crashed.update("2", {"email": "bob@new.example.com"})
+    crashed.create({"id": "9", "name": "Zed", "email": "z@example.com", "team": "red"})
+    crashed._checkpoint_timer.cancel()  # the process dies without checkpointing
+    with open(tmp_path / "users.csv.wal", "ab") as f:
+        f.write(b'{"op":"delete","id":"1"')  # torn final write
+
+    storage = CSVStorage(file, wal=True)
+    assert storage.get("1")["name"] == "Alice"
+    assert storage.get("2")["email"] == "bob@new.example.com"
+    assert storage.get("9")["team"] == "red"
+    assert storage.checkpoints == 1
+    assert "9,Zed,z@example.com,red" in file.read_text()
@@ -0,0 +1,59 @@
+import pytest
+from csv_server.storage.csv_store import CSVStorage
+from csv_server.watch import FileWatcher
+
+def write_orders(path):
+    with open(path, "w") as f:
+        f.write("id,status,amount\n1,open,10\n2,closed,5\n")
+
+@pytest.mark.parametrize("options", [{}, {"resident": True}, {"columnar": True}, {"wal": True}, {"use_mmap": True}])
+def test_appended_tail_is_parsed_incrementally(tmp_path, options):
+    file = tmp_path / "orders.csv"
+    write_orders(file)
+    storage = CSVStorage(file, indexes=["status"], search_index=True,
+                         aggregates=[{"group_by": "status", "metrics": "count"}], **options)
+    schema = storage.get_schema()
+    assert storage.query(q="open")["total"] == 1  # builds the search index
+    assert storage.aggregate("status", "count", schema=schema)["total"] == 2
+
+    with open(file, "a") as f:
+        f.write("3,open,7\n4,void,1\n")
+    assert storage.reload() == {"kind": "append", "rows": 2, "seconds": pytest.approx(0, abs=1)}
+    assert storage.cache_info()["misses"] == 1
+    assert storage.get("4")["status"] == "void"
+    assert storage.query(filters=["status:eq:open"], schema=schema)["total"] == 2
+    assert storage.query(q="void")["total"] == 1
+    assert storage.list(limit=10, offset=2) == [
+        {"id": "3", "status": "open", "amount": "7"}, {"id": "4", "status": "void", "amount": "1"},
+    ]
+    groups = storage.aggregate("status", "count", schema=schema)["groups"]
+    assert {g["status"]: g["count"] for g in groups} == {"open": 2, "closed": 1, "void": 1}
+    assert storage.create({"status": "open"})["id"] == "5"
+    storage.close()
+
+def test_watcher_reports_appends_and_rescans(tmp_path):
+    file = tmp_path / "orders.csv"
+    write_orders(file)
+    storage = CSVStorage(file, resident=True)
+    watcher = FileWatcher("orders", storage, interval=0.01)
+    assert watcher.poll() is None  # never loaded: nothing to catch up
+    storage.count()
+    assert watcher.poll() is None
+
+    with open(file, "a") as f:
+        f.write("3,open,7\n")
+    assert watcher.poll()["kind"] == "append"
+
+    with open(file, "a") as f:
+        f.write("4,open\n5,clo")  # the writer is mid-record
+    assert (watcher.poll()["kind"], storage.count()) == ("append", 4)
+    with open(file, "a") as f:
+        f.write("sed,2\n")
+    assert watcher.poll()["rows"] == 1
+    assert storage.get("5") == {"id": "5", "status": "closed", "amount": "2"}
+
+    file.write_text("id,state\n1,done\n")  # new header
+    event = watcher.poll()
+    assert (event["kind"], event["rows"]) == ("rescan", 1)
+    assert storage.get("1") == {"id": "1", "state": "done"}
+    assert [e["kind"] for e in watcher.events] == ["append", "append", "append", "rescan"]